@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import re
+import time
+
+from urllib.parse import urlsplit
+
+import httpx
+
+import API
+
+_RESOURCES_PATH = re.compile(urlsplit(API.JUDICIAL_CATEGORY_RESOURCES_API).path.replace("{categoryNo}", "(?P<category>[^/]+)") + "$")
+_FILE_PATH = re.compile(urlsplit(API.JUDICIAL_CATEGORYS_FILE_API).path.replace("{fileSetId}", r"(?P<file_set>\d+)") + "$")
+_CATEGORIES_PATH = urlsplit(API.JUDICIAL_CATEGORYS_API).path
+
+
+class _PayloadStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Streams a file body in chunks, as a real server would, so byte counting sees the transfer."""
+
+    def __init__(self, payload: bytes, chunk_size: int = 64 * 1024):
+        self.payload = payload
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for start in range(0, len(self.payload), self.chunk_size):
+            yield self.payload[start:start + self.chunk_size]
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+
+class MockOpendata:
+    """In-process stand-in for the three opendata endpoints in API.py.
+
+    Serves `categories` categories with `resources` resources each and `filesets` filesets per
+    resource. Every request waits `latency` seconds, and file downloads return `payload_size`
+    bytes. Bytes and requests served are counted for throughput reporting.
+    """
+
+    def __init__(self, categories: int = 10, resources: int = 10, filesets: int = 2,
+                 latency: float = 0.0, payload_size: int = 64 * 1024):
+        self.categories = categories
+        self.resources = resources
+        self.filesets = filesets
+        self.latency = latency
+        self.payload = bytes(range(256)) * (payload_size // 256) + b"\0" * (payload_size % 256)
+        self.requests = 0
+        self.bytes_served = 0
+
+    def _category_payload(self):
+        return [{"categoryNo": f"C{i:03d}", "categoryName": f"類別{i}"} for i in range(self.categories)]
+
+    def _resource_payload(self, category_no: str):
+        category = int(category_no[1:])
+        resources = []
+        for r in range(self.resources):
+            dataset_id = category * self.resources + r + 1
+            resources.append({
+                "datasetId": dataset_id,
+                "title": f"資料集{dataset_id}",
+                "filesets": [
+                    {"fileSetId": dataset_id * 100 + f, "resourceFormat": "ZIP", "resourceDescription": f"檔案{f}"}
+                    for f in range(self.filesets)
+                ],
+            })
+        return resources
+
+    @staticmethod
+    def _listing(request: httpx.Request, payload) -> httpx.Response:
+        response = httpx.Response(200, json=payload)
+        etag = f'"{hashlib.sha256(response.content).hexdigest()[:16]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return response
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        path = request.url.path
+        if path == _CATEGORIES_PATH:
+            response = self._listing(request, self._category_payload())
+        elif match := _RESOURCES_PATH.match(path):
+            response = self._listing(request, self._resource_payload(match["category"]))
+        elif _FILE_PATH.match(path):
+            self.bytes_served += len(self.payload)
+            return httpx.Response(200, stream=_PayloadStream(self.payload),
+                                  headers={"Content-Length": str(len(self.payload)), "ETag": '"synthetic"'})
+        else:
+            response = httpx.Response(404)
+        self.bytes_served += len(response.content)
+        return response
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(request)
+
+    async def _handle_async(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(request)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle)
+
+    def async_transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle_async)
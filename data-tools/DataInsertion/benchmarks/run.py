@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks import synthetic
+from benchmarks.mock_opendata import MockOpendata
+
+STAGES = ("sync", "downloads", "laws", "interpretations")
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes, or 0 where getrusage is unavailable."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _open_main(workdir: Path):
+    """Import main against a SQLite database in `workdir`."""
+    os.chdir(workdir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'benchmark.sqlite'}"
+    import database
+    import main
+    from sqlmodel import SQLModel
+
+    logging.getLogger().setLevel(logging.WARNING)
+    SQLModel.metadata.create_all(database.get_engine())
+    return main
+
+
+def _sync(main, opendata: MockOpendata) -> int:
+    transport = opendata.transport()
+    main.update_category(transport=transport)
+    main.update_resource(transport=transport)
+    return opendata.categories + opendata.categories * opendata.resources * (1 + opendata.filesets)
+
+
+def _run_stage(stage: str, workdir: Path, options: dict) -> dict:
+    """Child-process entry point: run one stage and measure it in isolation."""
+    main = _open_main(workdir)
+    import database
+
+    opendata = MockOpendata(categories=options["categories"], resources=options["resources"],
+                            filesets=options["filesets"], latency=options["latency"],
+                            payload_size=options["payload_size"])
+    rows = size = 0
+
+    if stage == "downloads":
+        # Downloads are planned from the synced ResourceFiles, so the sync runs untimed first.
+        _sync(main, opendata)
+        from sqlmodel import Session
+        import download_plan
+        import downloader
+
+        with Session(database.get_engine()) as session:
+            jobs = download_plan.plan_downloads(session).prepare().jobs
+
+    started = time.perf_counter()
+    if stage == "sync":
+        rows = _sync(main, opendata)
+        size = opendata.bytes_served
+    elif stage == "downloads":
+        served = opendata.bytes_served
+        stats = asyncio.run(downloader.download_all(
+            jobs, concurrency=options["concurrency"], per_host=options["concurrency"],
+            transport=opendata.async_transport()))
+        rows = stats.downloaded
+        size = opendata.bytes_served - served
+    elif stage == "laws":
+        from sqlmodel import Session
+        import laws
+
+        dump = workdir / "laws.json"
+        size = dump.stat().st_size
+        with Session(database.get_engine()) as session, laws.LawWriter(session) as writer:
+            for law in laws.iter_laws(dump):
+                writer.add(law)
+        rows = options["articles"]
+    elif stage == "interpretations":
+        from sqlmodel import Session
+        import interpretations
+
+        source = workdir / "interpretations"
+        size = sum(path.stat().st_size for path in source.iterdir())
+        with Session(database.get_engine()) as session:
+            sink = interpretations.DatabaseSink(session)
+            main.insert_interpretation_data(source, sink, workers=options["workers"])
+        rows = sink.total
+    seconds = time.perf_counter() - started
+
+    return {
+        "stage": stage,
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "bytes_per_sec": round(size / seconds, 1) if seconds else None,
+        "peak_rss": _peak_rss(),
+    }
+
+
+@click.command()
+@click.option('--workdir', type=click.Path(file_okay=False), default="benchmark_data", show_default=True,
+              help='Directory for generated corpora and the SQLite database.')
+@click.option('--stage', 'stages', type=click.Choice(STAGES), multiple=True,
+              help='Stage to run; repeat for several. Defaults to all of them.')
+@click.option('--articles', default=10_000, show_default=True, help='Law articles in the synthetic dump (1k-1M).')
+@click.option('--interpretations', 'interpretation_count', default=1_000, show_default=True,
+              help='Synthetic interpretation JSON files.')
+@click.option('--categories', default=10, show_default=True, help='Categories served by the mock API.')
+@click.option('--resources', default=10, show_default=True, help='Resources per mock category.')
+@click.option('--filesets', default=2, show_default=True, help='Downloadable files per mock resource.')
+@click.option('--payload-size', default=256 * 1024, show_default=True, help='Bytes per mock file download.')
+@click.option('--latency', default=0.0, show_default=True, help='Seconds added to every mock API response.')
+@click.option('--concurrency', default=8, show_default=True, help='Download concurrency.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True,
+              help='Interpretation parse processes.')
+@click.option('--json', 'json_path', type=click.Path(dir_okay=False), default=None,
+              help='Also write the results to this JSON file.')
+def run(workdir, stages, articles, interpretation_count, categories, resources, filesets,
+        payload_size, latency, concurrency, workers, json_path):
+    """Benchmark sync, downloads, law and interpretation ingest against a local SQLite database.
+
+    Every stage runs in a fresh process on an empty database, so its peak RSS is its own.
+    """
+    workdir = Path(workdir).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    stages = stages or STAGES
+    options = {
+        "articles": articles, "categories": categories, "resources": resources, "filesets": filesets,
+        "payload_size": payload_size, "latency": latency, "concurrency": concurrency, "workers": workers,
+    }
+
+    if "laws" in stages:
+        law_count = synthetic.write_law_dump(workdir / "laws.json", articles)
+        click.echo(f"Generated {law_count} laws / {articles} articles")
+    if "interpretations" in stages:
+        shutil.rmtree(workdir / "interpretations", ignore_errors=True)
+        synthetic.write_interpretations(workdir / "interpretations", interpretation_count)
+        click.echo(f"Generated {interpretation_count} interpretations")
+
+    results = []
+    # Leftovers from an earlier run would be skipped as already downloaded.
+    shutil.rmtree(workdir / "downloads", ignore_errors=True)
+    context = multiprocessing.get_context("spawn")
+    for stage in stages:
+        (workdir / "benchmark.sqlite").unlink(missing_ok=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(_run_stage, stage, workdir, options).result()
+        results.append(result)
+        click.echo(f"{stage:>16}: {result['rows']:>9} rows in {result['seconds']:>8.3f}s  "
+                   f"{result['rows_per_sec'] or 0:>11.1f} rows/s  "
+                   f"{(result['bytes_per_sec'] or 0) / 1e6:>8.2f} MB/s  "
+                   f"peak RSS {result['peak_rss'] / 2**20:.1f} MiB")
+
+    if json_path:
+        Path(json_path).write_text(json.dumps({"options": options, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,96 @@
+import json
+import random
+
+from pathlib import Path
+
+LAW_LEVELS = ("憲法", "法律", "命令")
+LAW_WORDS = ("民", "刑", "行政", "程序", "訴訟", "稅", "勞動", "基準", "保護", "管理", "組織", "條例", "施行")
+TEXT_CHARS = "人民之自由權利除為防止妨礙他人避免緊急危難維持社會秩序或增進公共利益所必要者外不得以法律限制之"
+ARTICLES_PER_CAPTION = 10
+
+
+def _text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(TEXT_CHARS) for _ in range(length))
+
+
+def _law_name(rng: random.Random, index: int) -> str:
+    return "".join(rng.choice(LAW_WORDS) for _ in range(3)) + f"法{index}"
+
+
+def write_law_dump(path: Path, articles: int, articles_per_law: int = 50, article_length: int = 120,
+                   seed: int = 0) -> int:
+    """Write a {"UpdateDate", "Laws": [...]} dump holding `articles` articles; returns the law count.
+
+    Laws are serialised one at a time, so even a million-article dump never sits in memory.
+    """
+    rng = random.Random(seed)
+    law_count = max(1, articles // articles_per_law)
+    with open(path, 'w', encoding='utf-8-sig') as f:
+        f.write('{"UpdateDate": "2024/1/1 上午 12:00:00", "Laws": [')
+        written = 0
+        for index in range(law_count):
+            count = articles - written if index == law_count - 1 else articles_per_law
+            law_articles = []
+            for number in range(1, count + 1):
+                if number % ARTICLES_PER_CAPTION == 1:
+                    law_articles.append({"ArticleType": "C", "ArticleNo": "",
+                                         "ArticleContent": f"第 {number // ARTICLES_PER_CAPTION + 1} 章 {_text(rng, 6)}"})
+                article_no = f"第 {number} 條" if number % 7 else f"第 {number - 1}-1 條"
+                law_articles.append({"ArticleType": "A", "ArticleNo": article_no,
+                                     "ArticleContent": _text(rng, article_length)})
+            law = {
+                "LawLevel": rng.choice(LAW_LEVELS),
+                "LawName": _law_name(rng, index),
+                "LawURL": f"https://law.moj.gov.tw/LawClass/LawAll.aspx?pcode=X{index:07d}",
+                "LawCategory": "行政＞綜合規劃",
+                "LawModifiedDate": f"20{rng.randint(10, 24)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}",
+                "LawEffectiveDate": "",
+                "LawEffectiveNote": "",
+                "LawAbandonNote": "",
+                "LawHasEngVersion": rng.choice("YN"),
+                "EngLawName": f"Synthetic Act {index}",
+                "LawAttachements": [{"FileName": "附表", "FileURL": f"https://law.moj.gov.tw/att/{index}.pdf"}],
+                "LawHistories": _text(rng, 40),
+                "LawForeword": "",
+                "LawArticles": law_articles,
+            }
+            if index:
+                f.write(",")
+            f.write(json.dumps(law, ensure_ascii=False))
+            written += count
+        f.write("]}")
+    return law_count
+
+
+def interpretation_document(rng: random.Random, number: int, text_length: int = 2000) -> dict:
+    data = {
+        "inte_no": f"{number:03d}",
+        "inte_date": f"{rng.randint(1950, 2023)}/{rng.randint(1, 12)}/{rng.randint(1, 28)} 上午 12:00:00",
+        "data_url": f"https://cons.judicial.gov.tw/docdata.aspx?fid=100&id={number}",
+        "inte_order": "", "inte_order_title": "", "inte_order_change": "", "inte_no_chg": "",
+        "inte_no_title": f"釋字第{number}號",
+        "inte_issue": _text(rng, 60),
+        "inte_desc": f"民法第{rng.randint(1, 1225)}條" + _text(rng, text_length // 4),
+        "inte_reason": _text(rng, text_length // 2) + f"刑法第{rng.randint(1, 363)}條之1",
+        "inte_kind_1": "解釋", "inte_kind_2": "",
+        "inte_fact": _text(rng, text_length // 4),
+    }
+    if number % 2:
+        data.update({
+            "inte_no_title_en": f"J.Y. Interpretation No. {number}",
+            "inte_issue_en": "Is the statute consistent with Article 8 of the Constitution?",
+            "inte_desc_en": "The provision is unconstitutional. " * 20,
+        })
+    return {"data": data, "addition": {"解釋文": f"/docdata/{number}.pdf", "理由書": ""}}
+
+
+def write_interpretations(directory: Path, count: int, seed: int = 0) -> int:
+    """Write `count` interpretation JSON files under `directory`; returns the total bytes written."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for number in range(1, count + 1):
+        body = json.dumps(interpretation_document(rng, number), ensure_ascii=False).encode("utf-8")
+        (directory / f"{number:05d}.json").write_bytes(body)
+        total += len(body)
+    return total
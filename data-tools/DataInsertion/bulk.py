@@ -0,0 +1,109 @@
+import logging
+
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import and_, bindparam, insert, inspect, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def column_names(model) -> Dict[str, str]:
+    """Map a model's attribute names to its table column names (e.g. law_name -> LawName)."""
+    return {attr.key: attr.columns[0].name for attr in inspect(model).column_attrs}
+
+
+def to_columns(model, rows: Iterable[dict]) -> List[dict]:
+    names = column_names(model)
+    return [{names[key]: value for key, value in row.items()} for row in rows]
+
+
+def batched(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def is_mysql(session: Session) -> bool:
+    return session.get_bind().dialect.name in ("mysql", "mariadb")
+
+
+def insert_rows(session: Session, model, rows: List[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """executemany-style INSERT of attribute-keyed dicts, one round trip per batch."""
+    table = model.__table__
+    for batch in batched(rows, batch_size):
+        session.execute(insert(table), to_columns(model, batch))
+    return len(rows)
+
+
+def primary_key_attrs(model) -> List[str]:
+    table = model.__table__
+    return [attr for attr, name in column_names(model).items() if table.c[name].primary_key]
+
+
+def update_rows(session: Session, model, rows: List[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """executemany-style UPDATE by primary key; every row must carry the same attribute keys."""
+    if not rows:
+        return 0
+    table = model.__table__
+    names = column_names(model)
+    pk_attrs = primary_key_attrs(model)
+    value_attrs = [attr for attr in rows[0] if attr not in pk_attrs]
+    # Bind parameters are prefixed so they do not collide with the SET column names.
+    stmt = (
+        update(table)
+        .where(and_(*(table.c[names[attr]] == bindparam(f"b_{attr}") for attr in pk_attrs)))
+        .values({names[attr]: bindparam(f"b_{attr}") for attr in value_attrs})
+    )
+    for batch in batched(rows, batch_size):
+        session.execute(stmt, [{f"b_{attr}": value for attr, value in row.items()} for row in batch])
+    return len(rows)
+
+
+def upsert_rows(session: Session, model, rows: Iterable[dict],
+                batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[int, int]:
+    """Insert or update attribute-keyed rows by primary key without a SELECT per row.
+
+    Existing rows are loaded with one query, unchanged rows are dropped, and the rest are
+    written in batches using INSERT ... ON DUPLICATE KEY UPDATE on MySQL or executemany
+    INSERT/UPDATE elsewhere. Returns (inserted, updated).
+    """
+    table = model.__table__
+    names = column_names(model)
+    pk_attrs = primary_key_attrs(model)
+
+    incoming: Dict[tuple, dict] = {}
+    for row in rows:
+        incoming[tuple(row[attr] for attr in pk_attrs)] = row
+    if not incoming:
+        return 0, 0
+    value_attrs = [attr for attr in next(iter(incoming.values())) if attr not in pk_attrs]
+
+    columns = [table.c[names[attr]] for attr in pk_attrs + value_attrs]
+    existing = {
+        tuple(row[:len(pk_attrs)]): tuple(row[len(pk_attrs):])
+        for row in session.execute(select(*columns))
+    }
+
+    new_rows, changed_rows = [], []
+    for key, row in incoming.items():
+        if key not in existing:
+            new_rows.append(row)
+        elif existing[key] != tuple(row[attr] for attr in value_attrs):
+            changed_rows.append(row)
+
+    if is_mysql(session):
+        for batch in batched(new_rows + changed_rows, batch_size):
+            stmt = mysql_insert(table).values(to_columns(model, batch))
+            stmt = stmt.on_duplicate_key_update({names[attr]: stmt.inserted[names[attr]] for attr in value_attrs})
+            session.execute(stmt)
+    else:
+        insert_rows(session, model, new_rows, batch_size)
+        if value_attrs:
+            update_rows(session, model, changed_rows, batch_size)
+
+    logger.info(f"Upserted {table.name}: {len(new_rows)} inserted, {len(changed_rows)} updated, "
+                f"{len(incoming) - len(new_rows) - len(changed_rows)} unchanged")
+    return len(new_rows), len(changed_rows)
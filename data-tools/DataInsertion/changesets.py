@@ -0,0 +1,136 @@
+import gzip
+import json
+import logging
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlmodel import Session
+
+import bulk
+import metrics
+
+from models.changesets import ChangeSet, ChangeSetCounter
+
+logger = logging.getLogger(__name__)
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+LAW = "law"
+ARTICLE = "article"
+INTERPRETATION = "interpretation"
+
+COMPRESSION_LEVEL = 6
+# ChangeSetCounter holds one row.
+COUNTER_ID = 1
+
+
+def prepare_schema(engine) -> None:
+    """Create the ChangeSet tables in databases created before they existed, and seed the counter."""
+    ChangeSet.__table__.create(engine, checkfirst=True)
+    ChangeSetCounter.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session:
+        _seed_counter(session)
+        session.commit()
+
+
+def latest_version(session: Session) -> int:
+    return session.execute(select(func.max(ChangeSet.version))).scalar() or 0
+
+
+def _seed_counter(session: Session) -> None:
+    # Started from the latest stored version, so databases that already have change-sets continue after them.
+    # IGNORE keeps concurrent writers that both find the row missing from failing.
+    statement = (insert(ChangeSetCounter.__table__)
+                 .prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite"))
+    session.execute(statement, [{"Id": COUNTER_ID, "Version": latest_version(session)}])
+
+
+def next_version(session: Session) -> int:
+    """Allocate the next change-set version; call it last before committing, as it locks the counter until then."""
+    increment = (update(ChangeSetCounter)
+                 .where(ChangeSetCounter.id == COUNTER_ID)
+                 .values(version=ChangeSetCounter.version + 1)
+                 .execution_options(synchronize_session=False))
+    if session.execute(increment).rowcount == 0:
+        _seed_counter(session)
+        session.execute(increment)
+    return session.execute(select(ChangeSetCounter.version).where(ChangeSetCounter.id == COUNTER_ID)).scalar_one()
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=_json_default)
+
+
+class ChangeRecorder:
+    """Collects the inserts, updates and deletes of one batch and stores them as a ChangeSet.
+
+    Importers record each change as they buffer it and call `flush` inside the transaction
+    that writes the batch, right before committing it: flush allocates the version, and
+    with it the counter lock that keeps change-sets committing in version order.
+    """
+
+    def __init__(self, session: Session, command: str):
+        self.session = session
+        self.command = command
+        self._lines: List[str] = []
+
+    def __len__(self):
+        return len(self._lines)
+
+    def record(self, op: str, entity: str, key: dict, data: Optional[dict] = None) -> None:
+        change = {"op": op, "entity": entity, "key": key}
+        if data is not None:
+            change["data"] = data
+        self._lines.append(dumps(change))
+
+    def flush(self) -> None:
+        if not self._lines:
+            return
+        body = gzip.compress(("\n".join(self._lines) + "\n").encode('utf-8'), COMPRESSION_LEVEL)
+        bulk.insert_rows(self.session, ChangeSet, [{
+            "version": next_version(self.session),
+            "command": self.command,
+            "created_at": datetime.now(),
+            "changes": len(self._lines),
+            "body": body,
+        }])
+        metrics.count("changes", len(self._lines), command=self.command)
+        self._lines.clear()
+
+
+def export_since(session: Session, since: int, output: Path) -> Tuple[int, int]:
+    """Write every change-set after version `since` to one .jsonl.gz file, oldest first.
+
+    Each change-set starts with a {"version", "command", "created_at", "changes"} line and
+    is followed by its changes. The stored bodies are copied as they are: concatenated gzip
+    members read back as one stream. Returns (change-sets written, last version written).
+    """
+    count = 0
+    last = since
+    statement = (select(ChangeSet.version, ChangeSet.command, ChangeSet.created_at, ChangeSet.changes, ChangeSet.body)
+                 .where(ChangeSet.version > since)
+                 .order_by(ChangeSet.version)
+                 .execution_options(yield_per=100))
+    with open(output, 'wb') as f:
+        for version, command, created_at, changes, body in session.execute(statement):
+            header = dumps({"version": version, "command": command, "created_at": created_at, "changes": changes})
+            f.write(gzip.compress((header + "\n").encode('utf-8'), COMPRESSION_LEVEL))
+            f.write(body)
+            count += 1
+            last = version
+        if not count:
+            # Still a valid, empty gzip file.
+            f.write(gzip.compress(b""))
+    logger.info(f"Exported {count} change-sets after version {since} to {output}; latest version is {last}")
+    return count, last
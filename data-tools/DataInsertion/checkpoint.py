@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+
+from pathlib import Path
+from typing import Hashable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = Path("checkpoints")
+
+
+def source_fingerprint(source: Optional[Path]) -> Optional[str]:
+    """Identify an input by path, size and mtime, so a journal is never resumed against a different file."""
+    if source is None:
+        return None
+    stat = Path(source).stat()
+    return f"{Path(source).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _key(value) -> Hashable:
+    # JSON turns tuple keys such as (LawLevel, LawName) into lists.
+    return tuple(value) if isinstance(value, list) else value
+
+
+class CheckpointJournal:
+    """Append-only journal of committed batches, so an interrupted command can resume.
+
+    Each line records the keys (law keys, interpretation numbers, fileset ids) of one batch
+    after its transaction committed, and is fsynced before the next batch starts. A crash
+    between the commit and the journal write leaves one committed batch unrecorded, so
+    resuming writers must accept keys that are already stored (`resume` tells them they
+    are resuming). Without `resume` any previous journal is discarded.
+
+    Parallel writers each append to their own `part` file; the main journal (part=None)
+    reads every part when resuming.
+    """
+
+    def __init__(self, name: str, source: Optional[Path] = None, resume: bool = False,
+                 directory: Path = DEFAULT_CHECKPOINT_DIR, part: Optional[int] = None):
+        self.name = name
+        self.directory = Path(directory)
+        self.fingerprint = source_fingerprint(source)
+        self.path = self.directory / (f"{name}.jsonl" if part is None else f"{name}.{part:03d}.jsonl")
+        self.resume = resume
+        self.completed: Set[Hashable] = set()
+        self._file = None
+        if part is None:
+            if resume:
+                self._load()
+            else:
+                self.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def _parts(self):
+        return sorted(self.directory.glob(f"{self.name}.jsonl")) + sorted(self.directory.glob(f"{self.name}.*.jsonl"))
+
+    def _load(self) -> None:
+        for path in self._parts():
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            if not lines or json.loads(lines[0]).get("fingerprint") != self.fingerprint:
+                logger.warning(f"Discarding checkpoint {path}: it was written for a different input")
+                path.unlink()
+                continue
+            for line in lines[1:]:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut off by a crash; its batch is redone.
+                    continue
+                self.completed.update(_key(key) for key in entry["keys"])
+        if self.completed:
+            logger.info(f"Resuming {self.name}: {len(self.completed)} items already committed")
+
+    def clear(self) -> None:
+        for path in self._parts():
+            path.unlink()
+
+    def _ends_torn(self) -> bool:
+        """True when the last line was cut off mid-write, so the next one must start on a new line."""
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def record(self, keys: Iterable) -> None:
+        """Durably record that the batch with these keys has been committed."""
+        keys = [list(key) if isinstance(key, tuple) else key for key in keys]
+        if not keys:
+            return
+        if self._file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            is_new = not self.path.exists()
+            torn = not is_new and self._ends_torn()
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if is_new:
+                self._file.write(json.dumps({"fingerprint": self.fingerprint}) + "\n")
+            elif torn:
+                self._file.write("\n")
+        self._file.write(json.dumps({"keys": keys}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed.update(_key(key) for key in keys)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,220 @@
+import logging
+import re
+
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlmodel import Session
+
+import bulk
+import law_keys
+import metrics
+import text_store
+
+from models.citations import LawCitation
+from models.interpretations import InterpretationsZH
+from models.law import Law
+
+logger = logging.getLogger(__name__)
+
+# InterpretationsZH fields scanned for citations.
+CITING_FIELDS = ("issue", "description", "reasoning")
+
+# Common short forms mapped to the official name; ignored when the official law is not loaded.
+ABBREVIATIONS = {
+    "勞基法": "勞動基準法",
+    "消保法": "消費者保護法",
+    "個資法": "個人資料保護法",
+    "健保法": "全民健康保險法",
+    "國賠法": "國家賠償法",
+    "社維法": "社會秩序維護法",
+    "憲訴法": "憲法訴訟法",
+    "營業稅法": "加值型及非加值型營業稅法",
+    "大法官審理案件法": "司法院大法官審理案件法",
+}
+STRIPPED_PREFIXES = ("中華民國",)
+
+# Names this short ("民法", "憲法") also occur inside unrelated words, so they only count
+# when an article reference follows them.
+SHORT_NAME_LENGTH = 2
+
+# "同法第5條" cites the law named just before it.
+SAME_LAW = "同法"
+
+_FIRST_ARTICLE = re.compile(r"\s*" + law_keys.ARTICLE.pattern)
+# 第1項, 第2款, 前段 ... between an article and the next one in a list.
+_CLAUSES = re.compile(rf"(?:\s*第\s*(?:{law_keys.NUMBER})\s*[項款目]|\s*(?:前段|後段|但書))*")
+_NEXT_ARTICLE = re.compile(r"\s*(?:、|,|以及|及|與|或|暨)\s*" + law_keys.ARTICLE.pattern)
+
+LawKey = Tuple[str, str]
+ArticleKey = Optional[Tuple[int, int]]
+
+
+class Automaton:
+    """Aho-Corasick automaton: finds every occurrence of a set of literal patterns in one pass."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (pattern length, value) of the pattern ending at a state, if any.
+        self._output: List[Optional[tuple]] = [None]
+        # Nearest state on the failure chain that has an output.
+        self._output_link: List[int] = [0]
+
+    def add(self, pattern: str, value) -> None:
+        state = 0
+        for ch in pattern:
+            following = self._goto[state].get(ch)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][ch] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._output_link.append(0)
+            state = following
+        self._output[state] = (len(pattern), value)
+
+    def build(self) -> "Automaton":
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[following] = target if target != following else 0
+                self._output_link[following] = (
+                    target if self._output[target] is not None else self._output_link[target])
+                queue.append(following)
+        return self
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        """Yield (start, end, value) for every pattern occurrence, overlapping ones included."""
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        state = 0
+        for end, ch in enumerate(text, start=1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = state if output[state] is not None else output_link[state]
+            while found:
+                length, value = output[found]
+                yield end - length, end, value
+                found = output_link[found]
+
+    def find_longest(self, text: str) -> List[Tuple[int, int, object]]:
+        """Leftmost-longest, non-overlapping matches, so "中華民國刑法" is not also read as "刑法"."""
+        chosen = []
+        covered = 0
+        for start, end, value in sorted(self.find_all(text), key=lambda match: (match[0], match[0] - match[1])):
+            if start >= covered:
+                chosen.append((start, end, value))
+                covered = end
+        return chosen
+
+
+def law_patterns(laws: Iterable[LawKey]) -> Dict[str, LawKey]:
+    """Map every official law name, and each unambiguous abbreviation, to its (LawLevel, LawName)."""
+    names = {}
+    for level, name in laws:
+        names.setdefault(law_keys.normalize(name), (level, name))
+
+    aliases: Dict[str, Optional[LawKey]] = {}
+    for name, key in names.items():
+        for prefix in STRIPPED_PREFIXES:
+            if name.startswith(prefix) and len(name) - len(prefix) >= SHORT_NAME_LENGTH:
+                alias = name[len(prefix):]
+                # Two laws shortening to the same alias make it ambiguous.
+                aliases[alias] = key if alias not in aliases else None
+    for alias, name in ABBREVIATIONS.items():
+        if name in names:
+            aliases.setdefault(alias, names[name])
+
+    patterns = dict(names)
+    for alias, key in aliases.items():
+        if key is not None and alias not in patterns:
+            patterns[alias] = key
+    return patterns
+
+
+class CitationExtractor:
+    """Finds law and article citations in free text with one automaton over every law name."""
+
+    def __init__(self, laws: Iterable[LawKey]):
+        self.patterns = law_patterns(laws)
+        self._automaton = Automaton()
+        for pattern, key in self.patterns.items():
+            self._automaton.add(pattern, key)
+        self._automaton.add(SAME_LAW, SAME_LAW)
+        self._automaton.build()
+
+    @staticmethod
+    def _articles(text: str, position: int) -> Iterator[Tuple[int, int]]:
+        """Article keys cited right after `position`, following lists like "第7條、第8條第1項及第23條"."""
+        match = _FIRST_ARTICLE.match(text, position)
+        while match:
+            key = law_keys.match_key(match)
+            if key is not None:
+                yield key
+            match = _NEXT_ARTICLE.match(text, _CLAUSES.match(text, match.end()).end())
+
+    def extract(self, text: str) -> Iterator[Tuple[LawKey, ArticleKey]]:
+        """Yield (law, article) for every citation in `text`; article is None when none is given."""
+        text = law_keys.normalize(text)
+        previous = None
+        for start, end, target in self._automaton.find_longest(text):
+            law = previous if target == SAME_LAW else target
+            if law is None:
+                continue
+            articles = list(self._articles(text, end))
+            if articles:
+                for article in articles:
+                    yield law, article
+            elif target != SAME_LAW and end - start > SHORT_NAME_LENGTH:
+                yield law, None
+            else:
+                continue
+            previous = law
+
+
+def build_citations(session: Session, batch_size: int = 500) -> int:
+    """Rebuild the LawCitation table from every interpretation's text in one pass."""
+    with metrics.stage("citation_extract"):
+        extractor = CitationExtractor(session.execute(select(Law.law_level, Law.law_name)))
+        logger.info(f"Compiled {len(extractor.patterns)} law names and abbreviations")
+        edges = Counter()
+        columns = [getattr(InterpretationsZH, field) for field in CITING_FIELDS]
+        statement = text_store.with_text(session, select(InterpretationsZH.interpretation_number, *columns),
+                                         InterpretationsZH)
+        scanned = 0
+        for partition in session.execute(statement.execution_options(yield_per=batch_size)).mappings().partitions():
+            for row in map(text_store.inline_row, partition):
+                for field in CITING_FIELDS:
+                    text = row.get(field)
+                    if text:
+                        scanned += len(text)
+                        for law, article in extractor.extract(text):
+                            edges[row["interpretation_number"], law, article] += 1
+        metrics.count("citation_chars", scanned)
+
+    rows = [
+        {
+            "interpretation_number": number,
+            "law_level": level,
+            "law_name": name,
+            "article_main": article[0] if article else None,
+            "article_sub": article[1] if article else None,
+            "mentions": mentions,
+        }
+        for (number, (level, name), article), mentions in edges.items()
+    ]
+    with metrics.stage("citation_write"):
+        session.execute(delete(LawCitation))
+        bulk.insert_rows(session, LawCitation, rows)
+        session.commit()
+    metrics.count("rows", len(rows), table=LawCitation.__tablename__, action="insert")
+    logger.info(f"Wrote {len(rows)} citation edges from {scanned} characters of interpretation text")
+    return len(rows)
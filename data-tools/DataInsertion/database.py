@@ -0,0 +1,75 @@
+import logging
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+_engine = None
+_options = {**settings.DEFAULTS, "echo": False}
+
+
+def configure(echo: bool = False, **options) -> None:
+    """Set engine options for this process; only takes effect before the first get_engine()."""
+    if _engine is not None:
+        logger.warning("Engine already created; new connection settings are ignored")
+    _options.update(options, echo=echo)
+
+
+def get_engine():
+    """Create the engine on first use.
+
+    SQLAlchemy, SQLModel and the table models are imported here rather than at module level,
+    so commands that never touch the database do not pay for them.
+    """
+    global _engine
+    if _engine is None:
+        from sqlalchemy import make_url
+        from sqlmodel import create_engine
+
+        import metrics
+        # Registers every table on SQLModel.metadata.
+        import models.changesets
+        import models.citations
+        import models.interpretations
+        import models.law
+        import models.text_blobs
+
+        url = make_url(settings.database_url())
+        kwargs = {"pool_pre_ping": True, "echo": _options["echo"]}
+        if url.get_backend_name() == "sqlite":
+            kwargs["connect_args"] = {"timeout": _options["connect_timeout"]}
+        else:
+            kwargs["connect_args"] = {"connect_timeout": int(_options["connect_timeout"])}
+        if url.database not in (None, "", ":memory:"):
+            kwargs.update(pool_size=_options["pool_size"], max_overflow=_options["max_overflow"],
+                          pool_timeout=_options["pool_timeout"])
+
+        logger.info(f"Using connection string: {url.render_as_string(hide_password=True)}")
+        _engine = create_engine(url, **kwargs)
+        metrics.instrument_engine(_engine)
+    return _engine
+
+
+def add_missing_columns(engine, model) -> None:
+    """Add columns and indexes declared on `model` but missing from its existing table.
+
+    create_all() only creates missing tables; this covers columns added to a model later.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.schema import CreateColumn
+
+    table = model.__table__
+    inspector = inspect(engine)
+    existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+    existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+    with engine.begin() as connection:
+        preparer = engine.dialect.identifier_preparer
+        for column in table.columns:
+            if column.name not in existing_columns:
+                logger.info(f"Adding column {table.name}.{column.name}")
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                logger.info(f"Creating index {index.name}")
+                index.create(connection)
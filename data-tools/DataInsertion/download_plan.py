@@ -0,0 +1,78 @@
+import logging
+import os
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import sqlmodel
+
+from sqlmodel import Session
+
+import downloader
+import metrics
+import opendata
+
+from models import Categories, Resources, ResourceFiles
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadPlan:
+    """Every download target of a catalogue query, resolved to its URL and local path.
+
+    `present` holds the jobs whose file already exists on disk; `missing` the rest.
+    """
+
+    def __init__(self, jobs: List[downloader.DownloadJob]):
+        self.jobs = jobs
+        self.present: List[downloader.DownloadJob] = []
+        self.missing: List[downloader.DownloadJob] = []
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def directories(self) -> Dict[Path, List[downloader.DownloadJob]]:
+        by_directory = defaultdict(list)
+        for job in self.jobs:
+            by_directory[job.path.parent].append(job)
+        return by_directory
+
+    def prepare(self) -> "DownloadPlan":
+        """Create each target directory once and sort the jobs into present and missing.
+
+        Each directory is listed once instead of stat-ing every target file.
+        """
+        self.present.clear()
+        self.missing.clear()
+        for directory, jobs in self.directories().items():
+            directory.mkdir(parents=True, exist_ok=True)
+            names: Set[str] = set(os.listdir(directory))
+            for job in jobs:
+                (self.present if job.path.name in names else self.missing).append(job)
+        metrics.count("download_plan", len(self.present), state="present")
+        metrics.count("download_plan", len(self.missing), state="missing")
+        logger.info(f"Download plan: {len(self.jobs)} files, {len(self.present)} already present, "
+                    f"{len(self.missing)} missing")
+        return self
+
+
+def plan_downloads(session: Session, category_no: Optional[str] = None) -> DownloadPlan:
+    """Resolve the download jobs for every fileset (or those of one category) with a single joined query."""
+    statement = (
+        sqlmodel.select(ResourceFiles.file_set_id, ResourceFiles.resource_description, ResourceFiles.resource_format,
+                        Resources.title, Categories.category_name)
+        .join(Resources, ResourceFiles.dataset_id == Resources.dataset_id)
+        .join(Categories, Resources.category_no == Categories.category_no)
+        .order_by(ResourceFiles.file_set_id)
+    )
+    if category_no is not None:
+        statement = statement.where(Categories.category_no == category_no)
+
+    with metrics.stage("download_plan"):
+        jobs = [
+            downloader.DownloadJob(file_set_id, opendata.file_url(file_set_id),
+                                   opendata.download_path(category_name, title, description, resource_format))
+            for file_set_id, description, resource_format, title, category_name in session.exec(statement)
+        ]
+    return DownloadPlan(jobs)
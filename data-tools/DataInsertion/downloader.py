@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+
+from pathlib import Path
+from typing import AsyncIterable, Iterable, NamedTuple, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+import checkpoint
+import manifest
+import metrics
+import settings
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth another attempt; everything else in 4xx is treated as permanent.
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+DEFAULT_CONCURRENCY = settings.DOWNLOAD_CONCURRENCY
+DEFAULT_PER_HOST = settings.DOWNLOAD_PER_HOST
+DEFAULT_RETRIES = settings.DOWNLOAD_RETRIES
+DEFAULT_BACKOFF = 1.0
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class DownloadJob(NamedTuple):
+    file_set_id: int
+    url: str
+    path: Path
+
+
+class DownloadStats:
+    def __init__(self):
+        self.downloaded = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def __str__(self):
+        return (f"downloaded={self.downloaded} unchanged={self.unchanged} "
+                f"skipped={self.skipped} failed={self.failed}")
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def _retry_delay(attempt: int, backoff: float, response: Optional[httpx.Response] = None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return backoff * (2 ** attempt) + random.uniform(0, backoff)
+
+
+def partial_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+def validator_path(path: Path) -> Path:
+    """Where the ETag/Last-Modified of the response a .part file came from is kept."""
+    return path.with_name(path.name + ".part.validator")
+
+
+def _save_validator(path: Path, response: httpx.Response) -> None:
+    validator = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    validator_path(path).write_text(json.dumps(validator), encoding='utf-8')
+
+
+def _if_range(path: Path) -> Optional[str]:
+    """The If-Range value for resuming `path`, or None when the partial file cannot be matched to a version."""
+    try:
+        validator = json.loads(validator_path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    etag = validator.get("etag")
+    # If-Range only accepts strong entity tags.
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validator.get("last_modified")
+
+
+def _discard_partial(path: Path) -> None:
+    partial_path(path).unlink(missing_ok=True)
+    validator_path(path).unlink(missing_ok=True)
+
+
+def _range_is_complete(response: httpx.Response, have: int) -> bool:
+    # A 416 for "bytes=<have>-" carries "Content-Range: bytes */<total>"; equal sizes mean nothing is left to fetch.
+    content_range = response.headers.get("Content-Range", "")
+    total = content_range.rpartition("/")[2]
+    return total.isdigit() and int(total) == have
+
+
+def _hash_existing(path: Path, digest) -> None:
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(manifest.HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+
+
+async def _stream_to_file(client: httpx.AsyncClient, job: DownloadJob, chunk_size: int,
+                          conditional: dict) -> Optional[dict]:
+    """Stream a job into `<path>.part`, resuming from its current size, then rename it into place.
+
+    Returns the manifest fields for the finished file, or None when the server reports the
+    local copy is still current (304).
+    """
+    part = partial_path(job.path)
+    have = part.stat().st_size if part.exists() else 0
+    if_range = _if_range(job.path) if have else None
+    if have and if_range is None:
+        logger.info(f"Restarting file {job.file_set_id}: its partial download has no validator to resume against")
+        _discard_partial(job.path)
+        have = 0
+    # Manifest validators describe the finished file, so they are only sent when not resuming a partial one.
+    # If-Range makes the server send the whole file (200) instead of a range when the remote copy changed.
+    headers = {"Range": f"bytes={have}-", "If-Range": if_range} if have else dict(conditional)
+
+    async with client.stream("GET", job.url, headers=headers) as response:
+        if response.status_code == 304:
+            return None
+        if response.status_code == 416 and have:
+            if _range_is_complete(response, have):
+                part.replace(job.path)
+                validator_path(job.path).unlink(missing_ok=True)
+                return {"size": have, "sha256": manifest.hash_file(job.path)}
+            # The partial file no longer matches the remote copy; start over.
+            _discard_partial(job.path)
+            raise httpx.TransportError(f"Stale partial download for file {job.file_set_id}")
+        if response.status_code in RETRY_STATUS_CODES:
+            raise _RetryableStatus(response)
+        response.raise_for_status()
+
+        digest = hashlib.sha256()
+        if response.status_code == 206:
+            if not response.headers.get("Content-Range", "").startswith(f"bytes {have}-"):
+                _discard_partial(job.path)
+                raise httpx.TransportError(f"Unexpected Content-Range for file {job.file_set_id}")
+            mode = 'ab'
+            _hash_existing(part, digest)
+            logger.info(f"Resuming file {job.file_set_id} at byte {have}")
+        else:
+            # The server ignored the Range header, or the file changed since the partial download (If-Range).
+            if have:
+                logger.info(f"Restarting file {job.file_set_id}: the server sent the whole file")
+            mode, have = 'wb', 0
+            _save_validator(job.path, response)
+        expected = response.headers.get("Content-Length")
+
+        with open(part, mode) as f:
+            async for chunk in response.aiter_bytes(chunk_size):
+                f.write(chunk)
+                digest.update(chunk)
+                have += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        # Content-Length counts bytes on the wire, which differs from decoded chunks if the body was compressed.
+        written = response.num_bytes_downloaded
+        metrics.count("download_bytes", written)
+
+    if expected is not None and written != int(expected):
+        # Keep the partial file so the retry resumes from here.
+        raise httpx.TransportError(f"Short read for file {job.file_set_id}: got {written} of {expected} bytes")
+    part.replace(job.path)
+    validator_path(job.path).unlink(missing_ok=True)
+    return {
+        "size": have,
+        "sha256": digest.hexdigest(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+async def _fetch(client: httpx.AsyncClient, job: DownloadJob, retries: int, backoff: float,
+                 conditional: dict, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[dict]:
+    for attempt in range(retries + 1):
+        try:
+            return await _stream_to_file(client, job, chunk_size, conditional)
+        except _RetryableStatus as e:
+            if attempt >= retries:
+                e.response.raise_for_status()
+            delay = _retry_delay(attempt, backoff, e.response)
+            logger.warning(f"Got {e.response.status_code} for file {job.file_set_id}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except httpx.TransportError as e:
+            if attempt >= retries:
+                raise
+            delay = _retry_delay(attempt, backoff)
+            logger.warning(f"Transport error for file {job.file_set_id} ({e!r}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def _worker(client, queue: asyncio.Queue, host_limits: dict, per_host: int, retries: int,
+                  backoff: float, stats: DownloadStats,
+                  download_manifest: Optional[manifest.DownloadManifest],
+                  done: Optional[asyncio.Queue] = None,
+                  journal: Optional[checkpoint.CheckpointJournal] = None) -> None:
+    async def finished(job):
+        if journal is not None:
+            journal.record([job.file_set_id])
+        if done is not None:
+            await done.put(job)
+
+    while True:
+        job = await queue.get()
+        try:
+            conditional = {}
+            if job.path.exists():
+                if download_manifest is not None:
+                    conditional = download_manifest.conditional_headers(job.file_set_id)
+                if not conditional:
+                    logger.info(f"File {job.path} already exists. Skipping download.")
+                    stats.skipped += 1
+                    metrics.count("download_files", status="skipped")
+                    await finished(job)
+                    continue
+            host = urlsplit(job.url).netloc
+            limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+            async with limit:
+                result = await _fetch(client, job, retries, backoff, conditional)
+            if result is None:
+                stats.unchanged += 1
+                metrics.count("download_files", status="unchanged")
+                logger.info(f"File {job.file_set_id} unchanged since last download.")
+                await finished(job)
+                continue
+            if download_manifest is not None:
+                download_manifest.record(job.file_set_id, job.path, **result)
+            stats.downloaded += 1
+            metrics.count("download_files", status="downloaded")
+            logger.info(f"Downloaded file {job.file_set_id} to {job.path}")
+            await finished(job)
+        except (httpx.HTTPStatusError, httpx.TransportError, OSError) as e:
+            stats.failed += 1
+            metrics.count("download_files", status="failed")
+            logger.error(f"Error downloading file {job.file_set_id}: {e}")
+        finally:
+            queue.task_done()
+
+
+async def download_all(jobs: Union[Iterable[DownloadJob], AsyncIterable[DownloadJob]],
+                       concurrency: int = DEFAULT_CONCURRENCY,
+                       per_host: int = DEFAULT_PER_HOST,
+                       retries: int = DEFAULT_RETRIES,
+                       backoff: float = DEFAULT_BACKOFF,
+                       timeout: float = settings.HTTP_TIMEOUT,
+                       download_manifest: Optional[manifest.DownloadManifest] = None,
+                       transport: Optional[httpx.AsyncBaseTransport] = None,
+                       done: Optional[asyncio.Queue] = None,
+                       journal: Optional[checkpoint.CheckpointJournal] = None) -> DownloadStats:
+    """Download jobs over one pooled client with at most `concurrency` transfers in flight.
+
+    When a manifest is given, existing files are revalidated with conditional requests and
+    every completed download is recorded in it. `jobs` may be an async iterable that is still
+    being produced; with a `done` queue, every job whose file is on disk (downloaded, unchanged
+    or already present) is put there for the next stage. With a `journal`, each such job's
+    fileset id is recorded in it as it completes.
+    """
+    stats = DownloadStats()
+    # A bounded queue keeps memory flat even when the catalogue has tens of thousands of files.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    host_limits: dict = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    with metrics.stage("download"):
+        async with httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True,
+                                     transport=transport, event_hooks=metrics.async_http_hooks()) as client:
+            workers = [
+                asyncio.create_task(_worker(client, queue, host_limits, per_host, retries, backoff, stats,
+                                            download_manifest, done, journal))
+                for _ in range(concurrency)
+            ]
+            if isinstance(jobs, AsyncIterable):
+                async for job in jobs:
+                    await queue.put(job)
+            else:
+                for job in jobs:
+                    await queue.put(job)
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    if download_manifest is not None:
+        download_manifest.save()
+    logger.info(f"Download run finished: {stats}")
+    return stats
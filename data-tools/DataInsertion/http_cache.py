@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+import httpx
+
+import metrics
+import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path("cache/http")
+DEFAULT_TTL = settings.METADATA_CACHE_TTL
+
+
+class CachedJson(NamedTuple):
+    data: Any
+    # False when the payload is byte-identical to the one last marked applied for this URL and database.
+    changed: bool
+    digest: str
+
+
+class OfflineCacheMiss(Exception):
+    pass
+
+
+def database_scope(url: str) -> str:
+    # Only a digest of the URL is kept, so database credentials never reach the cache files.
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Persistent cache for the opendata metadata listings, one JSON file per URL.
+
+    A cached response younger than `ttl` seconds is used without a request. Older ones are
+    revalidated with If-None-Match/If-Modified-Since; a 304 keeps the stored body. In
+    offline mode no requests are made and a missing entry raises OfflineCacheMiss.
+
+    Every entry also records, per database `scope` (see database_scope), the digest of the
+    payload last written to that database (`mark_applied`), so callers can skip the upsert
+    when a listing has not changed. Commands that empty or create the tables must call
+    `forget_applied`.
+    """
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL, offline: bool = False,
+                 scope: str = ""):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.offline = offline
+        self.scope = scope
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}.json"
+
+    def _load(self, url: str) -> Optional[dict]:
+        path = self._path(url)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry for {url}: {e}")
+            return None
+
+    def _store(self, url: str, entry: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(url)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _fresh(self, url: str, entry: Optional[dict]) -> Optional[CachedJson]:
+        """Answer from the cache alone, or return None when a request is needed."""
+        if entry is not None and (self.offline or time.time() - entry["fetched_at"] < self.ttl):
+            metrics.count("http_cache", result="fresh")
+            return self._result(entry)
+        if self.offline:
+            raise OfflineCacheMiss(f"No cached response for {url}")
+        return None
+
+    @staticmethod
+    def _request_headers(entry: Optional[dict]) -> dict:
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _update(self, url: str, entry: Optional[dict], response: httpx.Response, endpoint: str) -> CachedJson:
+        if response.status_code == 304 and entry is not None:
+            metrics.count("http_cache", result="revalidated")
+            entry["fetched_at"] = time.time()
+        else:
+            response.raise_for_status()
+            metrics.count("http_cache", result="miss")
+            metrics.count("http_bytes", len(response.content), endpoint=endpoint)
+            entry = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "digest": hashlib.sha256(response.content).hexdigest(),
+                "applied": self._applied(entry),
+                "body": response.text,
+            }
+        self._store(url, entry)
+        return self._result(entry)
+
+    @staticmethod
+    def _applied(entry: Optional[dict]) -> dict:
+        applied = (entry or {}).get("applied")
+        # Entries written before markers were scoped hold a bare digest; treat them as never applied.
+        return dict(applied) if isinstance(applied, dict) else {}
+
+    def _result(self, entry: dict) -> CachedJson:
+        changed = entry["digest"] != self._applied(entry).get(self.scope)
+        return CachedJson(json.loads(entry["body"]), changed, entry["digest"])
+
+    def get_json(self, client: httpx.Client, url: str, endpoint: str = "metadata") -> CachedJson:
+        entry = self._load(url)
+        cached = self._fresh(url, entry)
+        if cached is not None:
+            return cached
+        return self._update(url, entry, client.get(url, headers=self._request_headers(entry)), endpoint)
+
+    async def aget_json(self, client: httpx.AsyncClient, url: str, endpoint: str = "metadata") -> CachedJson:
+        entry = self._load(url)
+        cached = self._fresh(url, entry)
+        if cached is not None:
+            return cached
+        return self._update(url, entry, await client.get(url, headers=self._request_headers(entry)), endpoint)
+
+    def mark_applied(self, url: str, digest: str) -> None:
+        """Record that the payload with `digest` has been written to the database."""
+        entry = self._load(url)
+        if entry is not None and self._applied(entry).get(self.scope) != digest:
+            entry["applied"] = {**self._applied(entry), self.scope: digest}
+            self._store(url, entry)
+
+    def forget_applied(self) -> None:
+        """Drop this scope's markers, so the next update writes every listing again."""
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            applied = self._applied(entry)
+            if applied.pop(self.scope, None) is not None:
+                entry["applied"] = applied
+                self._store(entry["url"], entry)
@@ -0,0 +1,467 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import zipfile
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import groupby
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import delete, select
+from sqlmodel import Session
+
+import bulk
+import changesets
+import checkpoint
+import metrics
+import search_index
+import settings
+import text_store as text_store_module
+
+from models.interpretations import Interpretations, InterpretationsEN, InterpretationsZH, InterpretationAdditions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMIT_EVERY = settings.INTERPRETATION_COMMIT_EVERY
+DEFAULT_PARSE_CHUNK = 16
+INTERPRETATION_DATE_FORMAT = "%Y/%m/%d 上午 12:00:00"
+ADDITION_BASE_URL = "https://cons.judicial.gov.tw"
+
+# Autoincrement keys are left for the database to assign.
+SURROGATE_KEYS = ("id", "addition_id")
+
+# The parts of a record_document, in the order document_digest combines them.
+DOCUMENT_PARTS = ("interpretation", "zh", "en", "additions")
+
+# Children before parents, so deleting in this order never violates a foreign key.
+TABLES = (InterpretationAdditions, InterpretationsEN, InterpretationsZH, Interpretations)
+
+
+class InterpretationRecord(NamedTuple):
+    interpretation: dict
+    zh: dict
+    en: Optional[dict]
+    additions: List[dict]
+
+
+def parse_record(data_wrapper: dict) -> InterpretationRecord:
+    """Turn one interpretation JSON document into attribute-keyed rows for the four tables."""
+    data = data_wrapper.get("data", {})
+    inte_no = data.get("inte_no", "")
+
+    interpretation_date = data.get("inte_date")
+    if interpretation_date:
+        interpretation_date = datetime.strptime(interpretation_date, INTERPRETATION_DATE_FORMAT).date()
+
+    interpretation = {
+        "interpretation_number": inte_no,
+        "interpretation_date": interpretation_date or None,
+        "source_url": data.get("data_url", ""),
+        "order": data.get("inte_order", ""),
+        "order_title": data.get("inte_order_title", ""),
+        "order_change": data.get("inte_order_change", ""),
+        "number_change": data.get("inte_no_chg", ""),
+        "announcement_order": data.get("inte_announcement_order_en", ""),
+        "amendment_order": data.get("inte_amendment_order_en", ""),
+    }
+    zh = {
+        "interpretation_number": inte_no,
+        "number_title": data.get("inte_no_title"),
+        "issue": data.get("inte_issue"),
+        "description": data.get("inte_desc"),
+        "reasoning": data.get("inte_reason"),
+        "other_documents": data.get("other_doc"),
+        "interpretation_kind_1": data.get("inte_kind_1"),
+        "interpretation_kind_2": data.get("inte_kind_2"),
+        "fact": data.get("inte_fact"),
+    }
+    en = None
+    if data.get("inte_no_title_en") or data.get("inte_issue_en"):
+        en = {
+            "interpretation_number": inte_no,
+            "number_title": data.get("inte_no_title_en"),
+            "issue": data.get("inte_issue_en"),
+            "description": data.get("inte_desc_en"),
+            "reasoning": data.get("inte_reason_en"),
+            "fact": data.get("inte_fact_en"),
+            "other_opinion": data.get("inte_opinions_en"),
+            "constitutional_complaint": data.get("inte_constitutional_complaint_en"),
+            "decision": data.get("inte_decision_en"),
+            "regulations": data.get("inte_regulations_en"),
+            "appendix": data.get("inte_appendix_en"),
+        }
+    additions = [
+        {
+            "interpretation_number": inte_no,
+            "description": desc,
+            "url": url if url.startswith("http") else f"{ADDITION_BASE_URL}{url}",
+        }
+        for desc, url in data_wrapper.get("addition", {}).items()
+        if url
+    ]
+    return InterpretationRecord(interpretation, zh, en, additions)
+
+
+def _canonical(row: dict) -> dict:
+    # Parsed dates are read back from the DateTime column as midnight datetimes, and NULLs,
+    # surrogate keys and text-store hashes depend on how a row was written rather than on what it says.
+    return {
+        name: value.date() if isinstance(value, datetime) else value
+        for name, value in row.items()
+        if value is not None and name not in SURROGATE_KEYS and name not in text_store_module.HASH_COLUMNS
+    }
+
+
+def _sorted_additions(additions) -> List[dict]:
+    return sorted((_canonical(addition) for addition in additions),
+                  key=lambda addition: (addition.get("description", ""), addition.get("url", "")))
+
+
+def record_document(record: InterpretationRecord) -> dict:
+    """The record's content in a form that compares equal however it was stored; used in change-sets."""
+    return {
+        "interpretation": _canonical(record.interpretation),
+        "zh": _canonical(record.zh),
+        "en": _canonical(record.en) if record.en else None,
+        "additions": _sorted_additions(record.additions),
+    }
+
+
+def _part_digest(value) -> str:
+    return hashlib.sha256(changesets.dumps(value).encode('utf-8')).hexdigest()
+
+
+def _combine(part_digests: List[str]) -> str:
+    return hashlib.sha256("".join(part_digests).encode('ascii')).hexdigest()
+
+
+def document_digest(document: dict) -> str:
+    # Built from one digest per part, so stored_digests can compute it a table at a time.
+    return _combine([_part_digest(document[part]) for part in DOCUMENT_PARTS])
+
+
+def stored_digests(session: Session, batch_size: int = bulk.DEFAULT_BATCH_SIZE) -> Dict[str, str]:
+    """document_digest of every stored interpretation, by number, with text-store bodies inlined.
+
+    Each table is streamed on its own and only the digest of each row is kept, so memory
+    grows with the number of interpretations rather than the size of their text.
+    """
+    empty = [_part_digest(value) for value in ({}, {}, None, [])]
+    parts: Dict[str, List[str]] = {}
+    for index, model in enumerate((Interpretations, InterpretationsZH, InterpretationsEN)):
+        statement = select(*text_store_module.columns(model))
+        if model in text_store_module.REFERENCING_MODELS:
+            statement = text_store_module.with_text(session, statement, model)
+        for partition in session.execute(statement.execution_options(yield_per=batch_size)).mappings().partitions():
+            for row in map(text_store_module.inline_row, partition):
+                parts.setdefault(row["interpretation_number"], list(empty))[index] = _part_digest(_canonical(row))
+    statement = (select(*text_store_module.columns(InterpretationAdditions))
+                 .order_by(InterpretationAdditions.interpretation_number)
+                 .execution_options(yield_per=batch_size))
+    rows = (row for partition in session.execute(statement).mappings().partitions() for row in partition)
+    for number, additions in groupby(rows, key=lambda row: row["interpretation_number"]):
+        parts.setdefault(number, list(empty))[3] = _part_digest(_sorted_additions(additions))
+    return {number: _combine(digests) for number, digests in parts.items()}
+
+
+class JsonSource(NamedTuple):
+    """A loose JSON file, or a JSON member inside a downloaded .zip archive."""
+    path: Path
+    member: Optional[str] = None
+
+
+def _archive_sources(archive: Path) -> List[JsonSource]:
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            return [
+                JsonSource(archive, info.filename)
+                for info in zf.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(".json")
+            ]
+    except zipfile.BadZipFile as e:
+        logger.error(f"Skipping unreadable archive {archive}: {e}")
+        return []
+
+
+def find_sources(path: Path) -> List[JsonSource]:
+    """List JSON inputs under `path` (a directory or a single archive), reading .zip archives in place.
+
+    Loose files named like a member of an archive in the same tree are taken to be extracted
+    copies of it and skipped, so each document is read once.
+    """
+    if path.is_file():
+        return _archive_sources(path) if path.suffix.lower() == ".zip" else [JsonSource(path)]
+    sources = []
+    for file in sorted(path.glob("**/*")):
+        suffix = file.suffix.lower()
+        if suffix == ".json":
+            sources.append(JsonSource(file))
+        elif suffix == ".zip":
+            sources.extend(_archive_sources(file))
+        elif suffix == ".7z":
+            logger.warning(f"Skipping {file}: .7z archives must be extracted first")
+    member_names = {PurePosixPath(source.member).name for source in sources if source.member is not None}
+    extracted = {source for source in sources if source.member is None and source.path.name in member_names}
+    if extracted:
+        logger.info(f"Skipping {len(extracted)} JSON files that are also inside a .zip archive")
+    return [source for source in sources if source not in extracted]
+
+
+def parse_files(sources: List[JsonSource]) -> List[InterpretationRecord]:
+    """Worker entry point: read, decode and normalise a chunk of sources."""
+    records = []
+    archives = {}
+    try:
+        for source in sources:
+            if source.member is None:
+                with open(source.path, 'r', encoding='utf-8-sig') as f:
+                    records.append(parse_record(json.load(f)))
+                continue
+            if source.path not in archives:
+                archives[source.path] = zipfile.ZipFile(source.path)
+            # Members are decoded straight from the archive stream; nothing is extracted to disk.
+            with archives[source.path].open(source.member) as raw:
+                records.append(parse_record(json.load(io.TextIOWrapper(raw, encoding='utf-8-sig'))))
+    finally:
+        for archive in archives.values():
+            archive.close()
+    return records
+
+
+def iter_records(path: Path, workers: int = 1, chunk_size: int = DEFAULT_PARSE_CHUNK) -> Iterator[InterpretationRecord]:
+    """Yield parsed records for every JSON file or archived JSON member under `path`, in sorted order.
+
+    With more than one worker, chunks of sources are parsed in a process pool. Only a bounded
+    window of chunks is in flight at once, so a slow writer never lets parsed records pile up.
+    """
+    sources = find_sources(path)
+    chunks = [sources[start:start + chunk_size] for start in range(0, len(sources), chunk_size)]
+    if workers <= 1:
+        for chunk in chunks:
+            yield from parse_files(chunk)
+        return
+
+    # Spawned workers never inherit the caller's open session or locks held by its threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(parse_files, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class DatabaseSink:
+    """Writes records with executemany inserts.
+
+    By default the interpretation tables are cleared first. With `replace=False` existing rows
+    are kept and each batch only replaces the interpretations it contains, so loading the same
+    file twice is harmless. Either way, an interpretation that appears twice in one load is
+    stored once, from its later copy.
+
+    With a `journal`, the numbers of every committed batch are recorded in it and numbers it
+    already holds are skipped; resume with `replace=False` so committed rows are kept. With a
+    `text_store`, the ZH/EN text fields are stored there and the rows only keep the hash.
+
+    With `changes`, every batch stores a change-set of the interpretations whose content is
+    new or differs from what was stored before the load, plus, after a full reload, those
+    the source no longer has.
+    """
+
+    def __init__(self, session: Session, commit_every: int = DEFAULT_COMMIT_EVERY,
+                 index: Optional[search_index.SearchIndex] = None, replace: bool = True,
+                 journal: Optional[checkpoint.CheckpointJournal] = None,
+                 text_store: Optional[text_store_module.TextStore] = None,
+                 changes: Optional[changesets.ChangeRecorder] = None):
+        self.session = session
+        self.commit_every = commit_every
+        self.index = index
+        self.replace = replace
+        self.journal = journal
+        self.text_store = text_store
+        self.changes = changes
+        # Read before a full reload clears the tables.
+        self._digests = stored_digests(session) if changes is not None else {}
+        self._seen = set()
+        self.total = 0
+        self.resumed = 0
+        self._rows = {model: [] for model in TABLES}
+        self._records: List[InterpretationRecord] = []
+        self._numbers = set()
+        self._written = set()
+        self._repeated = set()
+        self._pending = 0
+        if replace:
+            for model in TABLES:
+                session.execute(delete(model))
+            if index is not None:
+                index.remove_interpretations()
+
+    def write(self, record: InterpretationRecord) -> None:
+        number = record.interpretation["interpretation_number"]
+        if self.journal is not None and number in self.journal:
+            self.resumed += 1
+            return
+        if number in self._numbers:
+            # A repeated number within one batch would collide with its own insert.
+            self.flush()
+        if self.replace and number in self._written:
+            # The tables were cleared once up front, so a number seen again must replace its own earlier rows.
+            self._repeated.add(number)
+        self._written.add(number)
+        self._numbers.add(number)
+        if self.changes is not None:
+            self._record_change(record)
+        self._rows[Interpretations].append(record.interpretation)
+        self._rows[InterpretationsZH].append(self._stored(InterpretationsZH, record.zh))
+        if record.en:
+            self._rows[InterpretationsEN].append(self._stored(InterpretationsEN, record.en))
+        self._rows[InterpretationAdditions].extend(record.additions)
+        if self.index is not None:
+            self._records.append(record)
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+
+    def _record_change(self, record: InterpretationRecord) -> None:
+        number = record.interpretation["interpretation_number"]
+        self._seen.add(number)
+        document = record_document(record)
+        digest = document_digest(document)
+        previous = self._digests.get(number)
+        if digest != previous:
+            op = changesets.INSERT if previous is None else changesets.UPDATE
+            self.changes.record(op, changesets.INTERPRETATION, {"interpretation_number": number}, document)
+            self._digests[number] = digest
+
+    def _stored(self, model, row: dict) -> dict:
+        return self.text_store.body_row(model, row) if self.text_store is not None else row
+
+    def flush(self) -> None:
+        if not self._pending:
+            if self.changes is not None:
+                self.changes.flush()
+            self.session.commit()
+            if self.index is not None:
+                self.index.commit()
+            return
+        with metrics.stage("interpretation_flush"):
+            numbers = sorted(self._repeated) if self.replace else list(self._numbers)
+            if numbers:
+                for model in TABLES:
+                    for start in range(0, len(numbers), bulk.DEFAULT_BATCH_SIZE):
+                        self.session.execute(delete(model).where(
+                            model.interpretation_number.in_(numbers[start:start + bulk.DEFAULT_BATCH_SIZE])))
+                if self.index is not None:
+                    self.index.remove_interpretations(numbers)
+            if self.text_store is not None:
+                self.text_store.flush()
+            for model in reversed(TABLES):
+                metrics.count("rows", len(self._rows[model]), table=model.__tablename__, action="insert")
+                bulk.insert_rows(self.session, model, self._rows[model])
+                self._rows[model].clear()
+            if self.changes is not None:
+                self.changes.flush()
+            self.session.commit()
+            if self.journal is not None:
+                self.journal.record(sorted(self._numbers))
+            if self.index is not None:
+                self.index.add_documents(
+                    document for record in self._records for document in search_index.interpretation_documents(record))
+                self.index.commit()
+                self._records.clear()
+        self.total += self._pending
+        logger.info(f"Committed {self._pending} interpretations, {self.total} so far")
+        self._numbers.clear()
+        self._repeated.clear()
+        self._pending = 0
+
+    def close(self) -> None:
+        if self.changes is not None and self.replace:
+            for number in sorted(self._digests.keys() - self._seen):
+                self.changes.record(changesets.DELETE, changesets.INTERPRETATION, {"interpretation_number": number})
+        self.flush()
+
+
+def escape_sql(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, date):
+        return f"'{value:%Y-%m-%d}'"
+    # MySQL treats backslash as an escape character by default, so it is doubled as well.
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+class SqlFileSink:
+    """Streams one INSERT per row to a .sql file instead of building the script in memory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.total = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write("-- Clear existing interpretation data\n")
+        for model in TABLES:
+            self._file.write(f"DELETE FROM {model.__tablename__};\n")
+        self._file.write("\n-- Insert new interpretation data\n")
+
+    def _insert(self, model, row: dict) -> None:
+        names = bulk.column_names(model)
+        columns = ", ".join(f"`{names[attr]}`" for attr in row)
+        values = ", ".join(escape_sql(value) for value in row.values())
+        self._file.write(f"INSERT INTO {model.__tablename__} ({columns}) VALUES ({values});\n")
+
+    def write(self, record: InterpretationRecord) -> None:
+        self._insert(Interpretations, record.interpretation)
+        self._insert(InterpretationsZH, record.zh)
+        if record.en:
+            self._insert(InterpretationsEN, record.en)
+        for addition in record.additions:
+            self._insert(InterpretationAdditions, addition)
+        self.total += 1
+
+    def close(self) -> None:
+        self._file.close()
+        logger.info(f"SQL statements written to {self.path}")
+
+
+class CsvSink:
+    """Streams rows to one CSV file per table, suitable for LOAD DATA INFILE."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.total = 0
+        directory.mkdir(parents=True, exist_ok=True)
+        self._files = {}
+        self._writers = {}
+        for model in TABLES:
+            f = open(directory / f"{model.__tablename__}.csv", 'w', encoding='utf-8', newline='')
+            columns = [attr for attr in bulk.column_names(model)
+                       if attr not in SURROGATE_KEYS and attr not in text_store_module.HASH_COLUMNS]
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            self._files[model] = f
+            self._writers[model] = writer
+
+    def write(self, record: InterpretationRecord) -> None:
+        interpretation = dict(record.interpretation)
+        if interpretation["interpretation_date"]:
+            interpretation["interpretation_date"] = f"{interpretation['interpretation_date']:%Y-%m-%d %H:%M:%S}"
+        self._writers[Interpretations].writerow(interpretation)
+        self._writers[InterpretationsZH].writerow(record.zh)
+        if record.en:
+            self._writers[InterpretationsEN].writerow(record.en)
+        self._writers[InterpretationAdditions].writerows(record.additions)
+        self.total += 1
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        logger.info(f"CSV files written to {self.directory}")
@@ -0,0 +1,67 @@
+import re
+import unicodedata
+
+from typing import Optional, Tuple
+
+_DIGITS = {
+    "零": 0, "〇": 0, "一": 1, "壹": 1, "二": 2, "兩": 2, "貳": 2, "三": 3, "參": 3, "四": 4, "肆": 4,
+    "五": 5, "伍": 5, "六": 6, "陸": 6, "七": 7, "柒": 7, "八": 8, "捌": 8, "九": 9, "玖": 9,
+}
+_UNITS = {"十": 10, "拾": 10, "百": 100, "佰": 100, "千": 1000, "仟": 1000}
+
+# Arabic or Chinese numerals, after NFKC has folded full-width digits.
+NUMBER = r"[0-9]+|[零〇一壹二兩貳三參四肆五伍六陸七柒八捌九玖十拾百佰千仟萬]+"
+
+# 第15條, 第 15-1 條, 第十五條之一
+ARTICLE = re.compile(rf"第\s*({NUMBER})\s*(?:-\s*({NUMBER})\s*)?條(?:\s*之\s*({NUMBER}))?")
+
+_VARIANTS = str.maketrans({"台": "臺"})
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text)
+
+
+def law_name_key(law_name: str) -> str:
+    """Law name folded for exact lookups: NFKC, no whitespace, 台 spelled 臺."""
+    return _SPACES.sub("", normalize(law_name or "")).translate(_VARIANTS)
+
+
+def parse_number(text: str) -> Optional[int]:
+    """Value of an Arabic or Chinese numeral ("184", "一百八十四", "十五"), or None if it is neither."""
+    if text.isdigit():
+        return int(text)
+    total = section = digit = 0
+    seen = False
+    for ch in text:
+        if ch in _DIGITS:
+            digit = _DIGITS[ch]
+        elif ch in _UNITS:
+            # A bare unit counts as one of it: 十五 is 15.
+            section += (digit or 1) * _UNITS[ch]
+            digit = 0
+        elif ch == "萬":
+            total += (section + digit) * 10000
+            section = digit = 0
+        else:
+            return None
+        seen = True
+    return total + section + digit if seen else None
+
+
+def article_key(article_no: str) -> Optional[Tuple[int, int]]:
+    """(main, sub) number of an article reference such as "第 15 條" or "第15條之1"; sub is 0 when absent."""
+    match = ARTICLE.search(normalize(article_no or ""))
+    if not match:
+        return None
+    return match_key(match)
+
+
+def match_key(match: re.Match) -> Optional[Tuple[int, int]]:
+    main = parse_number(match.group(1))
+    sub_text = match.group(2) or match.group(3)
+    sub = parse_number(sub_text) if sub_text else 0
+    if main is None or sub is None:
+        return None
+    return main, sub
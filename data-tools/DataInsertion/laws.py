@@ -0,0 +1,546 @@
+import io
+import json
+import logging
+import multiprocessing
+import re
+import tempfile
+import zipfile
+import zlib
+
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlmodel import Session
+
+import bulk
+import changesets
+import checkpoint
+import database
+import law_keys
+import metrics
+import search_index
+import settings
+import text_store as text_store_module
+
+from models.law import Law, LawAttachment, LawArticle, LawCaption
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+DEFAULT_COMMIT_EVERY = settings.LAW_COMMIT_EVERY
+DEFAULT_COMMIT_ROWS = settings.LAW_COMMIT_ROWS
+LAW_DATE_FORMATS = ("%Y%m%d", "%Y-%m-%d", "%Y/%m/%d")
+# Law row attributes that identify a law, and those left out of change-set data.
+LAW_KEY_ATTRS = ("law_level", "law_name")
+LAW_TIMESTAMP_ATTRS = ("created_at", "updated_at")
+
+# The dump is {"UpdateDate": ..., "Laws": [ {...}, {...} ]}; only the array start needs locating.
+_LAWS_ARRAY = re.compile(r'"Laws"\s*:\s*\[')
+_WHITESPACE = " \t\r\n"
+
+
+@contextmanager
+def open_law_dump(path: Path) -> Iterator[TextIO]:
+    """Open a law dump as text, reading the JSON member of a .zip download without extracting it."""
+    if path.suffix.lower() != ".zip":
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as zf:
+        members = [name for name in zf.namelist() if name.lower().endswith(".json")]
+        if len(members) != 1:
+            raise ValueError(f"Expected one JSON file in {path}, found {len(members)}")
+        with zf.open(members[0]) as raw:
+            yield io.TextIOWrapper(raw, encoding='utf-8-sig')
+
+
+def load_laws(path: Path) -> Iterator[dict]:
+    """Load the whole dump with json.load and yield its Laws entries."""
+    with open_law_dump(path) as f:
+        yield from json.load(f).get("Laws", [])
+
+
+def iter_laws(path: Path, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[dict]:
+    """Incrementally yield one element of the dump's Laws array at a time.
+
+    Only the current law and one read chunk are held in memory, so peak usage depends on
+    the largest single law rather than on the whole corpus. `utf-8-sig` strips the BOM
+    that the national law dumps start with.
+    """
+    decoder = json.JSONDecoder()
+    with open_law_dump(path) as f:
+        buf = ""
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                logger.warning(f"No Laws array found in {path}")
+                return
+            buf += chunk
+            match = _LAWS_ARRAY.search(buf)
+            if match:
+                buf = buf[match.end():]
+                break
+            # Keep a short tail in case the key straddles two chunks.
+            buf = buf[-32:]
+
+        pos = 0
+        while True:
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or buf[pos] == ","):
+                pos += 1
+            if pos >= len(buf):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"Unterminated Laws array in {path}")
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                law, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The element is cut off at the end of the buffer; read more and retry.
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield law
+            pos = end
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def parse_law_date(value) -> Optional[date]:
+    if not value:
+        return None
+    for fmt in LAW_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    logger.warning(f"Unrecognised law date: {value!r}")
+    return None
+
+
+def law_row(law: dict, now: datetime) -> dict:
+    law_has_eng_version = law.get("LawHasEngVersion", False)
+    if isinstance(law_has_eng_version, str):
+        law_has_eng_version = law_has_eng_version.upper() == 'Y'
+
+    return {
+        "law_level": law.get("LawLevel"),
+        "law_name": law.get("LawName"),
+        "law_url": law.get("LawURL"),
+        "law_category": law.get("LawCategory"),
+        "law_modified_date": parse_law_date(law.get("LawModifiedDate")),
+        "law_effective_date": parse_law_date(law.get("LawEffectiveDate")),
+        "law_effective_note": law.get("LawEffectiveNote"),
+        "law_abandon_note": law.get("LawAbandonNote"),
+        "law_histories": law.get("LawHistories"),
+        "law_has_eng_version": law_has_eng_version,
+        "eng_law_name": law.get("EngLawName"),
+        "law_foreword": law.get("LawForeword"),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def article_keys(law_name: str, article_no: Optional[str]) -> dict:
+    """The indexed lookup columns of a LawArticle row."""
+    article = law_keys.article_key(article_no)
+    return {
+        "law_name_key": law_keys.law_name_key(law_name),
+        "article_main": article[0] if article else None,
+        "article_sub": article[1] if article else None,
+    }
+
+
+def find_article(session: Session, law_name: str, article_no: str) -> Optional[dict]:
+    """Look up one article by law name and any spelling of its number, through the article-key index.
+
+    Returns the attribute-keyed row, with text kept in the text store put back in place.
+    """
+    article = law_keys.article_key(article_no)
+    if article is None:
+        return None
+    statement = select(*text_store_module.columns(LawArticle)).where(
+        LawArticle.law_name_key == law_keys.law_name_key(law_name),
+        LawArticle.article_main == article[0],
+        LawArticle.article_sub == article[1],
+    ).limit(1)
+    row = session.execute(text_store_module.with_text(session, statement, LawArticle)).mappings().first()
+    return text_store_module.inline_row(row) if row is not None else None
+
+
+def backfill_article_keys(session: Session, batch_size: int = bulk.DEFAULT_BATCH_SIZE) -> int:
+    """Add the article-key columns and index to an existing LawArticle table and fill rows that lack them.
+
+    Cheap when every row already has its keys, so importers run it before writing.
+    """
+    database.add_missing_columns(session.get_bind(), LawArticle)
+    filled = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(LawArticle.id, LawArticle.law_name, LawArticle.article_no)
+            .where(LawArticle.id > last_id, LawArticle.law_name_key.is_(None))
+            .order_by(LawArticle.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        bulk.update_rows(session, LawArticle, [
+            {"id": article_id, **article_keys(law_name, article_no)} for article_id, law_name, article_no in rows
+        ], batch_size)
+        session.commit()
+        filled += len(rows)
+        last_id = rows[-1][0]
+    metrics.count("rows", filled, table=LawArticle.__tablename__, action="backfill")
+    if filled:
+        logger.info(f"Backfilled article keys for {filled} articles")
+    return filled
+
+
+def next_caption_id(session: Session) -> int:
+    return (session.execute(select(func.max(LawCaption.id))).scalar() or 0) + 1
+
+
+def delete_law_children(session: Session, keys: List[tuple], batch_size: int = bulk.DEFAULT_BATCH_SIZE) -> None:
+    """Delete the articles, captions and attachments of the given (LawLevel, LawName) keys."""
+    # Articles reference captions, so they go first.
+    for model in (LawArticle, LawCaption, LawAttachment):
+        for batch in bulk.batched(keys, batch_size):
+            session.execute(delete(model).where(tuple_(model.law_level, model.law_name).in_(batch)))
+
+
+def stored_articles(session: Session, keys: List[tuple],
+                    batch_size: int = bulk.DEFAULT_BATCH_SIZE) -> Dict[tuple, Dict[str, str]]:
+    """Content hash of every stored article of the given laws, by (LawLevel, LawName) and ArticleNo."""
+    articles = defaultdict(dict)
+    columns = [LawArticle.law_level, LawArticle.law_name, LawArticle.article_no, LawArticle.article_content]
+    if text_store_module.has_store(session, LawArticle):
+        columns.append(LawArticle.content_hash)
+    for batch in bulk.batched(keys, batch_size):
+        for level, name, article_no, content, *digest in session.execute(
+                select(*columns).where(tuple_(LawArticle.law_level, LawArticle.law_name).in_(batch))):
+            articles[level, name][article_no] = (digest and digest[0]) or text_store_module.content_hash(content or "")
+    return articles
+
+
+class LawWriter:
+    """Buffers laws and writes them with executemany inserts, committing every `commit_every` laws
+    or `commit_rows` child rows, whichever comes first.
+
+    Caption ids are assigned client-side from a range starting above the current MAX(Id),
+    so article rows can reference their caption without flushing each caption. Writers that
+    run at the same time must each be given a disjoint block through `first_caption_id`.
+
+    In incremental mode the stored LawModifiedDate of every law is loaded up front; laws
+    whose date is unchanged are skipped and changed laws have their row updated and their
+    captions, articles and attachments replaced.
+
+    With a `journal`, the keys of every committed batch are recorded in it and laws it
+    already holds are skipped, so a resumed import continues after the last commit. When
+    resuming, laws already in the table are skipped too: the batch committed just before a
+    crash may be missing from the journal. With a
+    `text_store`, article text is written to it and LawArticle only keeps the hash. With
+    `changes`, every batch stores the laws it inserted or updated and the articles it
+    inserted, updated or deleted as a change-set in the same transaction.
+    """
+
+    def __init__(self, session: Session, commit_every: int = DEFAULT_COMMIT_EVERY,
+                 batch_size: int = bulk.DEFAULT_BATCH_SIZE, incremental: bool = False,
+                 index: Optional[search_index.SearchIndex] = None, first_caption_id: Optional[int] = None,
+                 commit_rows: int = DEFAULT_COMMIT_ROWS, journal: Optional[checkpoint.CheckpointJournal] = None,
+                 text_store: Optional[text_store_module.TextStore] = None,
+                 changes: Optional[changesets.ChangeRecorder] = None):
+        self.session = session
+        self.index = index
+        self.commit_every = commit_every
+        self.commit_rows = commit_rows
+        self.journal = journal
+        self.text_store = text_store
+        self.changes = changes
+        self.batch_size = batch_size
+        if first_caption_id is None:
+            first_caption_id = next_caption_id(session)
+        self.next_caption_id = first_caption_id
+        self.total = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.incremental = incremental
+        self._known = {}
+        if incremental:
+            self._known = {
+                (level, name): modified
+                for level, name, modified in session.execute(
+                    select(Law.law_level, Law.law_name, Law.law_modified_date))
+            }
+        # Incremental mode already skips stored laws whose date is unchanged.
+        self._committed = set()
+        if journal is not None and journal.resume and not incremental:
+            self._committed = {(level, name) for level, name in session.execute(select(Law.law_level, Law.law_name))}
+        self._laws: List[dict] = []
+        self._changed_laws: List[dict] = []
+        self._attachments: List[dict] = []
+        self._captions: List[dict] = []
+        self._articles: List[dict] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, law: dict) -> None:
+        row = law_row(law, datetime.now())
+        key = {"law_level": row["law_level"], "law_name": row["law_name"]}
+        known_key = (row["law_level"], row["law_name"])
+        if self.journal is not None and (known_key in self.journal or known_key in self._committed):
+            self.resumed += 1
+            return
+        if known_key in self._known:
+            modified = self._known[known_key]
+            if modified is not None and modified == row["law_modified_date"]:
+                self.skipped += 1
+                return
+            del row["created_at"]
+            self._changed_laws.append(row)
+        else:
+            self._laws.append(row)
+
+        for attachment in law.get("LawAttachements", []):
+            self._attachments.append({
+                **key,
+                "file_name": attachment.get("FileName"),
+                "file_url": attachment.get("FileURL"),
+            })
+
+        caption_id = None
+        for article in law.get("LawArticles", []):
+            if article.get("ArticleType") == "C":
+                caption_id = self.next_caption_id
+                self.next_caption_id += 1
+                self._captions.append({**key, "id": caption_id, "caption_title": article.get("ArticleContent")})
+            else:
+                self._articles.append({
+                    **key,
+                    "caption_id": caption_id,
+                    "article_no": article.get("ArticleNo"),
+                    "article_content": article.get("ArticleContent"),
+                    **article_keys(row["law_name"], article.get("ArticleNo")),
+                })
+
+        pending_rows = len(self._attachments) + len(self._captions) + len(self._articles)
+        if len(self._laws) + len(self._changed_laws) >= self.commit_every or pending_rows >= self.commit_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._laws and not self._changed_laws:
+            return
+        with metrics.stage("law_flush"):
+            changed_keys = [(row["law_level"], row["law_name"]) for row in self._changed_laws]
+            previous = {}
+            if changed_keys:
+                if self.changes is not None:
+                    previous = stored_articles(self.session, changed_keys, self.batch_size)
+                delete_law_children(self.session, changed_keys, self.batch_size)
+                bulk.update_rows(self.session, Law, self._changed_laws, self.batch_size)
+            # Parents before children so the foreign keys resolve inside the batch.
+            bulk.insert_rows(self.session, Law, self._laws, self.batch_size)
+            bulk.insert_rows(self.session, LawAttachment, self._attachments, self.batch_size)
+            bulk.insert_rows(self.session, LawCaption, self._captions, self.batch_size)
+            articles = self._articles
+            if self.text_store is not None:
+                articles = [self.text_store.article_row(row) for row in articles]
+                self.text_store.flush()
+            bulk.insert_rows(self.session, LawArticle, articles, self.batch_size)
+            if self.changes is not None:
+                self._record_changes(previous)
+                self.changes.flush()
+            self.session.commit()
+            if self.journal is not None:
+                self.journal.record(changed_keys + [(row["law_level"], row["law_name"]) for row in self._laws])
+            if self.index is not None:
+                self.index.remove_laws(changed_keys)
+                self.index.add_documents(search_index.article_document(row) for row in self._articles)
+                self.index.commit()
+        written = len(self._laws) + len(self._changed_laws)
+        self.total += written
+        metrics.count("rows", len(self._laws), table=Law.__tablename__, action="insert")
+        metrics.count("rows", len(self._changed_laws), table=Law.__tablename__, action="update")
+        metrics.count("rows", len(self._articles), table=LawArticle.__tablename__, action="insert")
+        logger.info(f"Committed {len(self._laws)} new and {len(self._changed_laws)} changed laws "
+                    f"({len(self._articles)} articles), {self.total} so far")
+        self._laws.clear()
+        self._changed_laws.clear()
+        self._attachments.clear()
+        self._captions.clear()
+        self._articles.clear()
+
+    def _record_changes(self, previous: Dict[tuple, Dict[str, str]]) -> None:
+        """Record the buffered laws, and how their articles differ from the `previous` stored ones."""
+        for op, rows in ((changesets.INSERT, self._laws), (changesets.UPDATE, self._changed_laws)):
+            for row in rows:
+                self.changes.record(op, changesets.LAW, {attr: row[attr] for attr in LAW_KEY_ATTRS}, {
+                    attr: value for attr, value in row.items()
+                    if attr not in LAW_KEY_ATTRS and attr not in LAW_TIMESTAMP_ATTRS
+                })
+        current = defaultdict(dict)
+        for row in self._articles:
+            current[row["law_level"], row["law_name"]][row["article_no"]] = row["article_content"]
+        for level, name in dict.fromkeys([*current, *previous]):
+            stored = previous.get((level, name), {})
+            articles = current.get((level, name), {})
+            for article_no, content in articles.items():
+                if article_no not in stored:
+                    op = changesets.INSERT
+                elif stored[article_no] != text_store_module.content_hash(content or ""):
+                    op = changesets.UPDATE
+                else:
+                    continue
+                self.changes.record(op, changesets.ARTICLE,
+                                    {"law_level": level, "law_name": name, "article_no": article_no},
+                                    {"article_content": content})
+            for article_no in stored.keys() - articles.keys():
+                self.changes.record(changesets.DELETE, changesets.ARTICLE,
+                                    {"law_level": level, "law_name": name, "article_no": article_no})
+
+
+def law_key(law: dict) -> Tuple[str, str]:
+    return law.get("LawLevel"), law.get("LawName")
+
+
+def shard_of(key: Tuple[str, str], shards: int) -> int:
+    """Stable shard number for a (LawLevel, LawName) key; hash() is salted per process."""
+    return zlib.crc32("\x1f".join(key).encode('utf-8')) % shards
+
+
+def expected_counts(law: dict) -> Tuple[int, int, int, int]:
+    """(laws, captions, articles, attachments) rows that writing `law` produces."""
+    articles = law.get("LawArticles", [])
+    captions = sum(1 for article in articles if article.get("ArticleType") == "C")
+    return 1, captions, len(articles) - captions, len(law.get("LawAttachements", []))
+
+
+def split_laws(laws: Iterable[dict], directory: Path, shards: int,
+               journal: Optional[checkpoint.CheckpointJournal] = None) -> Tuple[List[Path], List[int], Dict[tuple, tuple]]:
+    """Write the laws to `shards` JSON-lines files by (LawLevel, LawName).
+
+    Returns the shard files, the number of captions in each shard, and the expected row
+    counts of every law for the consistency check. Laws already in `journal` are counted
+    but not written to a shard.
+    """
+    paths = [directory / f"laws-{number:03d}.jsonl" for number in range(shards)]
+    files = [open(path, 'w', encoding='utf-8') for path in paths]
+    captions = [0] * shards
+    expected = {}
+    try:
+        for law in laws:
+            key = law_key(law)
+            shard = shard_of(key, shards)
+            counts = expected_counts(law)
+            expected[key] = counts
+            if journal is not None and key in journal:
+                continue
+            files[shard].write(json.dumps(law, ensure_ascii=False))
+            files[shard].write("\n")
+            captions[shard] += counts[1]
+    finally:
+        for f in files:
+            f.close()
+    return paths, captions, expected
+
+
+def import_shard(path: Path, first_caption_id: int, commit_every: int, incremental: bool,
+                 database_options: dict, journal_options: Optional[dict] = None,
+                 use_text_store: bool = False, changes_command: Optional[str] = None) -> Tuple[int, int]:
+    """Worker entry point: write one shard through this process's own engine and connection."""
+    database.configure(**database_options)
+    journal = checkpoint.CheckpointJournal(**journal_options) if journal_options else None
+    try:
+        with Session(database.get_engine()) as session, \
+                LawWriter(session, commit_every=commit_every, incremental=incremental,
+                          first_caption_id=first_caption_id, journal=journal,
+                          text_store=text_store_module.TextStore(session) if use_text_store else None,
+                          changes=changesets.ChangeRecorder(session, changes_command) if changes_command else None) as writer:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    writer.add(json.loads(line))
+    finally:
+        if journal is not None:
+            journal.close()
+    return writer.total, writer.skipped
+
+
+def check_consistency(session: Session, expected: Dict[tuple, tuple]) -> List[tuple]:
+    """Return the keys whose stored law, caption, article or attachment counts differ from `expected`."""
+    actual = defaultdict(lambda: [0, 0, 0, 0])
+    for level, name in session.execute(select(Law.law_level, Law.law_name)):
+        actual[(level, name)][0] = 1
+    for column, model in enumerate((LawCaption, LawArticle, LawAttachment), start=1):
+        for level, name, count in session.execute(
+                select(model.law_level, model.law_name, func.count()).group_by(model.law_level, model.law_name)):
+            actual[(level, name)][column] = count
+    return [key for key, counts in expected.items() if tuple(actual.get(key, (0, 0, 0, 0))) != counts]
+
+
+def import_parallel(laws: Iterable[dict], workers: int, commit_every: int = DEFAULT_COMMIT_EVERY,
+                    incremental: bool = False, database_options: Optional[dict] = None,
+                    journal: Optional[checkpoint.CheckpointJournal] = None,
+                    source: Optional[Path] = None, use_text_store: bool = False,
+                    changes_command: Optional[str] = None) -> Tuple[int, int]:
+    """Import laws with `workers` processes, each with its own connection, then check the result.
+
+    Laws are split into shards by (LawLevel, LawName), so every law and its children are
+    written by exactly one worker and each shard commits independently. Every shard gets its
+    own block of caption ids above the current MAX(Id). Raises ValueError when the stored
+    rows do not match the dump afterwards.
+
+    With a `journal`, laws it already holds are not imported again and every worker records
+    its committed batches in its own part of it; `source` is the dump the journal belongs to.
+    With `changes_command`, every worker batch stores a change-set under that command name.
+    """
+    database_options = {**(database_options or {}), "pool_size": 1, "max_overflow": 0}
+    with tempfile.TemporaryDirectory(prefix="laws-") as directory:
+        with metrics.stage("law_split"):
+            paths, captions, expected = split_laws(laws, Path(directory), workers, journal)
+        with Session(database.get_engine()) as session:
+            first_caption_id = next_caption_id(session)
+        blocks = []
+        for caption_count in captions:
+            blocks.append(first_caption_id)
+            first_caption_id += caption_count
+        logger.info(f"Importing {len(expected)} laws in {workers} shards")
+
+        total = skipped = 0
+        # Spawned workers never inherit the parent's pooled connections.
+        context = multiprocessing.get_context("spawn")
+        with metrics.stage("law_import"), ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {}
+            for part, (path, block) in enumerate(zip(paths, blocks)):
+                journal_options = None
+                if journal is not None:
+                    journal_options = {"name": journal.name, "source": source, "resume": journal.resume,
+                                       "directory": journal.directory, "part": part}
+                futures[pool.submit(import_shard, path, block, commit_every, incremental, database_options,
+                                    journal_options, use_text_store, changes_command)] = path
+            for future in as_completed(futures):
+                written, unchanged = future.result()
+                total += written
+                skipped += unchanged
+                logger.info(f"Shard {futures[future].name} finished: {written} laws written, {unchanged} unchanged")
+
+    metrics.count("rows", total, table=Law.__tablename__, action="write")
+    with metrics.stage("law_check"), Session(database.get_engine()) as session:
+        mismatched = check_consistency(session, expected)
+    if mismatched:
+        raise ValueError(f"{len(mismatched)} laws do not match the dump after import, e.g. {mismatched[:5]}")
+    logger.info(f"Consistency check passed for {len(expected)} laws")
+    return total, skipped
@@ -1,292 +1,322 @@
-import asyncio
+from __future__ import annotations
+
 import os
 import logging
-import json
-from datetime import datetime
 
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 import click
-import dotenv
-import httpx
-import sqlmodel
-
-from sqlmodel import SQLModel, Session, create_engine, delete
-
-import API
-
-from models import Categories, Resources, ResourceFiles
-from models.law import Law, LawAttachment, LawArticle, LawCaption
-from models.interpretations import Interpretations, InterpretationsEN, InterpretationsZH, InterpretationAdditions
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('data_insertion.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
 
-dotenv.load_dotenv(".env")
+import checkpoint
+import database
+import manifest
+import metrics
+import search_index
+import settings
+import snapshot
+
+# The HTTP stack, SQLAlchemy/SQLModel and the models are imported inside the commands that
+# use them, so --help and commands that never touch them start quickly.
+if TYPE_CHECKING:
+    import httpx
+
+    import http_cache
 
-database_url = os.getenv("DATABASE_URL")
+logger = logging.getLogger(__name__)
 
-logger.info(f"Using connection string: {database_url}")
+def configure_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('data_insertion.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
 
-engine = create_engine(
-    database_url, 
-    echo=True,
-    pool_pre_ping=True,
-)
 def recreate_tables():
     """Force drop and recreate all tables."""
+    from sqlmodel import SQLModel
+
     logger.info("Dropping and recreating all tables...")
+    engine = database.get_engine()
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    forget_applied_listings()
     logger.info("Tables recreated successfully.")
 
-def update_category():
-    with httpx.Client() as client, Session(engine) as session:
+def forget_applied_listings():
+    """Make the next category/resource update write every cached listing into this database again."""
+    import http_cache
+
+    http_cache.ResponseCache(scope=http_cache.database_scope(settings.database_url())).forget_applied()
+
+def update_category(transport: Optional[httpx.BaseTransport] = None,
+                    cache: Optional[http_cache.ResponseCache] = None, timeout: float = settings.HTTP_TIMEOUT):
+    import httpx
+    from sqlmodel import Session
+
+    import API
+    import bulk
+    import http_cache
+    import opendata
+    from models import Categories
+
+    with httpx.Client(timeout=timeout, transport=transport, event_hooks=metrics.http_hooks()) as client, \
+            Session(database.get_engine()) as session:
         try:
-            response = client.get(API.JUDICIAL_CATEGORYS_API)
-            response.raise_for_status()
-            categories_data = response.json()
-        except httpx.RequestError as e:
+            with metrics.stage("fetch_categories"):
+                listing = opendata.fetch_json(client, API.JUDICIAL_CATEGORYS_API, "categories", cache)
+        except (httpx.RequestError, http_cache.OfflineCacheMiss) as e:
             logger.error(f"Error fetching categories: {e}")
             return
 
-        for category in categories_data:
-            category_no = category.get("categoryNo")
-            category_name = category.get("categoryName")
+        if not listing.changed:
+            logger.info("Categories unchanged since the last update; skipping upsert.")
+            return
 
-            if not category_no or not category_name:
-                logger.warning(f"Skipping invalid category data: {category}")
-                continue
+        rows = opendata.category_rows(listing.data)
 
-            existing_category = session.get(Categories, category_no)
-            if existing_category:
-                existing_category.category_name = category_name
-                logger.info(f"Updated category: {category_no} - {category_name}")
-            else:
-                new_category = Categories(
-                    category_no=category_no,
-                    category_name=category_name
-                )
-                session.add(new_category)
-                logger.info(f"Added new category: {category_no} - {category_name}")
-
-        session.commit()
+        with metrics.stage("upsert_categories"):
+            inserted, updated = bulk.upsert_rows(session, Categories, rows)
+            session.commit()
+        if cache is not None:
+            cache.mark_applied(API.JUDICIAL_CATEGORYS_API, listing.digest)
+        metrics.count("rows", inserted, table=Categories.__tablename__, action="insert")
+        metrics.count("rows", updated, table=Categories.__tablename__, action="update")
         logger.info("Category update completed.")
 
-def update_resources():
-    with httpx.Client() as client, Session(engine) as session:
-        categories = session.exec(sqlmodel.select(Categories)).all()
-        for category in categories:
+def update_resource(transport: Optional[httpx.BaseTransport] = None,
+                    cache: Optional[http_cache.ResponseCache] = None, timeout: float = settings.HTTP_TIMEOUT):
+    import httpx
+    import sqlmodel
+    from sqlmodel import Session
+
+    import API
+    import bulk
+    import http_cache
+    import opendata
+    from models import Categories, Resources, ResourceFiles
+
+    with httpx.Client(timeout=timeout, transport=transport, event_hooks=metrics.http_hooks()) as client, \
+            Session(database.get_engine()) as session:
+        category_nos = session.exec(sqlmodel.select(Categories.category_no)).all()
+        resource_rows = []
+        file_rows = []
+        applied = []
+        for category_no in category_nos:
+            url = API.JUDICIAL_CATEGORY_RESOURCES_API.format(categoryNo=category_no)
             try:
-                response = client.get(API.JUDICIAL_CATEGORY_RESOURCES_API.format(categoryNo=category.category_no))
-                response.raise_for_status()
-                resources_data = response.json()
-            except httpx.RequestError as e:
-                logger.error(f"Error fetching resources for category {category.category_no}: {e}")
+                with metrics.stage("fetch_resources"):
+                    listing = opendata.fetch_json(client, url, "resources", cache)
+            except (httpx.RequestError, http_cache.OfflineCacheMiss) as e:
+                logger.error(f"Error fetching resources for category {category_no}: {e}")
+                continue
+            if not listing.changed:
                 continue
 
-            for resource in resources_data:
-                dataset_id = resource.get("datasetId")
-                title = resource.get("title")
-
-                if not dataset_id or not title:
-                    logger.warning(f"Skipping invalid resource data: {resource}")
-                    continue
-
-                existing_resource = session.get(Resources, dataset_id)
-                if existing_resource:
-                    existing_resource.title = title
-                    logger.info(f"Updated resource: {dataset_id} - {title}")
-                else:
-                    new_resource = Resources(
-                        dataset_id=dataset_id,
-                        category_no=category.category_no,
-                        title=title
-                    )
-                    session.add(new_resource)
-                    logger.info(f"Added new resource: {dataset_id} - {title}")
-
-                for file_set in resource.get("filesets", []):
-                    file_set_id = file_set.get("fileSetId")
-                    resource_format = file_set.get("resourceFormat")
-                    resource_description = file_set.get("resourceDescription")
-
-                    if not file_set_id or not resource_format:
-                        logger.warning(f"Skipping invalid file set data: {file_set}")
-                        continue
-
-                    existing_file = session.get(ResourceFiles, file_set_id)
-                    if existing_file:
-                        existing_file.resource_format = resource_format
-                        existing_file.resource_description = resource_description
-                        logger.info(f"Updated resource file: {file_set_id}")
-                    else:
-                        new_file = ResourceFiles(
-                            dataset_id=dataset_id,
-                            file_set_id=file_set_id,
-                            resource_format=resource_format,
-                            resource_description=resource_description
-                        )
-                        session.add(new_file)
-                        logger.info(f"Added new resource file: {file_set_id}")
-            session.commit()
-        logger.info("Resource update completed.")
+            resources, files = opendata.resource_rows(category_no, listing.data)
+            resource_rows.extend(resources)
+            file_rows.extend(files)
+            applied.append((url, listing.digest))
 
-async def download_file(file: ResourceFiles):
-    file_type = file.resource_format.lower()
-    file_path = f"downloads/{file.resource.category.category_name}/{file.resource.title}/{file.resource_description}.{file_type}"
-    if Path(file_path).exists():
-        logger.info(f"File {file_path} already exists. Skipping download.")
-        return
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(file.get_download_url())
-            response.raise_for_status()
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            logger.info(f"Downloaded file {file.file_set_id} to {file_path}")
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Error downloading file {file.file_set_id}: {e}")
-
-def insert_interpretation_data(path: Path):
-    
-    # Prepare SQL output file
-    sql_output_path = Path("interpretation_data.sql")
-    sql_statements = []
-    
-    # Add clear existing data statements
-    sql_statements.extend([
-        "-- Clear existing interpretation data",
-        "DELETE FROM interpretation_additions;",
-        "DELETE FROM interpretations_en;", 
-        "DELETE FROM interpretations_zh;",
-        "DELETE FROM interpretations;",
-        "",
-        "-- Insert new interpretation data"
-    ])
-    
-    with Session(engine) as session:
-        for file in path.glob("**/*.json"):
-            with open(file, 'r', encoding='utf-8') as f:
-                data_wrapper = json.load(f)
-                data = data_wrapper.get("data", {})
-                
-                # Parse interpretation date
-                interpretation_date = data.get("inte_date")
-                if interpretation_date:
-                    interpretation_date = datetime.strptime(interpretation_date, "%Y/%m/%d 上午 12:00:00").date()
-                
-                # Generate SQL for main interpretation record
-                inte_no = data.get("inte_no", "").replace("'", "''")
-                source_url = data.get("data_url", "").replace("'", "''")
-                order_val = data.get("inte_order", "").replace("'", "''")
-                order_title = data.get("inte_order_title", "").replace("'", "''")
-                order_change = data.get("inte_order_change", "").replace("'", "''")
-                number_change = data.get("inte_no_chg", "").replace("'", "''")
-                announcement_order = data.get("inte_announcement_order_en", "").replace("'", "''")
-                amendment_order = data.get("inte_amendment_order_en", "").replace("'", "''")
-                
-                date_str = f"'{interpretation_date}'" if interpretation_date else "NULL"
-                
-                sql_statements.append(
-                    f"INSERT INTO interpretations (interpretation_number, interpretation_date, source_url, `order`, order_title, order_change, number_change, announcement_order, amendment_order) "
-                    f"VALUES ('{inte_no}', {date_str}, '{source_url}', '{order_val}', '{order_title}', '{order_change}', '{number_change}', '{announcement_order}', '{amendment_order}');"
-                )
-                
-                # Generate SQL for Chinese version record
-                def escape_sql(text):
-                    if text is None:
-                        return "NULL"
-                    return f"'{text.replace(chr(39), chr(39)+chr(39))}'"
-                
-                number_title_zh = escape_sql(data.get("inte_no_title"))
-                issue_zh = escape_sql(data.get("inte_issue"))
-                description_zh = escape_sql(data.get("inte_desc"))
-                reasoning_zh = escape_sql(data.get("inte_reason"))
-                other_documents = escape_sql(data.get("other_doc"))
-                kind_1 = escape_sql(data.get("inte_kind_1"))
-                kind_2 = escape_sql(data.get("inte_kind_2"))
-                fact_zh = escape_sql(data.get("inte_fact"))
-                
-                sql_statements.append(
-                    f"INSERT INTO interpretations_zh (interpretation_number, number_title, issue, description, reasoning, other_documents, interpretation_kind_1, interpretation_kind_2, fact) "
-                    f"VALUES ('{inte_no}', {number_title_zh}, {issue_zh}, {description_zh}, {reasoning_zh}, {other_documents}, {kind_1}, {kind_2}, {fact_zh});"
-                )
-                
-                # Generate SQL for English version record if available
-                if data.get("inte_no_title_en") or data.get("inte_issue_en"):
-                    number_title_en = escape_sql(data.get("inte_no_title_en"))
-                    issue_en = escape_sql(data.get("inte_issue_en"))
-                    description_en = escape_sql(data.get("inte_desc_en"))
-                    reasoning_en = escape_sql(data.get("inte_reason_en"))
-                    fact_en = escape_sql(data.get("inte_fact_en"))
-                    other_opinion = escape_sql(data.get("inte_opinions_en"))
-                    constitutional_complaint = escape_sql(data.get("inte_constitutional_complaint_en"))
-                    decision = escape_sql(data.get("inte_decision_en"))
-                    regulations = escape_sql(data.get("inte_regulations_en"))
-                    appendix = escape_sql(data.get("inte_appendix_en"))
-                    
-                    sql_statements.append(
-                        f"INSERT INTO interpretations_en (interpretation_number, number_title, issue, description, reasoning, fact, other_opinion, constitutional_complaint, decision, regulations, appendix) "
-                        f"VALUES ('{inte_no}', {number_title_en}, {issue_en}, {description_en}, {reasoning_en}, {fact_en}, {other_opinion}, {constitutional_complaint}, {decision}, {regulations}, {appendix});"
-                    )
-                
-                # Generate SQL for addition records
-                additions = data_wrapper.get("addition", {})
-                for desc, url in additions.items():
-                    if url:  # Only add if URL exists
-                        desc_escaped = escape_sql(desc)
-                        full_url = url if url.startswith("http") else f"https://cons.judicial.gov.tw{url}"
-                        url_escaped = escape_sql(full_url)
-                        
-                        sql_statements.append(
-                            f"INSERT INTO interpretation_additions (interpretation_number, description, url) "
-                            f"VALUES ('{inte_no}', {desc_escaped}, {url_escaped});"
-                        )
-                
-                logger.info(f"Generated SQL for interpretation: {data.get('inte_no')} - {data.get('inte_no_title')}")
-        
-        # Write SQL statements to file
-        with open(sql_output_path, 'w', encoding='utf-8') as sql_file:
-            sql_file.write('\n'.join(sql_statements))
-        
-        logger.info(f"SQL statements written to {sql_output_path}")
-        logger.info("Interpretation data SQL generation completed.")
+        if not applied:
+            logger.info("Resources unchanged since the last update; skipping upsert.")
+            return
+
+        # Resources first so the ResourceFiles foreign keys resolve.
+        with metrics.stage("upsert_resources"):
+            for model, table_rows in ((Resources, resource_rows), (ResourceFiles, file_rows)):
+                inserted, updated = bulk.upsert_rows(session, model, table_rows)
+                metrics.count("rows", inserted, table=model.__tablename__, action="insert")
+                metrics.count("rows", updated, table=model.__tablename__, action="update")
+            session.commit()
+        if cache is not None:
+            for url, digest in applied:
+                cache.mark_applied(url, digest)
+        logger.info(f"Resource update completed: {len(applied)} of {len(category_nos)} categories changed.")
+
+def run_download_plan(plan, options: dict, concurrency: int, per_host: int, retries: int, missing_only: bool,
+                      journal: checkpoint.CheckpointJournal):
+    """Create the plan's directories, report what is already on disk and download the rest."""
+    import asyncio
+
+    import downloader
+
+    plan.prepare()
+    jobs = plan.missing if missing_only else plan.jobs
+    # A journalled file is only trusted while it is still on disk.
+    present = {job.file_set_id for job in plan.present}
+    jobs = [job for job in jobs if not (job.file_set_id in journal and job.file_set_id in present)]
+    try:
+        asyncio.run(downloader.download_all(
+            jobs, concurrency=concurrency, per_host=per_host, retries=retries,
+            timeout=options["http_timeout"], download_manifest=manifest.DownloadManifest(), journal=journal))
+    finally:
+        journal.close()
+
+def download_options(func):
+    func = click.option('--missing-only', is_flag=True,
+                        help='Only fetch files that are not on disk yet, instead of revalidating every file.')(func)
+    func = click.option('--retries', default=settings.DOWNLOAD_RETRIES, show_default=True,
+                        help='Retries for transient network errors and 429/5xx responses.')(func)
+    func = click.option('--per-host', default=settings.DOWNLOAD_PER_HOST, show_default=True,
+                        help='Maximum concurrent connections to a single host.')(func)
+    func = click.option('--concurrency', default=settings.DOWNLOAD_CONCURRENCY, show_default=True,
+                        help='Maximum number of downloads in flight.')(func)
+    return func
+
+def cache_options(func):
+    func = click.option('--no-cache', is_flag=True,
+                        help='Bypass the metadata cache and upsert every listing.')(func)
+    func = click.option('--offline', is_flag=True,
+                        help='Serve metadata listings only from the cache; never contact the API.')(func)
+    func = click.option('--cache-ttl', default=settings.METADATA_CACHE_TTL, show_default=True, envvar='METADATA_CACHE_TTL',
+                        help='Seconds a cached listing is used before it is revalidated.')(func)
+    return func
+
+changesets_option = click.option(
+    '--changesets/--no-changesets', 'record_changes', default=False, show_default=True,
+    help='Store what every batch inserted, updated or deleted as a change-set for export-changes. '
+         'Costs a read of the stored rows being replaced (every stored interpretation, for '
+         'insert-interpretations) and a compressed copy of every written row.')
+
+blank_text_option = click.option(
+    '--allow-blank-text-columns', 'allow_blank_text', is_flag=True,
+    help='Required with --text-store: acknowledges that the text columns are left blank in the database, '
+         'so readers that query the tables directly (such as the website) see no text.')
+
+
+def check_text_store(use_text_store, allow_blank_text) -> None:
+    if use_text_store and not allow_blank_text:
+        raise click.UsageError("--text-store leaves the text columns blank for direct database readers; "
+                               "pass --allow-blank-text-columns to use it anyway.")
+
+def metadata_cache(cache_ttl, offline, no_cache) -> Optional[http_cache.ResponseCache]:
+    if no_cache:
+        if offline:
+            raise click.UsageError("--offline needs the cache; drop --no-cache.")
+        return None
+    import http_cache
+
+    return http_cache.ResponseCache(ttl=cache_ttl, offline=offline,
+                                    scope=http_cache.database_scope(settings.database_url()))
+
+def insert_interpretation_data(path: Path, sink, workers: int = 1):
+    """Stream parsed interpretation records from `path` into `sink` one at a time."""
+    import interpretations
+
+    for record in interpretations.iter_records(path, workers=workers):
+        sink.write(record)
+        logger.debug(f"Loaded interpretation: {record.interpretation['interpretation_number']} - {record.zh['number_title']}")
+    sink.close()
+    logger.info(f"Interpretation data load completed: {sink.total} interpretations.")
 
 @click.group()
-def cli():
+@click.option('--echo-sql', is_flag=True, help='Log every SQL statement (slow; for debugging only).')
+@click.option('--pool-size', type=int, envvar='DB_POOL_SIZE', default=None,
+              help='Database connections kept open (default depends on the command).')
+@click.option('--pool-timeout', type=float, envvar='DB_POOL_TIMEOUT', default=None,
+              help='Seconds to wait for a free pooled connection.')
+@click.option('--connect-timeout', type=float, envvar='DB_CONNECT_TIMEOUT', default=None,
+              help='Seconds to wait when opening a database connection.')
+@click.option('--http-timeout', type=float, envvar='HTTP_TIMEOUT', default=None,
+              help='Seconds before an opendata request times out (default depends on the command).')
+@click.option('--metrics-json', type=click.Path(dir_okay=False), envvar='METRICS_JSON', default=None,
+              help='Write a JSON summary of timings, row counts, HTTP and SQL statistics here.')
+@click.option('--metrics-textfile', type=click.Path(dir_okay=False), envvar='METRICS_TEXTFILE', default=None,
+              help='Write the same metrics in Prometheus textfile-collector format here.')
+@click.option('--profile', is_flag=True,
+              help='Profile the command (CPU time per section and function, allocation sites at peak memory). '
+                   'Worker processes are not profiled; on Python 3.12+ concurrent threads share one call tree.')
+@click.option('--profile-dir', type=click.Path(file_okay=False), default="profiles", show_default=True,
+              help='Directory the --profile report and pstats file are written to.')
+@click.pass_context
+def cli(ctx, echo_sql, pool_size, pool_timeout, connect_timeout, http_timeout, metrics_json, metrics_textfile,
+        profile, profile_dir):
     """Data insertion tool for judicial data."""
-    pass
+    configure_logging()
+    ctx.obj = settings.for_command(ctx.invoked_subcommand, pool_size=pool_size, pool_timeout=pool_timeout,
+                                   connect_timeout=connect_timeout, http_timeout=http_timeout)
+    database.configure(echo=echo_sql, **{name: value for name, value in ctx.obj.items() if name != "http_timeout"})
+    registry = metrics.reset(ctx.invoked_subcommand)
+
+    def write_metrics():
+        if metrics_json:
+            registry.write_json(Path(metrics_json))
+        if metrics_textfile:
+            registry.write_prometheus(Path(metrics_textfile))
+        logger.info(f"{ctx.invoked_subcommand} finished in {registry.summary()['elapsed_seconds']}s")
+
+    ctx.call_on_close(write_metrics)
+    if profile:
+        import profiling
+
+        profiler = profiling.Profiler(ctx.invoked_subcommand)
+        # Close callbacks run last-registered first, so profiling stops before metrics are written.
+        ctx.call_on_close(lambda: profiler.stop(Path(profile_dir)))
+        profiler.start()
 
 @cli.command()
+@cache_options
 @click.pass_context
-def update_categories(ctx):
+def update_categories(ctx, cache_ttl, offline, no_cache):
     """Update categories from API."""
     logger.info("Starting category update...")
-    update_category()
+    update_category(cache=metadata_cache(cache_ttl, offline, no_cache), timeout=ctx.obj["http_timeout"])
 
 @cli.command()
+@cache_options
 @click.pass_context
-def update_resources(ctx):
+def update_resources(ctx, cache_ttl, offline, no_cache):
     """Update resources from API."""
     logger.info("Starting resource update...")
-    update_resources()
+    update_resource(cache=metadata_cache(cache_ttl, offline, no_cache), timeout=ctx.obj["http_timeout"])
 
 @cli.command()
+@click.option('--metadata-only/--download', default=True, show_default=True,
+              help='Only update categories and resources, or also download every file and load interpretations.')
+@click.option('--interpretation-category', 'interpretation_categories', multiple=True,
+              help='Category number whose files hold interpretation JSON to load; repeatable.')
+@click.option('--resume', is_flag=True, help='Skip filesets completed by an earlier, interrupted run.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True,
+              help='Processes used to parse downloaded files.')
+@click.option('--queue-size', default=settings.PIPELINE_QUEUE_SIZE, show_default=True,
+              help='Items buffered between stages before the upstream stage waits.')
+@click.option('--commit-every', default=settings.INTERPRETATION_COMMIT_EVERY, show_default=True,
+              help='Number of interpretations written per transaction.')
+@download_options
+@cache_options
+@changesets_option
 @click.pass_context
-def sync_all(ctx):
-    """Update both categories and resources."""
+def sync_all(ctx, metadata_only, interpretation_categories, resume, workers, queue_size, commit_every,
+             concurrency, per_host, retries, cache_ttl, offline, no_cache, record_changes):
+    """Update categories and resources; with --download, also download files and load interpretations.
+
+    --download runs catalogue fetch, downloads, parsing and inserts as one pipelined run.
+    """
     logger.info("Starting full sync...")
-    update_category()
-    update_resources()
+    cache = metadata_cache(cache_ttl, offline, no_cache)
+    timeout = ctx.obj["http_timeout"]
+    if metadata_only:
+        update_category(cache=cache, timeout=timeout)
+        update_resource(cache=cache, timeout=timeout)
+        return
+    import asyncio
+
+    import changesets
+    import pipeline
+
+    if record_changes:
+        changesets.prepare_schema(database.get_engine())
+    run = pipeline.Pipeline(
+        database.get_engine(), checkpoint.CheckpointJournal("sync-all", resume=resume), interpretation_categories,
+        concurrency=concurrency, per_host=per_host, retries=retries, workers=workers, queue_size=queue_size,
+        commit_every=commit_every, download_manifest=manifest.DownloadManifest(), cache=cache, timeout=timeout,
+        record_changes=record_changes)
+    asyncio.run(run.run())
+    logger.info("Full sync completed.")
 
 @cli.command()
 def reset_tables():
@@ -295,116 +325,358 @@ def reset_tables():
 
 @cli.command()
 def create_tables():
-    """Create all database tables."""
-    SQLModel.metadata.create_all(engine)
+    """Create all database tables, and fill the article keys of articles stored before they existed."""
+    from sqlmodel import SQLModel, Session
+
+    import laws
+
+    SQLModel.metadata.create_all(database.get_engine())
+    forget_applied_listings()
+    with Session(database.get_engine()) as session:
+        laws.backfill_article_keys(session)
 
 @cli.command()
 @click.option('--category-no', prompt='Category number',
               help='The category number to download files for.')
-def download_by_category_no(category_no):
+@download_options
+@click.option('--resume', is_flag=True, help='Skip files completed by an interrupted run that are still on disk.')
+@click.pass_obj
+def download_by_category_no(options, category_no, concurrency, per_host, retries, missing_only, resume):
     """Download resource files organized by category."""
+    from sqlmodel import Session
+
+    import download_plan
+    from models import Categories
+
     logger.info("Starting categorized file download...")
-    with Session(engine) as session:
-        category = session.exec(sqlmodel.select(Categories).where(Categories.category_no == category_no)).one_or_none()
-        if not category:
+    with Session(database.get_engine()) as session:
+        if session.get(Categories, category_no) is None:
             logger.error(f"Category {category_no} not found.")
             return
-        category_dir = f"downloads/{category.category_name}/"
-        os.makedirs(category_dir, exist_ok=True)
-        for resource in category.resources:
-            resource_dir = f"{category_dir}/{resource.title}/"
-            os.makedirs(resource_dir, exist_ok=True)
-            for file in resource.resource_files:
-                asyncio.run(download_file(file))
+        plan = download_plan.plan_downloads(session, category_no=category_no)
+    journal = checkpoint.CheckpointJournal(f"download-category-{category_no}", resume=resume)
+    run_download_plan(plan, options, concurrency, per_host, retries, missing_only, journal)
     logger.info("Categorized file download completed.")
 
 @cli.command()
-def download_files():
+@download_options
+@click.option('--resume', is_flag=True, help='Skip files completed by an interrupted run that are still on disk.')
+@click.pass_obj
+def download_files(options, concurrency, per_host, retries, missing_only, resume):
     """Download all resource files."""
+    from sqlmodel import Session
+
+    import download_plan
+
     logger.info("Starting file download...")
-    with Session(engine) as session:
-        files = session.exec(sqlmodel.select(ResourceFiles)).all()
-        os.makedirs("downloads", exist_ok=True)
-        for file in files:
-            category_dir = f"downloads/{file.resource.category.category_name}/{file.resource.title}/"
-            os.makedirs(category_dir, exist_ok=True)
-            asyncio.run(download_file(file))
+    with Session(database.get_engine()) as session:
+        plan = download_plan.plan_downloads(session)
+    journal = checkpoint.CheckpointJournal("download-files", resume=resume)
+    run_download_plan(plan, options, concurrency, per_host, retries, missing_only, journal)
     logger.info("File download completed.")
 
 @cli.command()
-def insert_interpretations():
-    """Insert interpretation data from JSON files."""
+@click.option('--workers', default=os.cpu_count() or 4, show_default=True,
+              help='Number of files hashed in parallel.')
+@download_options
+@click.pass_obj
+def verify_downloads(options, workers, concurrency, per_host, retries, missing_only):
+    """Re-hash downloaded files and re-fetch any that are missing or corrupted."""
+    import asyncio
+
+    from sqlmodel import Session
+
+    import download_plan
+    import downloader
+
+    logger.info("Starting download verification...")
+    download_manifest = manifest.DownloadManifest()
+    with Session(database.get_engine()) as session:
+        plan = download_plan.plan_downloads(session).prepare()
+    # With --missing-only the files already on disk are not re-hashed.
+    bad_jobs = plan.missing if missing_only else manifest.verify_files(plan.jobs, download_manifest, workers=workers)
+    logger.info(f"Verified {len(plan)} files, {len(bad_jobs)} missing or corrupted.")
+    if bad_jobs:
+        asyncio.run(downloader.download_all(
+            bad_jobs, concurrency=concurrency, per_host=per_host, retries=retries,
+            timeout=options["http_timeout"], download_manifest=download_manifest))
+    logger.info("Download verification completed.")
+
+@cli.command()
+@click.argument("path", type=click.Path(exists=True))
+@click.option('--output', type=click.Choice(['db', 'sql', 'csv']), default='db', show_default=True,
+              help='Load straight into the database, or stream a SQL script or per-table CSV files.')
+@click.option('--output-path', type=click.Path(), default=None,
+              help='SQL file or CSV directory (defaults to interpretation_data.sql / interpretation_csv).')
+@click.option('--commit-every', default=settings.INTERPRETATION_COMMIT_EVERY, show_default=True,
+              help='Number of interpretations written per transaction.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True,
+              help='Processes used to parse JSON files; 1 parses in the writer process.')
+@click.option('--search-index', 'index_path', type=click.Path(dir_okay=False), default=None,
+              help='Keep this search index in step with the loaded interpretations.')
+@click.option('--resume', is_flag=True,
+              help='Keep what an interrupted load committed and continue after its last batch.')
+@click.option('--text-store', 'use_text_store', is_flag=True,
+              help='Keep the text fields once, compressed, in TextBlob and store only their hash in the rows. '
+                   'The text columns are left NULL, so only readers that join TextBlob see the text.')
+@blank_text_option
+@changesets_option
+def insert_interpretations(path, output, output_path, commit_every, workers, index_path, resume, use_text_store,
+                           allow_blank_text, record_changes):
+    """Insert interpretation data from JSON files or downloaded .zip archives under PATH."""
+    import interpretations
+
     logger.info("Starting interpretation data insertion...")
-    insert_interpretation_data()
+    if (resume or use_text_store) and output != 'db':
+        raise click.UsageError("--resume and --text-store only apply to --output db.")
+    check_text_store(use_text_store, allow_blank_text)
+    if output == 'sql':
+        sink = interpretations.SqlFileSink(Path(output_path or "interpretation_data.sql"))
+        insert_interpretation_data(Path(path), sink, workers=workers)
+    elif output == 'csv':
+        sink = interpretations.CsvSink(Path(output_path or "interpretation_csv"))
+        insert_interpretation_data(Path(path), sink, workers=workers)
+    else:
+        from sqlmodel import Session
+
+        import changesets
+        import text_store
+
+        index = search_index.SearchIndex(Path(index_path)) if index_path else None
+        journal = checkpoint.CheckpointJournal("insert-interpretations", source=Path(path), resume=resume)
+        if use_text_store:
+            text_store.prepare_schema(database.get_engine())
+        if record_changes:
+            changesets.prepare_schema(database.get_engine())
+        try:
+            with Session(database.get_engine()) as session:
+                # A fresh load clears the tables; a resumed one keeps the committed batches.
+                sink = interpretations.DatabaseSink(
+                    session, commit_every=commit_every, index=index, replace=not resume, journal=journal,
+                    text_store=text_store.TextStore(session) if use_text_store else None,
+                    changes=changesets.ChangeRecorder(session, "insert-interpretations") if record_changes else None)
+                insert_interpretation_data(Path(path), sink, workers=workers)
+        finally:
+            journal.close()
+        if sink.resumed:
+            logger.info(f"Skipped {sink.resumed} interpretations committed by the interrupted run.")
+        if index is not None:
+            index.close()
 
 @cli.command()
 @click.argument("law_data_file", type=click.Path(exists=True))
-def insert_law_data(law_data_file):
-    """Insert law data into the database."""
+@click.option('--stream/--no-stream', default=True, show_default=True,
+              help='Parse the Laws array incrementally instead of loading the whole dump.')
+@click.option('--commit-every', default=settings.LAW_COMMIT_EVERY, show_default=True,
+              help='Number of laws written per transaction.')
+@click.option('--incremental', is_flag=True,
+              help='Skip laws whose LawModifiedDate is unchanged and replace only changed ones.')
+@click.option('--search-index', 'index_path', type=click.Path(dir_okay=False), default=None,
+              help='Keep this search index in step with the written articles.')
+@click.option('--workers', default=1, show_default=True,
+              help='Import in this many processes, each with its own connection, sharded by law.')
+@click.option('--resume', is_flag=True,
+              help='Skip laws committed by an interrupted import of the same file.')
+@click.option('--text-store', 'use_text_store', is_flag=True,
+              help='Keep article text once, compressed, in TextBlob and store only its hash in LawArticle. '
+                   'ArticleContent is left empty, so only readers that join TextBlob see the text.')
+@blank_text_option
+@changesets_option
+@click.pass_obj
+def insert_law_data(options, law_data_file, stream, commit_every, incremental, index_path, workers, resume,
+                    use_text_store, allow_blank_text, record_changes):
+    """Insert law data from a JSON dump (or a .zip containing one) into the database."""
+    from sqlmodel import Session
+
+    import changesets
+    import laws
+    import text_store
+
+    check_text_store(use_text_store, allow_blank_text)
     logger.info("Starting law data insertion...")
-    with Session(engine) as session, open(law_data_file, 'r', encoding='utf-8-sig') as f:
-        law_data = json.load(f)
-        for law in law_data.get("Laws", []):
-            law_has_eng_version = law.get("LawHasEngVersion", False)
-            if isinstance(law_has_eng_version, str):
-                law_has_eng_version = law_has_eng_version.upper() == 'Y'
-            
-            law_modified_date = law.get("LawModifiedDate")
-            law_effective_date = law.get("LawEffectiveDate")
-            law_model = Law(
-                law_level=law.get("LawLevel"),
-                law_name=law.get("LawName"),
-                law_url=law.get("LawURL"),
-                law_category=law.get("LawCategory"),
-                law_modified_date=law_modified_date if law_modified_date else None,
-                law_effective_date=law_effective_date if law_effective_date else None,
-                law_effective_note=law.get("LawEffectiveNote"),
-                law_abandon_note=law.get("LawAbandonNote"),
-                law_histories=law.get("LawHistories"),
-                law_has_eng_version=law_has_eng_version,
-                eng_law_name=law.get("EngLawName"),
-                law_foreword=law.get("LawForeword")
-            )
-            session.add(law_model)
-            logger.info(f"Inserted law: {law_model.law_level} - {law_model.law_name}")
-            session.flush()
-            for attachment in law.get("LawAttachements", []):
-                attachment_model = LawAttachment(
-                    law_level=law_model.law_level,
-                    law_name=law_model.law_name,
-                    file_name=attachment.get("FileName"),
-                    file_url=attachment.get("FileURL")
-                )
-                session.add(attachment_model)
-            
-            last_caption: LawCaption = None
-            for article in law.get("LawArticles", []):
-                if article.get("ArticleType") == "C":
-                    last_caption = LawCaption(
-                        law_level=law_model.law_level,
-                        law_name=law_model.law_name,
-                        caption_title=article.get("ArticleContent")
-                    )
-                    session.add(last_caption)
-                    session.flush([last_caption])
-                else:
-                    if last_caption:
-                        article_model = LawArticle(
-                            caption_id=last_caption.id,
-                            law_level=law_model.law_level,
-                            law_name=law_model.law_name,
-                            article_no=article.get("ArticleNo"),
-                            article_content=article.get("ArticleContent")
-                        )
-                    else:
-                        article_model = LawArticle(
-                            law_level=law_model.law_level,
-                            law_name=law_model.law_name,
-                            article_no=article.get("ArticleNo"),
-                            article_content=article.get("ArticleContent")
-                        )
-                    session.add(article_model)
-        session.commit()
+    law_source = laws.iter_laws if stream else laws.load_laws
+    metrics.count("input_bytes", Path(law_data_file).stat().st_size, source="laws")
+    journal = checkpoint.CheckpointJournal("insert-law-data", source=Path(law_data_file), resume=resume)
+    # Articles stored before the article-key columns existed would otherwise keep NULL keys.
+    with Session(database.get_engine()) as session:
+        laws.backfill_article_keys(session)
+    if use_text_store:
+        text_store.prepare_schema(database.get_engine())
+    if record_changes:
+        changesets.prepare_schema(database.get_engine())
+    if workers > 1:
+        if index_path:
+            raise click.UsageError("--search-index needs a single writer; run build-search-index after a parallel import.")
+        database_options = {name: value for name, value in options.items() if name != "http_timeout"}
+        try:
+            total, skipped = laws.import_parallel(law_source(Path(law_data_file)), workers, commit_every=commit_every,
+                                                  incremental=incremental, database_options=database_options,
+                                                  journal=journal, source=Path(law_data_file),
+                                                  use_text_store=use_text_store,
+                                                  changes_command="insert-law-data" if record_changes else None)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        logger.info(f"Law data insertion completed: {total} laws written, {skipped} unchanged, "
+                    f"{len(journal)} resumed.")
+        return
+    index = search_index.SearchIndex(Path(index_path)) if index_path else None
+    try:
+        with Session(database.get_engine()) as session, \
+                laws.LawWriter(session, commit_every=commit_every, incremental=incremental, index=index,
+                               journal=journal,
+                               text_store=text_store.TextStore(session) if use_text_store else None,
+                               changes=changesets.ChangeRecorder(session, "insert-law-data") if record_changes else None) as writer:
+            for law in law_source(Path(law_data_file)):
+                writer.add(law)
+    finally:
+        journal.close()
+    if index is not None:
+        index.close()
+    logger.info(f"Law data insertion completed: {writer.total} laws written, {writer.skipped} unchanged, "
+                f"{writer.resumed} resumed.")
+
+@cli.command()
+def backfill_article_keys():
+    """Add and fill the canonical article-key columns on an existing LawArticle table."""
+    from sqlmodel import Session
+
+    import laws
+
+    logger.info("Starting article key backfill...")
+    with Session(database.get_engine()) as session:
+        filled = laws.backfill_article_keys(session)
+    logger.info(f"Article key backfill completed: {filled} articles.")
+
+@cli.command()
+@click.option('--since', default=0, show_default=True,
+              help='Export the change-sets after this version; use the last version a consumer has applied.')
+@click.option('--output', type=click.Path(dir_okay=False), default="changes.jsonl.gz", show_default=True,
+              help='gzip-compressed JSON lines file to write.')
+def export_changes(since, output):
+    """Export the change-sets recorded by imports run with --changesets after a given version."""
+    from sqlmodel import Session
+
+    import changesets
+
+    changesets.prepare_schema(database.get_engine())
+    with Session(database.get_engine()) as session:
+        _, last = changesets.export_since(session, since, Path(output))
+    click.echo(last)
+
+@cli.command()
+def prune_text_store():
+    """Delete TextBlob bodies that no article or interpretation references any more."""
+    from sqlmodel import Session
+
+    import text_store
+
+    with Session(database.get_engine()) as session:
+        removed = text_store.prune(session)
+    logger.info(f"Text store prune completed: {removed} blobs removed.")
+
+@cli.command()
+def build_citations():
+    """Extract law and article citations from the interpretations into the LawCitation table."""
+    from sqlmodel import Session
+
+    import citations
+
+    logger.info("Starting citation extraction...")
+    with Session(database.get_engine()) as session:
+        edges = citations.build_citations(session)
+    logger.info(f"Citation extraction completed: {edges} edges.")
+
+@cli.command()
+@click.option('--index-path', type=click.Path(dir_okay=False), default=str(search_index.DEFAULT_INDEX_PATH),
+              show_default=True, help='SQLite file holding the index.')
+@click.option('--batch-size', default=2000, show_default=True, help='Documents indexed per batch.')
+def build_search_index(index_path, batch_size):
+    """Rebuild the full-text search index over law articles and interpretations."""
+    import sqlmodel
+    from sqlmodel import Session
+
+    import text_store
+    from models.interpretations import InterpretationsEN, InterpretationsZH
+    from models.law import LawArticle
+
+    logger.info("Starting search index build...")
+    interpretation_columns = ("interpretation_number", *search_index.INTERPRETATION_FIELDS)
+    sources = (
+        (LawArticle, sqlmodel.select(LawArticle.law_level, LawArticle.law_name, LawArticle.article_no,
+                                     LawArticle.article_content),
+         search_index.article_document),
+        (InterpretationsZH, sqlmodel.select(*(getattr(InterpretationsZH, name) for name in interpretation_columns)),
+         lambda row: search_index.interpretation_document(search_index.INTERPRETATION_ZH, row)),
+        (InterpretationsEN, sqlmodel.select(*(getattr(InterpretationsEN, name) for name in interpretation_columns)),
+         lambda row: search_index.interpretation_document(search_index.INTERPRETATION_EN, row)),
+    )
+    total = 0
+    with Session(database.get_engine()) as session, search_index.SearchIndex(Path(index_path)) as index:
+        index.clear()
+        for model, statement, to_document in sources:
+            statement = text_store.with_text(session, statement, model)
+            rows = session.execute(statement.execution_options(yield_per=batch_size)).mappings()
+            for partition in rows.partitions():
+                total += index.add_documents(to_document(text_store.inline_row(row)) for row in partition)
+                index.commit()
+                logger.info(f"Indexed {total} documents")
+    logger.info(f"Search index build completed: {total} documents in {index_path}.")
+
+@cli.command()
+@click.option('--output', type=click.Path(dir_okay=False), default=str(snapshot.DEFAULT_SNAPSHOT_PATH),
+              show_default=True, help='Snapshot file to write.')
+def export_snapshot(output):
+    """Export law articles and interpretations to a read-only, memory-mappable snapshot file."""
+    import sqlmodel
+    from sqlmodel import Session
+
+    import text_store
+    from models.interpretations import Interpretations, InterpretationsEN, InterpretationsZH
+    from models.law import LawArticle
+
+    logger.info("Starting snapshot export...")
+    with Session(database.get_engine()) as session, snapshot.SnapshotWriter(Path(output)) as writer:
+        statement = text_store.with_text(
+            session, sqlmodel.select(LawArticle.law_name, LawArticle.article_no, LawArticle.article_content), LawArticle)
+        articles = session.execute(statement.execution_options(yield_per=2000)).mappings()
+        for partition in articles.partitions():
+            for row in map(text_store.inline_row, partition):
+                writer.add_article(row["law_name"], row["article_no"], row["article_content"])
+
+        # One joined query, with each language's columns labelled "<language>.<attr>".
+        languages = {"zh": InterpretationsZH, "en": InterpretationsEN}
+        statement = sqlmodel.select(*text_store.columns(Interpretations))
+        for language, model in languages.items():
+            statement = (statement.add_columns(*(column.label(f"{language}.{column.key}")
+                                                 for column in text_store.columns(model, exclude={"id"})))
+                         .outerjoin(model, model.interpretation_number == Interpretations.interpretation_number))
+            statement = text_store.with_text(session, statement, model, label=f"{language}.{text_store.STORED_BODY}")
+        rows = session.execute(statement.execution_options(yield_per=500)).mappings()
+        for partition in rows.partitions():
+            for row in partition:
+                fields = {name: value for name, value in row.items() if "." not in name}
+                for language in languages:
+                    prefix = f"{language}."
+                    values = {name[len(prefix):]: value for name, value in row.items() if name.startswith(prefix)}
+                    # The number is NULL when the outer join found no row in this language.
+                    fields[language] = (text_store.inline_row(values) if values.pop("interpretation_number")
+                                        else None)
+                writer.add_interpretation(fields.pop("interpretation_number"), fields)
+    logger.info("Snapshot export completed.")
+
+@cli.command()
+@click.argument("query")
+@click.option('--index-path', type=click.Path(exists=True, dir_okay=False),
+              default=str(search_index.DEFAULT_INDEX_PATH), show_default=True)
+@click.option('--limit', default=10, show_default=True)
+def search(query, index_path, limit):
+    """Search law articles and interpretations in the full-text index."""
+    with search_index.SearchIndex(Path(index_path)) as index:
+        for hit in index.search(query, limit=limit):
+            target = hit.interpretation_number if hit.law_name is None else f"{hit.law_name} {hit.article_no}"
+            click.echo(f"{hit.score:8.3f}  {hit.kind:<18} {target}")
 
 if __name__ == "__main__":
+    # Loaded before parsing so .env can also supply the options' environment variables.
+    settings.load_env()
     cli()
\ No newline at end of file
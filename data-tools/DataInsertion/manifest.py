@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = Path("downloads/manifest.json")
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    """Persistent record of downloaded filesets, keyed by `ResourceFiles.file_set_id`.
+
+    Each entry holds the local path, size, SHA-256, the server's ETag/Last-Modified
+    validators and the download time.
+    """
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST_PATH, autosave_every: int = 100):
+        self.path = Path(path)
+        self.autosave_every = autosave_every
+        self._entries: Dict[str, dict] = {}
+        self._dirty = 0
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, file_set_id) -> Optional[dict]:
+        return self._entries.get(str(file_set_id))
+
+    def record(self, file_set_id, path: Path, size: int, sha256: str,
+               etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        self._entries[str(file_set_id)] = {
+            "path": str(path),
+            "size": size,
+            "sha256": sha256,
+            "etag": etag,
+            "last_modified": last_modified,
+            "downloaded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._dirty += 1
+        if self._dirty >= self.autosave_every:
+            self.save()
+
+    def forget(self, file_set_id) -> None:
+        if self._entries.pop(str(file_set_id), None) is not None:
+            self._dirty += 1
+
+    def conditional_headers(self, file_set_id) -> dict:
+        entry = self.get(file_set_id)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def save(self) -> None:
+        if not self._dirty and self.path.exists():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+
+def _check(job, entry: Optional[dict]):
+    if not job.path.exists():
+        return job, None, "missing"
+    size = job.path.stat().st_size
+    if entry and entry.get("size") != size:
+        return job, None, "size mismatch"
+    digest = hash_file(job.path)
+    if entry and entry.get("sha256") != digest:
+        return job, digest, "hash mismatch"
+    return job, digest, None
+
+
+def verify_files(jobs: Iterable, manifest: DownloadManifest, workers: int = os.cpu_count() or 4) -> List:
+    """Re-hash downloaded files in parallel and return the jobs whose file is missing or corrupted.
+
+    Corrupted files are deleted so the next download run fetches them again. Files that are
+    present but were never recorded are adopted into the manifest with their current hash.
+    """
+    bad = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # hashlib releases the GIL on large buffers, so threads hash files concurrently.
+        results = pool.map(lambda job: _check(job, manifest.get(job.file_set_id)), jobs)
+        for job, digest, problem in results:
+            if problem is None:
+                if manifest.get(job.file_set_id) is None:
+                    manifest.record(job.file_set_id, job.path, job.path.stat().st_size, digest)
+                continue
+            logger.warning(f"File {job.file_set_id} at {job.path}: {problem}")
+            if job.path.exists():
+                job.path.unlink()
+            manifest.forget(job.file_set_id)
+            bad.append(job)
+    manifest.save()
+    return bad
@@ -0,0 +1,230 @@
+import bisect
+import json
+import logging
+import os
+import re
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "citeright"
+
+# Upper bounds, in seconds, of the HTTP latency histogram buckets.
+HTTP_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN|TABLE)\s+[`"\[]?(\w+)', re.IGNORECASE)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else value
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class _Histogram:
+    def __init__(self, buckets=HTTP_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process collector for one CLI run.
+
+    Holds named counters (rows, bytes, ...), stage timers, HTTP latency histograms and SQL
+    statement counts/time per (statement, table). Everything is keyed by a metric name plus
+    a label set and exported as a JSON summary or a Prometheus textfile.
+    """
+
+    def __init__(self):
+        self.command: Optional[str] = None
+        self.started = time.time()
+        self.counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.http: Dict[Labels, _Histogram] = {}
+        self.sql: Dict[Tuple[str, str], list] = defaultdict(lambda: [0, 0.0])
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        self.counters[(name, _labels(labels))] += value
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a named stage; nested or repeated stages accumulate."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def observe_http(self, seconds: float, **labels) -> None:
+        key = _labels(labels)
+        if key not in self.http:
+            self.http[key] = _Histogram()
+        self.http[key].observe(seconds)
+
+    def observe_sql(self, statement: str, seconds: float) -> None:
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+        match = _SQL_TABLE.search(statement)
+        entry = self.sql[(verb, match.group(1) if match else "")]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def summary(self) -> dict:
+        counters = defaultdict(list)
+        for (name, labels), value in sorted(self.counters.items()):
+            counters[name].append({"labels": dict(labels), "value": _number(value)})
+        elapsed = time.time() - self.started
+        return {
+            "command": self.command,
+            "started": self.started,
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "counters": counters,
+            "http": [
+                {"labels": dict(labels), "count": h.count, "sum_seconds": round(h.sum, 3),
+                 "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts))}
+                for labels, h in self.http.items()
+            ],
+            "sql": [
+                {"statement": verb, "table": table, "count": count, "seconds": round(seconds, 3)}
+                for (verb, table), (count, seconds) in sorted(self.sql.items())
+            ],
+        }
+
+    def prometheus(self) -> str:
+        command = self.command or ""
+        lines = [
+            f"# TYPE {PREFIX}_command_seconds gauge",
+            f'{PREFIX}_command_seconds{{command="{command}"}} {time.time() - self.started:.6f}',
+            f"# TYPE {PREFIX}_command_last_run_timestamp gauge",
+            f'{PREFIX}_command_last_run_timestamp{{command="{command}"}} {self.started:.0f}',
+            f"# TYPE {PREFIX}_stage_seconds gauge",
+        ]
+        for name, seconds in self.stages.items():
+            lines.append(f'{PREFIX}_stage_seconds{{command="{command}",stage="{name}"}} {seconds:.6f}')
+
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            for (counter, labels), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f"{PREFIX}_{name}_total{_format_labels(labels, command)} {_number(value)}")
+
+        lines.append(f"# TYPE {PREFIX}_http_request_duration_seconds histogram")
+        for labels, h in self.http.items():
+            cumulative = 0
+            for bound, count in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                cumulative += count
+                lines.append(f"{PREFIX}_http_request_duration_seconds_bucket"
+                             f"{_format_labels(labels + (('le', bound),), command)} {cumulative}")
+            lines.append(f"{PREFIX}_http_request_duration_seconds_sum{_format_labels(labels, command)} {h.sum:.6f}")
+            lines.append(f"{PREFIX}_http_request_duration_seconds_count{_format_labels(labels, command)} {h.count}")
+
+        lines.append(f"# TYPE {PREFIX}_sql_statements_total counter")
+        for (verb, table), (count, _) in sorted(self.sql.items()):
+            lines.append(f'{PREFIX}_sql_statements_total{{command="{command}",statement="{verb}",table="{table}"}} {count}')
+        lines.append(f"# TYPE {PREFIX}_sql_seconds_total counter")
+        for (verb, table), (_, seconds) in sorted(self.sql.items()):
+            lines.append(f'{PREFIX}_sql_seconds_total{{command="{command}",statement="{verb}",table="{table}"}} {seconds:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path) -> None:
+        _write_atomic(Path(path), json.dumps(self.summary(), indent=2, ensure_ascii=False))
+
+    def write_prometheus(self, path: Path) -> None:
+        # node_exporter's textfile collector may read at any moment, so the file is swapped in whole.
+        _write_atomic(Path(path), self.prometheus())
+
+
+def _format_labels(labels: Labels, command: str) -> str:
+    pairs = [("command", command), *labels]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# The collector for the current process; the CLI group resets it per command.
+registry = Metrics()
+
+
+def reset(command: Optional[str] = None) -> Metrics:
+    global registry
+    registry = Metrics()
+    registry.command = command
+    return registry
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    registry.count(name, value, **labels)
+
+
+def stage(name: str):
+    return registry.stage(name)
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement the engine executes, grouped by statement type and table."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_start"].pop()
+        registry.observe_sql(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute never fires for a failed statement; drop its start time.
+        if context.connection is not None and context.connection.info.get("metrics_start"):
+            context.connection.info["metrics_start"].pop()
+
+
+def _request_started(request) -> None:
+    request.extensions["metrics_start"] = time.perf_counter()
+
+
+def _response_received(response) -> None:
+    started = response.request.extensions.get("metrics_start")
+    if started is not None:
+        registry.observe_http(time.perf_counter() - started, host=response.request.url.host,
+                              status=response.status_code)
+
+
+async def _async_request_started(request) -> None:
+    _request_started(request)
+
+
+async def _async_response_received(response) -> None:
+    _response_received(response)
+
+
+def http_hooks() -> dict:
+    """httpx event_hooks recording time-to-response-headers per host and status."""
+    return {"request": [_request_started], "response": [_response_received]}
+
+
+def async_http_hooks() -> dict:
+    return {"request": [_async_request_started], "response": [_async_response_received]}
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import sqlmodel
+
+from sqlalchemy import Column, DateTime, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
+
+
+class ChangeSet(sqlmodel.SQLModel, table=True):
+    """The changes one import batch committed, as gzip-compressed JSON lines.
+
+    Rows are inserted in the same transaction as the data they describe, so a committed
+    batch always has its change-set. Version comes from ChangeSetCounter, so change-sets
+    commit in version order.
+    """
+    __tablename__ = "ChangeSet"
+
+    version: int = sqlmodel.Field(primary_key=True, sa_column_kwargs={"name": "Version", "autoincrement": False})
+    command: str = sqlmodel.Field(max_length=50, sa_column_kwargs={"name": "Command"})
+    created_at: datetime = sqlmodel.Field(default_factory=datetime.now, sa_column=Column(DateTime, name="CreatedAt"))
+    changes: int = sqlmodel.Field(sa_column_kwargs={"name": "Changes"})
+    body: bytes = sqlmodel.Field(sa_column=Column(LargeBinary().with_variant(LONGBLOB, "mysql"), name="Body", nullable=False))
+
+
+class ChangeSetCounter(sqlmodel.SQLModel, table=True):
+    """A single row holding the last ChangeSet version handed out.
+
+    Writers increment it right before committing; the row lock taken by the update is held
+    until the commit, so a later version can never become visible before an earlier one.
+    """
+    __tablename__ = "ChangeSetCounter"
+
+    id: int = sqlmodel.Field(primary_key=True, sa_column_kwargs={"name": "Id", "autoincrement": False})
+    version: int = sqlmodel.Field(sa_column_kwargs={"name": "Version"})
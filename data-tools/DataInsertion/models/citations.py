@@ -0,0 +1,35 @@
+from typing import Optional
+
+import sqlmodel
+
+from sqlalchemy import ForeignKeyConstraint, Index
+
+
+class LawCitation(sqlmodel.SQLModel, table=True):
+    """One interpretation -> law (article) edge, with how often the interpretation cites it."""
+    __tablename__ = "LawCitation"
+
+    id: Optional[int] = sqlmodel.Field(default=None, primary_key=True, sa_column_kwargs={"name": "Id"})
+    interpretation_number: str = sqlmodel.Field(index=True, max_length=10, sa_column_kwargs={"name": "InterpretationNumber"})
+    law_level: str = sqlmodel.Field(max_length=50, sa_column_kwargs={"name": "LawLevel"})
+    law_name: str = sqlmodel.Field(max_length=255, sa_column_kwargs={"name": "LawName"})
+    # NULL when the law is cited without an article.
+    article_main: Optional[int] = sqlmodel.Field(default=None, sa_column_kwargs={"name": "ArticleMain"})
+    article_sub: Optional[int] = sqlmodel.Field(default=None, sa_column_kwargs={"name": "ArticleSub"})
+    mentions: int = sqlmodel.Field(default=1, sa_column_kwargs={"name": "Mentions"})
+
+    __table_args__ = (
+        # Citations are derived data: they go with the interpretation or law they point at.
+        ForeignKeyConstraint(
+            ["InterpretationNumber"],
+            ["interpretations.interpretation_number"],
+            ondelete="CASCADE",
+        ),
+        ForeignKeyConstraint(
+            ["LawLevel", "LawName"],
+            ["Law.LawLevel", "Law.LawName"],
+            ondelete="CASCADE",
+            onupdate="CASCADE",
+        ),
+        Index("ix_LawCitation_law_article", "LawLevel", "LawName", "ArticleMain", "ArticleSub"),
+    )
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import List, Optional
 
 import sqlmodel
-from sqlalchemy import Text, Column
+from sqlalchemy import Text, Column, DateTime
 
 
 class InterpretationsZH(sqlmodel.SQLModel, table=True):
@@ -19,6 +19,8 @@ class InterpretationsZH(sqlmodel.SQLModel, table=True):
     interpretation_kind_1: Optional[str] = sqlmodel.Field(default=None, max_length=10)
     interpretation_kind_2: Optional[str] = sqlmodel.Field(default=None, max_length=10)
     fact: Optional[str] = sqlmodel.Field(default=None, sa_column=Column(Text))
+    # Set when the text fields live in TextBlob as one JSON body; they are then NULL here.
+    body_hash: Optional[str] = sqlmodel.Field(default=None, index=True, max_length=64)
 
     interpretation: "Interpretations" = sqlmodel.Relationship(back_populates="interpretation_zh")
 
@@ -38,6 +40,8 @@ class InterpretationsEN(sqlmodel.SQLModel, table=True):
     decision: Optional[str] = sqlmodel.Field(default=None, sa_column=Column(Text))
     regulations: Optional[str] = sqlmodel.Field(default=None, sa_column=Column(Text))
     appendix: Optional[str] = sqlmodel.Field(default=None, sa_column=Column(Text))
+    # Set when the text fields live in TextBlob as one JSON body; they are then NULL here.
+    body_hash: Optional[str] = sqlmodel.Field(default=None, index=True, max_length=64)
     
     interpretation: "Interpretations" = sqlmodel.Relationship(back_populates="interpretation_en")
 
@@ -58,7 +62,8 @@ class Interpretations(sqlmodel.SQLModel, table=True):
     __tablename__ = "interpretations"
 
     interpretation_number: str = sqlmodel.Field(primary_key=True, max_length=10)
-    interpretation_date: Optional[datetime] = sqlmodel.Field(default=None)
+    # A plain DateTime: parsed dates are calendar days without a time zone.
+    interpretation_date: Optional[datetime] = sqlmodel.Field(default=None, sa_column=Column(DateTime))
     source_url: Optional[str] = sqlmodel.Field(default=None, max_length=512)
     order: Optional[str] = sqlmodel.Field(default=None, max_length=255)
     order_title: Optional[str] = sqlmodel.Field(default=None, max_length=255)
@@ -6,7 +6,7 @@ import sqlmodel
 
 from sqlmodel import Relationship
 from sqlalchemy.orm import Mapped, relationship, foreign
-from sqlalchemy import ForeignKeyConstraint, Boolean, Date, DateTime, Text
+from sqlalchemy import ForeignKeyConstraint, Index, Boolean, Date, DateTime, Text
 
 
 class LawAttachment(sqlmodel.SQLModel, table=True):
@@ -60,6 +60,12 @@ class LawArticle(sqlmodel.SQLModel, table=True):
     law_level: str = sqlmodel.Field(index=True, max_length=50, sa_column_kwargs={"name": "LawLevel"})
     law_name: str = sqlmodel.Field(index=True, max_length=255, sa_column_kwargs={"name": "LawName"})
     article_content: str = sqlmodel.Field(sa_column=sqlmodel.Column(Text, name="ArticleContent"))
+    # Canonical lookup keys (see law_keys): "第 15-1 條" is (15, 1). NULL when ArticleNo has no number.
+    law_name_key: Optional[str] = sqlmodel.Field(default=None, max_length=255, sa_column_kwargs={"name": "LawNameKey"})
+    article_main: Optional[int] = sqlmodel.Field(default=None, sa_column_kwargs={"name": "ArticleMain"})
+    article_sub: Optional[int] = sqlmodel.Field(default=None, sa_column_kwargs={"name": "ArticleSub"})
+    # Set when the text lives in TextBlob; ArticleContent is then left empty.
+    content_hash: Optional[str] = sqlmodel.Field(default=None, index=True, max_length=64, sa_column_kwargs={"name": "ContentHash"})
 
     __table_args__ = (
         ForeignKeyConstraint(
@@ -68,6 +74,7 @@ class LawArticle(sqlmodel.SQLModel, table=True):
             ondelete="CASCADE",
             onupdate="CASCADE",
         ),
+        Index("ix_LawArticle_article_key", "LawNameKey", "ArticleMain", "ArticleSub"),
     )
     law: "Law" = Relationship(back_populates="articles")
     caption: "LawCaption" = Relationship(back_populates="articles")
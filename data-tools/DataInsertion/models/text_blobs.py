@@ -0,0 +1,13 @@
+import sqlmodel
+
+from sqlalchemy import Column, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
+
+
+class TextBlob(sqlmodel.SQLModel, table=True):
+    """A zlib-compressed text body stored once, keyed by the SHA-256 of its UTF-8 text."""
+    __tablename__ = "TextBlob"
+
+    hash: str = sqlmodel.Field(primary_key=True, max_length=64, sa_column_kwargs={"name": "Hash"})
+    size: int = sqlmodel.Field(sa_column_kwargs={"name": "Size"})
+    body: bytes = sqlmodel.Field(sa_column=Column(LargeBinary().with_variant(LONGBLOB, "mysql"), name="Body", nullable=False))
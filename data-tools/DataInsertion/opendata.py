@@ -0,0 +1,90 @@
+import logging
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import httpx
+
+import API
+import http_cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_ROOT = Path("downloads")
+
+
+def category_rows(categories_data: list) -> List[dict]:
+    """Turn the categories listing into `Categories` rows, skipping incomplete entries."""
+    rows = []
+    for category in categories_data:
+        category_no = category.get("categoryNo")
+        category_name = category.get("categoryName")
+
+        if not category_no or not category_name:
+            logger.warning(f"Skipping invalid category data: {category}")
+            continue
+
+        rows.append({"category_no": category_no, "category_name": category_name})
+    return rows
+
+
+def resource_rows(category_no: str, resources_data: list) -> Tuple[List[dict], List[dict]]:
+    """Turn one category's resources listing into (`Resources` rows, `ResourceFiles` rows)."""
+    resources = []
+    files = []
+    for resource in resources_data:
+        dataset_id = resource.get("datasetId")
+        title = resource.get("title")
+
+        if not dataset_id or not title:
+            logger.warning(f"Skipping invalid resource data: {resource}")
+            continue
+
+        resources.append({"dataset_id": dataset_id, "category_no": category_no, "title": title})
+
+        for file_set in resource.get("filesets", []):
+            file_set_id = file_set.get("fileSetId")
+            resource_format = file_set.get("resourceFormat")
+            resource_description = file_set.get("resourceDescription")
+
+            if not file_set_id or not resource_format:
+                logger.warning(f"Skipping invalid file set data: {file_set}")
+                continue
+
+            files.append({
+                "file_set_id": file_set_id,
+                "dataset_id": dataset_id,
+                "resource_format": resource_format,
+                "resource_description": resource_description,
+            })
+    return resources, files
+
+
+def file_url(file_set_id: int) -> str:
+    return API.JUDICIAL_CATEGORYS_FILE_API.format(fileSetId=file_set_id)
+
+
+def download_path(category_name: str, title: str, description: str, resource_format: str) -> Path:
+    return DOWNLOAD_ROOT / category_name / title / f"{description}.{resource_format.lower()}"
+
+
+def _uncached(response: httpx.Response, endpoint: str) -> http_cache.CachedJson:
+    response.raise_for_status()
+    metrics.count("http_bytes", len(response.content), endpoint=endpoint)
+    return http_cache.CachedJson(response.json(), True, "")
+
+
+def fetch_json(client: httpx.Client, url: str, endpoint: str,
+               cache: Optional[http_cache.ResponseCache] = None) -> http_cache.CachedJson:
+    """GET a metadata listing, through `cache` when one is given; uncached results always count as changed."""
+    if cache is not None:
+        return cache.get_json(client, url, endpoint)
+    return _uncached(client.get(url), endpoint)
+
+
+async def afetch_json(client: httpx.AsyncClient, url: str, endpoint: str,
+                      cache: Optional[http_cache.ResponseCache] = None) -> http_cache.CachedJson:
+    if cache is not None:
+        return await cache.aget_json(client, url, endpoint)
+    return _uncached(await client.get(url), endpoint)
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+import httpx
+
+from sqlalchemy import select
+from sqlmodel import Session
+
+import API
+import bulk
+import changesets
+import checkpoint
+import downloader
+import http_cache
+import interpretations
+import manifest
+import metrics
+import opendata
+import settings
+
+from models import Categories, Resources, ResourceFiles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = settings.PIPELINE_QUEUE_SIZE
+
+
+def parse_download(path: Path) -> List[interpretations.InterpretationRecord]:
+    """Worker entry point: parse every interpretation JSON in a downloaded file or archive."""
+    return interpretations.parse_files(interpretations.find_sources(path))
+
+
+class Pipeline:
+    """Runs catalogue fetch -> download -> parse -> insert as overlapping stages.
+
+    Stages are joined by bounded queues, so a slow stage holds back the ones before it
+    instead of letting work pile up in memory. Resource listings are fetched concurrently and
+    their files handed to the downloader as each listing arrives; finished files are parsed
+    in a process pool and the records written by a single database thread. Only filesets in
+    `interpretation_categories` are parsed and loaded; the rest are downloaded.
+
+    A fileset is recorded in `journal` only once its records are committed, so a
+    resumed run redoes at most the last uncommitted batch. With `record_changes`, every
+    committed batch also stores a change-set of the interpretations it changed.
+    """
+
+    def __init__(self, engine, journal: checkpoint.CheckpointJournal, interpretation_categories: Iterable[str] = (),
+                 concurrency: int = downloader.DEFAULT_CONCURRENCY, per_host: int = downloader.DEFAULT_PER_HOST,
+                 retries: int = downloader.DEFAULT_RETRIES, workers: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, commit_every: int = interpretations.DEFAULT_COMMIT_EVERY,
+                 download_manifest: Optional[manifest.DownloadManifest] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cache: Optional[http_cache.ResponseCache] = None, timeout: float = settings.HTTP_TIMEOUT,
+                 record_changes: bool = False):
+        self.engine = engine
+        self.journal = journal
+        self.interpretation_categories = set(interpretation_categories)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.workers = workers
+        self.queue_size = queue_size
+        self.commit_every = commit_every
+        self.download_manifest = download_manifest
+        self.transport = transport
+        self.cache = cache
+        self.timeout = timeout
+        self.record_changes = record_changes
+        self._categories_of = {}
+        self._directories: Set[Path] = set()
+        self._resource_rows: List[dict] = []
+        self._file_rows: List[dict] = []
+        self._applied: List[tuple] = []
+        self._written = 0
+        # Every Session is used from this one thread, so database work never blocks the event loop.
+        self._db = ThreadPoolExecutor(max_workers=1)
+
+    async def _in_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db, func, *args)
+
+    def _upsert(self, model, rows: List[dict]) -> None:
+        with Session(self.engine) as session:
+            bulk.upsert_rows(session, model, rows)
+            session.commit()
+
+    def _stored_categories(self) -> List[dict]:
+        with Session(self.engine) as session:
+            return [{"category_no": category_no, "category_name": category_name}
+                    for category_no, category_name in session.execute(
+                        select(Categories.category_no, Categories.category_name))]
+
+    def _mark_applied(self, listings: List[tuple]) -> None:
+        if self.cache is not None:
+            for url, digest in listings:
+                self.cache.mark_applied(url, digest)
+
+    async def _jobs(self, client: httpx.AsyncClient):
+        """Fetch the catalogue and yield a download job for every fileset not yet completed.
+
+        Listings unchanged since they were last written are not upserted again, but their
+        files are still queued so a partly downloaded catalogue gets finished.
+        """
+        try:
+            with metrics.stage("fetch_categories"):
+                categories = await opendata.afetch_json(client, API.JUDICIAL_CATEGORYS_API, "categories", self.cache)
+        except (httpx.HTTPError, http_cache.OfflineCacheMiss) as e:
+            logger.error(f"Error fetching categories, continuing with the stored ones: {e}")
+            category_rows = await self._in_db(self._stored_categories)
+        else:
+            category_rows = opendata.category_rows(categories.data)
+            if categories.changed:
+                await self._in_db(self._upsert, Categories, category_rows)
+                self._mark_applied([(API.JUDICIAL_CATEGORYS_API, categories.digest)])
+        names = {row["category_no"]: row["category_name"] for row in category_rows}
+
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def listing(category_no):
+            async with limit:
+                url = API.JUDICIAL_CATEGORY_RESOURCES_API.format(categoryNo=category_no)
+                try:
+                    return category_no, url, await opendata.afetch_json(client, url, "resources", self.cache)
+                except (httpx.HTTPError, http_cache.OfflineCacheMiss) as e:
+                    logger.error(f"Error fetching resources for category {category_no}: {e}")
+                    return category_no, url, None
+
+        for next_listing in asyncio.as_completed([listing(category_no) for category_no in names]):
+            category_no, url, resources_listing = await next_listing
+            if resources_listing is None:
+                continue
+            resources, files = opendata.resource_rows(category_no, resources_listing.data)
+            if resources_listing.changed:
+                self._resource_rows.extend(resources)
+                self._file_rows.extend(files)
+                self._applied.append((url, resources_listing.digest))
+            titles = {row["dataset_id"]: row["title"] for row in resources}
+            for file in files:
+                file_set_id = file["file_set_id"]
+                path = opendata.download_path(names[category_no], titles[file["dataset_id"]],
+                                              file["resource_description"], file["resource_format"])
+                if file_set_id in self.journal and path.exists():
+                    metrics.count("pipeline_items", stage="resumed")
+                    continue
+                self._categories_of[file_set_id] = category_no
+                if path.parent not in self._directories:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    self._directories.add(path.parent)
+                yield downloader.DownloadJob(file_set_id, opendata.file_url(file_set_id), path)
+
+        # Resources first so the ResourceFiles foreign keys resolve.
+        if self._applied:
+            await self._in_db(self._upsert, Resources, self._resource_rows)
+            await self._in_db(self._upsert, ResourceFiles, self._file_rows)
+            self._mark_applied(self._applied)
+        logger.info(f"Catalogue stage finished: {len(self._applied)} of {len(names)} resource listings changed")
+
+    async def _download(self, downloaded: asyncio.Queue) -> None:
+        async with httpx.AsyncClient(timeout=self.timeout, transport=self.transport,
+                                     event_hooks=metrics.async_http_hooks()) as client:
+            await downloader.download_all(
+                self._jobs(client), concurrency=self.concurrency, per_host=self.per_host, retries=self.retries,
+                timeout=self.timeout, download_manifest=self.download_manifest, transport=self.transport,
+                done=downloaded)
+        for _ in range(self.workers):
+            await downloaded.put(None)
+
+    async def _parse(self, downloaded: asyncio.Queue, parsed: asyncio.Queue, pool: ProcessPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while (job := await downloaded.get()) is not None:
+            records = []
+            if self._categories_of.get(job.file_set_id) in self.interpretation_categories:
+                try:
+                    with metrics.stage("parse"):
+                        records = await loop.run_in_executor(pool, parse_download, job.path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not parse {job.path}: {e}")
+                    continue
+            metrics.count("pipeline_items", stage="parsed")
+            await parsed.put((job, records))
+
+    def _write(self, sink: interpretations.DatabaseSink, file_set_id: int, records: list, pending: List[int]) -> None:
+        for record in records:
+            sink.write(record)
+        # A fileset with nothing to insert still waits for the records queued before it.
+        pending.append(file_set_id)
+        self._written += len(records)
+        if self._written >= self.commit_every:
+            self._commit(sink, pending)
+
+    def _sink(self, session: Session) -> interpretations.DatabaseSink:
+        changes = changesets.ChangeRecorder(session, "sync-all") if self.record_changes else None
+        return interpretations.DatabaseSink(session, commit_every=self.commit_every, replace=False, changes=changes)
+
+    def _commit(self, sink: interpretations.DatabaseSink, pending: List[int]) -> None:
+        sink.flush()
+        self.journal.record(pending)
+        pending.clear()
+        self._written = 0
+
+    async def _insert(self, parsed: asyncio.Queue, parsers: int) -> None:
+        session = await self._in_db(Session, self.engine)
+        # Recording changes reads the stored interpretations first, so the sink is built on the database thread.
+        sink = await self._in_db(self._sink, session)
+        pending: List[int] = []
+        finished = 0
+        try:
+            while finished < parsers:
+                item = await parsed.get()
+                if item is None:
+                    finished += 1
+                    continue
+                job, records = item
+                with metrics.stage("insert"):
+                    await self._in_db(self._write, sink, job.file_set_id, records, pending)
+                metrics.count("pipeline_items", stage="inserted")
+            await self._in_db(self._commit, sink, pending)
+        finally:
+            await self._in_db(session.close)
+        logger.info(f"Insert stage finished: {sink.total} interpretations")
+
+    async def run(self) -> None:
+        downloaded: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def parser(pool):
+            await self._parse(downloaded, parsed, pool)
+            await parsed.put(None)
+
+        try:
+            # Created before any stage opens a session. Spawned parsers never inherit the database
+            # thread's connection or a lock held by it or the event loop.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+                await asyncio.gather(
+                    self._download(downloaded),
+                    *(parser(pool) for _ in range(self.workers)),
+                    self._insert(parsed, self.workers),
+                )
+        finally:
+            self._db.shutdown()
+            self.journal.close()
+            if self.download_manifest is not None:
+                self.download_manifest.save()
@@ -0,0 +1,194 @@
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = Path("profiles")
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+# How often the memory sampler checks for a new peak.
+SAMPLE_INTERVAL = 1.0
+
+_PROJECT_DIR = Path(__file__).resolve().parent.as_posix()
+
+# Hot-path sections, matched in order against "<file>:<function>" of every profiled function;
+# a function's own time is counted in the first section it matches, so sections never overlap.
+SECTIONS = (
+    ("network", ("/httpx/", "/httpcore/", "/h11/", "/h2/", "/anyio/", "/ssl.py", "/socket.py", "/selectors.py",
+                 "'_ssl._SSLSocket'", "'_socket.socket'", "<method 'poll' of", "<method 'select' of")),
+    ("flush/commit", ("/sqlalchemy/engine/", "/pymysql/", "/MySQLdb/", "sqlite3.", "_mysql.")),
+    ("ORM build", ("/sqlalchemy/", "/sqlmodel/", "/pydantic/", "pydantic_core")),
+    ("import", ("<frozen importlib", "builtins.__build_class__", "builtins.exec", "builtins.__import__", "marshal.",
+                "builtins.compile", "builtins.eval", "/typing.py")),
+    # Encoding and compressing output (change-sets, text blobs) is transform work, not parsing.
+    ("transform", ("/json/encoder.py", "/json/__init__.py:dumps", "_json.encode", "zlib.compress", "/gzip.py:compress")),
+    ("parse", ("/json/", "_json.", "/zipfile", "/gzip.py", "zlib.", "/codecs.py", "_io.TextIOWrapper",
+               "/laws.py:iter_laws", "/laws.py:load_laws", "/interpretations.py:parse_files")),
+    ("transform", (f"{_PROJECT_DIR}/", "/_strptime.py", "/datetime.py", "unicodedata.", "/re/", "'re.Pattern'")),
+    ("waiting", ("'_thread.lock'", "/threading.py", "/queue.py", "/concurrent/futures/")),
+)
+OTHER = "other"
+# From Python 3.12 cProfile runs on sys.monitoring: one enabled profiler sees every thread,
+# and enabling a second one fails with "Another profiling tool is already active".
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+
+def section_of(filename: str, function: str) -> str:
+    name = f"{filename.replace(chr(92), '/')}:{function}"
+    for section, patterns in SECTIONS:
+        if any(pattern in name for pattern in patterns):
+            return section
+    return OTHER
+
+
+def section_times(stats: pstats.Stats) -> Dict[str, float]:
+    """Own time per section, largest first.
+
+    Built-ins that match no section (str methods, dict lookups, ...) count towards the
+    section of the caller that spent the most time in them.
+    """
+    totals = defaultdict(float)
+    for (filename, _, function), (_, _, own_time, _, callers) in stats.stats.items():
+        section = section_of(filename, function)
+        if section == OTHER and filename == "~" and callers:
+            # Caller entries are (calls, primitive calls, own time, cumulative time).
+            caller_file, _, caller_function = max(callers, key=lambda caller: callers[caller][2])
+            section = section_of(caller_file, caller_function)
+        totals[section] += own_time
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+class Profiler:
+    """CPU profile and memory trace of one CLI command.
+
+    cProfile covers the main thread and the threads it starts (database and download
+    threads); worker processes are not profiled. Before Python 3.12 every thread started
+    while profiling gets its own profiler. From 3.12 one profiler covers all threads (see
+    SHARED_PROFILER), so calls made concurrently in different threads share one call tree
+    and their times overlap. When another profiler is already active, only memory is traced.
+
+    tracemalloc records allocations, and a sampler thread snapshots them whenever traced
+    memory reaches a new high, so the reported allocation sites are those alive at the peak.
+    """
+
+    def __init__(self, command: Optional[str]):
+        self.command = command or "cli"
+        self._profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._peak = 0
+        self._peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def _add_profiler(self) -> None:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            logger.warning(f"CPU profiling disabled: {e}")
+            return
+        with self._lock:
+            self._profilers.append(profiler)
+
+    def _profile_thread(self, frame, event, arg):
+        # Called on the first event of each new thread; hand the thread to its own profiler.
+        sys.setprofile(None)
+        self._add_profiler()
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            self._take_snapshot_if_peak()
+
+    def _take_snapshot_if_peak(self) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._peak:
+            self._peak = current
+            self._peak_snapshot = tracemalloc.take_snapshot()
+
+    def start(self) -> None:
+        tracemalloc.start()
+        # Started before the thread hook is installed, so the sampler itself is not profiled.
+        self._sampler = threading.Thread(target=self._sample, name="profile-memory-sampler", daemon=True)
+        self._sampler.start()
+        if not SHARED_PROFILER:
+            threading.setprofile(self._profile_thread)
+        self._started = time.perf_counter()
+        self._add_profiler()
+
+    def stop(self, directory: Path = DEFAULT_PROFILE_DIR) -> Path:
+        """Stop profiling and write <command>-<time>.prof (pstats data) and .txt (report); returns the report."""
+        elapsed = time.perf_counter() - self._started
+        if not SHARED_PROFILER:
+            threading.setprofile(None)
+        with self._lock:
+            profilers = list(self._profilers)
+        for profiler in profilers:
+            profiler.disable()
+        self._stopped.set()
+        self._sampler.join()
+        self._take_snapshot_if_peak()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = self._peak_snapshot
+        tracemalloc.stop()
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        base = directory / f"{self.command}-{datetime.now():%Y%m%d-%H%M%S}"
+        report = io.StringIO()
+        sections = {}
+        if not profilers:
+            threads = "no threads"
+        else:
+            threads = "all threads" if SHARED_PROFILER else f"{len(profilers)} thread(s)"
+        report.write(f"Profile of {self.command}: {elapsed:.3f}s wall, {threads} profiled\n")
+        report.write(f"Peak traced memory: {peak / 2 ** 20:.1f} MiB\n")
+        if profilers:
+            stats = pstats.Stats(profilers[0], stream=report)
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(f"{base}.prof")
+
+            sections = section_times(stats)
+            profiled = sum(sections.values()) or 1.0
+            report.write(f"Sort differently with: python -m pstats {base}.prof\n\n")
+            report.write(f"{'Section':<16}{'Seconds':>10}{'%':>8}\n")
+            for section, seconds in sections.items():
+                report.write(f"{section:<16}{seconds:>10.3f}{100 * seconds / profiled:>8.1f}\n")
+
+            report.write("\nTop functions by cumulative time\n")
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+            report.write("\nTop functions by own time\n")
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+
+        report.write("\nTop allocation sites at peak memory\n")
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ))
+            for statistic in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                frame = statistic.traceback[0]
+                report.write(f"{statistic.size / 2 ** 20:>10.2f} MiB {statistic.count:>10} blocks  "
+                             f"{frame.filename}:{frame.lineno}\n")
+
+        path = Path(f"{base}.txt")
+        path.write_text(report.getvalue(), encoding="utf-8")
+        if sections:
+            logger.info("Profile sections: " + ", ".join(f"{section} {seconds:.2f}s" for section, seconds in sections.items()))
+            logger.info(f"Profile written to {path} and {base}.prof")
+        else:
+            logger.info(f"Profile written to {path}")
+        return path
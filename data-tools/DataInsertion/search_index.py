@@ -0,0 +1,342 @@
+import heapq
+import logging
+import math
+import re
+import sqlite3
+import unicodedata
+
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = Path("search_index.sqlite")
+
+ARTICLE = "article"
+INTERPRETATION_ZH = "interpretation_zh"
+INTERPRETATION_EN = "interpretation_en"
+
+# Text fields folded into one interpretation document per language.
+INTERPRETATION_FIELDS = ("number_title", "issue", "description", "reasoning", "fact")
+
+# Below this many candidates, later terms are fetched only for the candidate documents.
+_CANDIDATE_PROBE_LIMIT = 500
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_PHRASE_BOOST = 2.0
+
+_TOKEN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    law_level TEXT,
+    law_name TEXT,
+    article_no TEXT,
+    interpretation_number TEXT,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_law ON docs (law_level, law_name);
+CREATE INDEX IF NOT EXISTS docs_interpretation ON docs (interpretation_number);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+# Corpus totals kept in the stats table, so ranking never scans docs.
+_DOC_COUNT = "doc_count"
+_TOTAL_LENGTH = "total_length"
+# SQLite's default limit on bound parameters is 999.
+_IN_CHUNK = 900
+
+
+class Document(NamedTuple):
+    kind: str
+    law_level: Optional[str]
+    law_name: Optional[str]
+    article_no: Optional[str]
+    interpretation_number: Optional[str]
+    text: str
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    law_level: Optional[str]
+    law_name: Optional[str]
+    article_no: Optional[str]
+    interpretation_number: Optional[str]
+    score: float
+    phrase: bool
+
+
+def _runs(text: str):
+    # NFKC folds full-width digits and letters, so "第１８４條" and "第184條" tokenize alike.
+    return (match.group() for match in _TOKEN.finditer(unicodedata.normalize("NFKC", text or "").lower()))
+
+
+def tokenize(text: str) -> List[Tuple[str, int]]:
+    """Split document text into (term, position) pairs.
+
+    Every CJK character gets its own position, carrying both its unigram and the bigram it
+    starts; each latin/digit word takes one position.
+    """
+    tokens = []
+    position = 0
+    for run in _runs(text):
+        if run.isascii():
+            tokens.append((run, position))
+            position += 1
+            continue
+        for i, char in enumerate(run):
+            tokens.append((char, position))
+            if i + 1 < len(run):
+                tokens.append((run[i:i + 2], position))
+            position += 1
+    return tokens
+
+
+def tokenize_query(text: str) -> List[Tuple[str, int]]:
+    """Split a query like tokenize(), but with bigrams only inside CJK runs.
+
+    Unigrams are used only for isolated characters, so "民法第184條" looks up 民法, 法第,
+    184 and 條 at consecutive positions.
+    """
+    tokens = []
+    position = 0
+    for run in _runs(text):
+        if run.isascii() or len(run) == 1:
+            tokens.append((run, position))
+            position += 1
+            continue
+        for i in range(len(run) - 1):
+            tokens.append((run[i:i + 2], position + i))
+        position += len(run)
+    return tokens
+
+
+def article_document(row: dict) -> Document:
+    return Document(ARTICLE, row["law_level"], row["law_name"], row["article_no"], None,
+                    row.get("article_content") or "")
+
+
+def interpretation_document(kind: str, fields) -> Document:
+    text = "\n".join(fields.get(name) or "" for name in INTERPRETATION_FIELDS)
+    return Document(kind, None, None, None, fields["interpretation_number"], text)
+
+
+def interpretation_documents(record) -> List[Document]:
+    return [
+        interpretation_document(kind, fields)
+        for kind, fields in ((INTERPRETATION_ZH, record.zh), (INTERPRETATION_EN, record.en))
+        if fields
+    ]
+
+
+class SearchIndex:
+    """Persistent positional inverted index over law articles and interpretations.
+
+    Stored in its own SQLite file so lookups never touch the main database. Query terms are
+    intersected rarest-first and results ranked with BM25, with a boost for exact phrase
+    matches.
+    """
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        if self.conn.execute("SELECT COUNT(*) FROM stats").fetchone()[0] < 2:
+            # Index files written before the stats table existed.
+            count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+            self._set_stats(count, total)
+            self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        self.close()
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def clear(self) -> None:
+        self.conn.executescript("DELETE FROM postings; DELETE FROM terms; DELETE FROM docs;")
+        self._set_stats(0, 0)
+
+    def _set_stats(self, count: int, total: int) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)",
+                              [(_DOC_COUNT, count), (_TOTAL_LENGTH, total)])
+
+    def _add_stats(self, count: int, total: int) -> None:
+        self.conn.executemany("UPDATE stats SET value = value + ? WHERE name = ?",
+                              [(count, _DOC_COUNT), (total, _TOTAL_LENGTH)])
+
+    def _stats(self) -> Tuple[int, int]:
+        stats = dict(self.conn.execute("SELECT name, value FROM stats"))
+        return stats[_DOC_COUNT], stats[_TOTAL_LENGTH]
+
+    def add_documents(self, documents: Iterable[Document]) -> int:
+        next_id = (self.conn.execute("SELECT MAX(doc_id) FROM docs").fetchone()[0] or 0) + 1
+        doc_rows = []
+        postings: Dict[str, List[Tuple[int, bytes]]] = defaultdict(list)
+        for document in documents:
+            positions = defaultdict(list)
+            length = 0
+            for term, position in tokenize(document.text):
+                positions[term].append(position)
+                length = position + 1
+            doc_rows.append((next_id, document.kind, document.law_level, document.law_name,
+                             document.article_no, document.interpretation_number, length))
+            for term, term_positions in positions.items():
+                postings[term].append((next_id, array('I', term_positions).tobytes()))
+            next_id += 1
+
+        self.conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)", doc_rows)
+        self.conn.executemany(
+            "INSERT INTO postings (term, doc_id, positions) VALUES (?, ?, ?)",
+            ((term, doc_id, blob) for term, entries in postings.items() for doc_id, blob in entries),
+        )
+        self.conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            ((term, len(entries)) for term, entries in postings.items()),
+        )
+        self._add_stats(len(doc_rows), sum(row[-1] for row in doc_rows))
+        return len(doc_rows)
+
+    def _remove(self, where: str, params: Iterable[tuple]) -> None:
+        removed_terms: Dict[str, int] = defaultdict(int)
+        removed = removed_length = 0
+        for param in params:
+            count, length = self.conn.execute(f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE {where}",
+                                              param).fetchone()
+            removed += count
+            removed_length += length
+            doc_ids = [row[0] for row in self.conn.execute(f"SELECT doc_id FROM docs WHERE {where}", param)]
+            for doc_id in doc_ids:
+                for (term,) in self.conn.execute("SELECT term FROM postings WHERE doc_id = ?", (doc_id,)):
+                    removed_terms[term] += 1
+                self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self.conn.execute(f"DELETE FROM docs WHERE {where}", param)
+        self.conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?",
+                              ((count, term) for term, count in removed_terms.items()))
+        self.conn.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", ((term,) for term in removed_terms))
+        self._add_stats(-removed, -removed_length)
+
+    def remove_laws(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Drop every article document of the given (LawLevel, LawName) keys."""
+        self._remove("kind = 'article' AND law_level = ? AND law_name = ?", keys)
+
+    def remove_interpretations(self, numbers: Optional[Iterable[str]] = None) -> None:
+        """Drop interpretation documents, either for the given numbers or all of them."""
+        if numbers is None:
+            self._remove("kind IN ('interpretation_zh', 'interpretation_en')", [()])
+        else:
+            self._remove("kind IN ('interpretation_zh', 'interpretation_en') AND interpretation_number = ?",
+                         ((number,) for number in numbers))
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> List[SearchHit]:
+        tokens = tokenize_query(query)
+        if not tokens:
+            return []
+        offsets: Dict[str, List[int]] = defaultdict(list)
+        for term, position in tokens:
+            offsets[term].append(position)
+
+        placeholders = ",".join("?" * len(offsets))
+        df = dict(self.conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", list(offsets)))
+        if len(df) < len(offsets):
+            return []
+
+        postings: Dict[str, Dict[int, array]] = {}
+        candidates = None
+        for term in sorted(offsets, key=df.get):
+            if candidates is not None and len(candidates) <= _CANDIDATE_PROBE_LIMIT:
+                doc_list = list(candidates)
+                rows = self.conn.execute(
+                    f"SELECT doc_id, positions FROM postings WHERE term = ? AND doc_id IN ({','.join('?' * len(doc_list))})",
+                    [term, *doc_list])
+            else:
+                rows = self.conn.execute("SELECT doc_id, positions FROM postings WHERE term = ?", (term,))
+            term_postings = {}
+            for doc_id, blob in rows:
+                if candidates is None or doc_id in candidates:
+                    positions = array('I')
+                    positions.frombytes(blob)
+                    term_postings[doc_id] = positions
+            postings[term] = term_postings
+            candidates = set(term_postings)
+            if not candidates:
+                return []
+
+        count, total_length = self._stats()
+        avg_length = (total_length / count if count else 0.0) or 1.0
+        lengths = self._lengths(list(candidates))
+        idf = {term: math.log(1 + (count - df[term] + 0.5) / (df[term] + 0.5)) for term in offsets}
+        scored = []
+        for doc_id in candidates:
+            norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * lengths.get(doc_id, 0) / avg_length)
+            score = 0.0
+            for term in offsets:
+                tf = len(postings[term][doc_id])
+                score += idf[term] * tf * (_BM25_K1 + 1) / (tf + norm)
+            phrase = len(tokens) == 1 or self._has_phrase(tokens, postings, doc_id)
+            if phrase:
+                score *= _PHRASE_BOOST
+            scored.append((score, phrase, doc_id))
+
+        if kind:
+            # Filtering needs each candidate's kind, so fetch it before cutting to the top hits.
+            kinds = self._docs([doc_id for _, _, doc_id in scored])
+            scored = [entry for entry in scored if kinds[entry[2]][0] == kind]
+        top = heapq.nlargest(limit, scored)
+        docs = self._docs([doc_id for _, _, doc_id in top])
+        return [SearchHit(*docs[doc_id], score, phrase) for score, phrase, doc_id in top]
+
+    def _lengths(self, doc_ids: List[int]) -> Dict[int, int]:
+        lengths = {}
+        for start in range(0, len(doc_ids), _IN_CHUNK):
+            chunk = doc_ids[start:start + _IN_CHUNK]
+            lengths.update(self.conn.execute(
+                f"SELECT doc_id, length FROM docs WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk))
+        return lengths
+
+    def _docs(self, doc_ids: List[int]) -> Dict[int, tuple]:
+        docs = {}
+        for start in range(0, len(doc_ids), _IN_CHUNK):
+            chunk = doc_ids[start:start + _IN_CHUNK]
+            for row in self.conn.execute(
+                    "SELECT doc_id, kind, law_level, law_name, article_no, interpretation_number FROM docs "
+                    f"WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk):
+                docs[row[0]] = row[1:]
+        return docs
+
+    @staticmethod
+    def _has_phrase(tokens: List[Tuple[str, int]], postings: Dict[str, Dict[int, array]], doc_id: int) -> bool:
+        first_term, first_offset = tokens[0]
+        position_sets = {term: set(postings[term][doc_id]) for term, _ in tokens}
+        for start in postings[first_term][doc_id]:
+            base = start - first_offset
+            if all(base + offset in position_sets[term] for term, offset in tokens):
+                return True
+        return False
@@ -0,0 +1,63 @@
+import os
+
+# Tunables shared by the CLI options and the modules that use them. This module only uses the
+# standard library so the CLI can build its options (and --help) without importing anything heavy.
+DOWNLOAD_CONCURRENCY = 8
+DOWNLOAD_PER_HOST = 8
+DOWNLOAD_RETRIES = 3
+LAW_COMMIT_EVERY = 200
+# Also commit once this many article/caption/attachment rows are pending, so a batch of
+# very long laws cannot hold locks and grow the undo log without bound.
+LAW_COMMIT_ROWS = 5000
+INTERPRETATION_COMMIT_EVERY = 500
+PIPELINE_QUEUE_SIZE = 16
+METADATA_CACHE_TTL = 3600.0
+
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30.0
+CONNECT_TIMEOUT = 10
+HTTP_TIMEOUT = 60.0
+
+DEFAULTS = {
+    "pool_size": POOL_SIZE,
+    "max_overflow": MAX_OVERFLOW,
+    "pool_timeout": POOL_TIMEOUT,
+    "connect_timeout": CONNECT_TIMEOUT,
+    "http_timeout": HTTP_TIMEOUT,
+}
+
+# Per-command connection and timeout defaults; the global CLI options override them.
+COMMAND_DEFAULTS = {
+    "update-categories": {"pool_size": 1, "max_overflow": 0, "http_timeout": 30.0},
+    "update-resources": {"pool_size": 1, "max_overflow": 0, "http_timeout": 30.0},
+    # The writer holds one connection; catalogue upserts briefly take a second.
+    "sync-all": {"pool_size": 2, "max_overflow": 1, "http_timeout": 300.0},
+    "insert-law-data": {"pool_size": 1, "max_overflow": 0},
+    "insert-interpretations": {"pool_size": 1, "max_overflow": 0},
+    # Large archives can take minutes to stream.
+    "download-files": {"pool_size": 1, "max_overflow": 0, "http_timeout": 300.0},
+    "download-by-category-no": {"pool_size": 1, "max_overflow": 0, "http_timeout": 300.0},
+    "verify-downloads": {"pool_size": 1, "max_overflow": 0, "http_timeout": 300.0},
+}
+
+
+def for_command(command: str, **overrides) -> dict:
+    """Connection and timeout settings for `command`, with any non-None `overrides` applied."""
+    values = {**DEFAULTS, **COMMAND_DEFAULTS.get(command, {})}
+    values.update({name: value for name, value in overrides.items() if value is not None})
+    return values
+
+
+def load_env() -> None:
+    import dotenv
+
+    dotenv.load_dotenv(".env")
+
+
+def database_url() -> str:
+    load_env()
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise RuntimeError("DATABASE_URL is not set; add it to the environment or .env")
+    return url
@@ -0,0 +1,224 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = Path("law_snapshot.bin")
+
+MAGIC = b"CRSNAP01"
+VERSION = 1
+BLOCK_SIZE = 64 * 1024
+KEY_SEPARATOR = "\x1f"
+
+ARTICLES = 0
+INTERPRETATIONS = 1
+TABLE_COUNT = 2
+
+# magic, version, block count, block table offset, then per table: entries offset, entry count,
+# key pool offset, key pool size.
+_HEADER = struct.Struct("<8sIIQ" + "QIQQ" * TABLE_COUNT)
+# key offset, key length, block number, offset in block, text length
+_ENTRY = struct.Struct("<IIIII")
+# file offset, compressed length
+_BLOCK = struct.Struct("<QI")
+
+
+def article_key(law_name: str, article_no: str) -> bytes:
+    return f"{law_name}{KEY_SEPARATOR}{article_no}".encode("utf-8")
+
+
+class SnapshotWriter:
+    """Writes an immutable snapshot: zlib-compressed text blocks plus per-table sorted key arrays.
+
+    Texts are appended in whatever order they arrive and packed into ~64 KiB blocks; only the
+    small (key, location) entries are kept in memory and sorted by UTF-8 bytes at close.
+    The file is written under a temporary name and renamed into place when complete.
+    """
+
+    def __init__(self, path: Path = DEFAULT_SNAPSHOT_PATH):
+        self.path = Path(path)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._file = open(self._tmp, 'wb')
+        self._file.write(b"\0" * _HEADER.size)
+        self._entries: List[List[Tuple[bytes, int, int, int]]] = [[] for _ in range(TABLE_COUNT)]
+        self._blocks: List[Tuple[int, int]] = []
+        self._block = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self._tmp.unlink()
+
+    def _flush_block(self) -> None:
+        if not self._block:
+            return
+        compressed = zlib.compress(bytes(self._block), 6)
+        self._blocks.append((self._file.tell(), len(compressed)))
+        self._file.write(compressed)
+        self._block.clear()
+
+    def add(self, table: int, key: bytes, text: str) -> None:
+        data = text.encode("utf-8")
+        if self._block and len(self._block) + len(data) > BLOCK_SIZE:
+            self._flush_block()
+        self._entries[table].append((key, len(self._blocks), len(self._block), len(data)))
+        self._block += data
+
+    def add_article(self, law_name: str, article_no: str, content: Optional[str]) -> None:
+        self.add(ARTICLES, article_key(law_name, article_no), content or "")
+
+    def add_interpretation(self, number: str, fields: dict) -> None:
+        self.add(INTERPRETATIONS, number.encode("utf-8"), json.dumps(fields, ensure_ascii=False, default=str))
+
+    def close(self) -> None:
+        self._flush_block()
+        block_table_offset = self._file.tell()
+        for offset, length in self._blocks:
+            self._file.write(_BLOCK.pack(offset, length))
+
+        tables = []
+        for table, entries in enumerate(self._entries):
+            entries.sort(key=lambda entry: entry[0])
+            unique = []
+            for entry in entries:
+                if unique and unique[-1][0] == entry[0]:
+                    logger.warning(f"Duplicate snapshot key {entry[0].decode('utf-8')!r}; keeping the first")
+                    continue
+                unique.append(entry)
+
+            keys_offset = self._file.tell()
+            key_offsets = []
+            pool_size = 0
+            for key, *_ in unique:
+                key_offsets.append(pool_size)
+                self._file.write(key)
+                pool_size += len(key)
+            entries_offset = self._file.tell()
+            for (key, block_no, offset, length), key_offset in zip(unique, key_offsets):
+                self._file.write(_ENTRY.pack(key_offset, len(key), block_no, offset, length))
+            tables.extend((entries_offset, len(unique), keys_offset, pool_size))
+
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self._blocks), block_table_offset, *tables))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+        logger.info(f"Snapshot written to {self.path}: {len(self._entries[ARTICLES])} articles, "
+                    f"{len(self._entries[INTERPRETATIONS])} interpretations, {len(self._blocks)} blocks")
+
+
+class Snapshot:
+    """Read-only view of a snapshot file.
+
+    The file is memory-mapped on first use; key lookups binary-search the mapped entry arrays
+    in place and only the one compressed block holding the text is inflated (with a small LRU
+    of recently used blocks).
+    """
+
+    def __init__(self, path: Path = DEFAULT_SNAPSHOT_PATH, cached_blocks: int = 64):
+        self.path = Path(path)
+        self.cached_blocks = cached_blocks
+        self._mm: Optional[mmap.mmap] = None
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def _map(self) -> mmap.mmap:
+        if self._mm is None:
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header = _HEADER.unpack_from(self._mm, 0)
+            if header[0] != MAGIC or header[1] != VERSION:
+                raise ValueError(f"{self.path} is not a version {VERSION} snapshot")
+            self._block_count, self._block_table = header[2], header[3]
+            fields = header[4:]
+            self._tables = [fields[i:i + 4] for i in range(0, len(fields), 4)]
+        return self._mm
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        self._map()
+        return sum(table[1] for table in self._tables)
+
+    def _key(self, table: int, index: int) -> bytes:
+        mm = self._map()
+        entries_offset, _, keys_offset, _ = self._tables[table]
+        key_offset, key_length = struct.unpack_from("<II", mm, entries_offset + index * _ENTRY.size)
+        start = keys_offset + key_offset
+        return mm[start:start + key_length]
+
+    def _lower_bound(self, table: int, key: bytes) -> int:
+        lo, hi = 0, self._tables[table][1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(table, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _block(self, block_no: int) -> bytes:
+        block = self._cache.get(block_no)
+        if block is not None:
+            self._cache.move_to_end(block_no)
+            return block
+        offset, length = _BLOCK.unpack_from(self._mm, self._block_table + block_no * _BLOCK.size)
+        block = zlib.decompress(self._mm[offset:offset + length])
+        self._cache[block_no] = block
+        if len(self._cache) > self.cached_blocks:
+            self._cache.popitem(last=False)
+        return block
+
+    def _text(self, table: int, index: int) -> str:
+        entries_offset = self._tables[table][0]
+        _, _, block_no, offset, length = _ENTRY.unpack_from(self._mm, entries_offset + index * _ENTRY.size)
+        return self._block(block_no)[offset:offset + length].decode("utf-8")
+
+    def get(self, table: int, key: bytes) -> Optional[str]:
+        self._map()
+        index = self._lower_bound(table, key)
+        if index < self._tables[table][1] and self._key(table, index) == key:
+            return self._text(table, index)
+        return None
+
+    def article(self, law_name: str, article_no: str) -> Optional[str]:
+        return self.get(ARTICLES, article_key(law_name, article_no))
+
+    def articles(self, law_name: str) -> Iterator[Tuple[str, str]]:
+        """Yield (article_no, content) for every article of a law, in key order."""
+        self._map()
+        prefix = f"{law_name}{KEY_SEPARATOR}".encode("utf-8")
+        index = self._lower_bound(ARTICLES, prefix)
+        while index < self._tables[ARTICLES][1]:
+            key = self._key(ARTICLES, index)
+            if not key.startswith(prefix):
+                break
+            yield key[len(prefix):].decode("utf-8"), self._text(ARTICLES, index)
+            index += 1
+
+    def interpretation(self, number: str) -> Optional[dict]:
+        text = self.get(INTERPRETATIONS, number.encode("utf-8"))
+        return json.loads(text) if text is not None else None
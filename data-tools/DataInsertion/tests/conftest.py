@@ -0,0 +1,32 @@
+import sys
+
+from pathlib import Path
+
+import pytest
+
+# The modules import each other by bare name, as they do when main.py runs from this directory.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from sqlmodel import SQLModel, create_engine
+
+    import models.changesets
+    import models.citations
+    import models.interpretations
+    import models.law
+    import models.text_blobs
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    from sqlmodel import Session
+
+    with Session(engine) as session:
+        yield session
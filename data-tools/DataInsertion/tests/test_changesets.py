@@ -0,0 +1,62 @@
+import gzip
+import json
+
+from sqlalchemy import delete, select
+
+import bulk
+import changesets
+
+from models.changesets import ChangeSet, ChangeSetCounter
+
+
+def _commit_changes(session, *keys):
+    recorder = changesets.ChangeRecorder(session, "test")
+    for key in keys:
+        recorder.record(changesets.INSERT, changesets.INTERPRETATION, {"interpretation_number": key}, {"issue": "爭點"})
+    recorder.flush()
+    session.commit()
+
+
+def test_versions_come_from_the_counter(engine, session):
+    changesets.prepare_schema(engine)
+    _commit_changes(session, "1")
+    _commit_changes(session, "2", "3")
+
+    assert session.get(ChangeSetCounter, changesets.COUNTER_ID).version == 2
+    assert session.execute(select(ChangeSet.version).order_by(ChangeSet.version)).scalars().all() == [1, 2]
+
+
+def test_the_counter_continues_after_existing_change_sets(engine, session):
+    bulk.insert_rows(session, ChangeSet, [{"version": 7, "command": "old", "changes": 0, "body": gzip.compress(b"")}])
+    session.commit()
+    changesets.prepare_schema(engine)
+    _commit_changes(session, "1")
+
+    assert changesets.latest_version(session) == 8
+
+
+def test_a_missing_counter_row_is_seeded_when_versions_are_allocated(session):
+    session.execute(delete(ChangeSetCounter))
+    _commit_changes(session, "1")
+    assert changesets.latest_version(session) == 1
+
+
+def test_export_writes_a_header_line_before_each_change_set(engine, session, tmp_path):
+    changesets.prepare_schema(engine)
+    _commit_changes(session, "1")
+    _commit_changes(session, "2", "3")
+    output = tmp_path / "changes.jsonl.gz"
+
+    assert changesets.export_since(session, 1, output) == (1, 2)
+    lines = [json.loads(line) for line in gzip.decompress(output.read_bytes()).decode("utf-8").splitlines()]
+    assert {key: lines[0][key] for key in ("version", "command", "changes")} == {"version": 2, "command": "test",
+                                                                                   "changes": 2}
+    assert [line["key"] for line in lines[1:]] == [{"interpretation_number": "2"}, {"interpretation_number": "3"}]
+
+
+def test_export_with_nothing_new_writes_an_empty_gzip_file(engine, session, tmp_path):
+    changesets.prepare_schema(engine)
+    output = tmp_path / "changes.jsonl.gz"
+
+    assert changesets.export_since(session, 0, output) == (0, 0)
+    assert gzip.decompress(output.read_bytes()) == b""
@@ -0,0 +1,61 @@
+import json
+
+import checkpoint
+
+
+def test_resume_loads_every_committed_batch(tmp_path):
+    journal = checkpoint.CheckpointJournal("load", directory=tmp_path)
+    journal.record([("法律", "民法"), ("法律", "刑法")])
+    journal.record(["001"])
+    journal.close()
+
+    resumed = checkpoint.CheckpointJournal("load", resume=True, directory=tmp_path)
+    assert resumed.resume
+    assert ("法律", "民法") in resumed and "001" in resumed
+    assert len(resumed) == 3
+
+
+def test_without_resume_the_previous_journal_is_discarded(tmp_path):
+    journal = checkpoint.CheckpointJournal("load", directory=tmp_path)
+    journal.record(["001"])
+    journal.close()
+
+    assert len(checkpoint.CheckpointJournal("load", directory=tmp_path)) == 0
+    assert not list(tmp_path.glob("*.jsonl"))
+
+
+def test_a_torn_last_line_is_dropped_and_the_next_batch_starts_a_new_line(tmp_path):
+    journal = checkpoint.CheckpointJournal("load", directory=tmp_path)
+    journal.record(["001"])
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"keys": ["00')
+
+    resumed = checkpoint.CheckpointJournal("load", resume=True, directory=tmp_path)
+    assert resumed.completed == {"001"}
+    resumed.record(["002"])
+    resumed.close()
+
+    lines = journal.path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1]) == {"keys": ["002"]}
+    assert checkpoint.CheckpointJournal("load", resume=True, directory=tmp_path).completed == {"001", "002"}
+
+
+def test_a_journal_for_a_different_input_is_not_resumed(tmp_path):
+    source = tmp_path / "laws.json"
+    source.write_text("{}", encoding="utf-8")
+    journal = checkpoint.CheckpointJournal("load", source=source, directory=tmp_path)
+    journal.record(["001"])
+    journal.close()
+    source.write_text('{"Laws": []}', encoding="utf-8")
+
+    assert len(checkpoint.CheckpointJournal("load", source=source, resume=True, directory=tmp_path)) == 0
+
+
+def test_parts_written_by_parallel_workers_are_read_on_resume(tmp_path):
+    for part, key in enumerate(["001", "002"]):
+        journal = checkpoint.CheckpointJournal("load", directory=tmp_path, part=part)
+        journal.record([key])
+        journal.close()
+
+    assert checkpoint.CheckpointJournal("load", resume=True, directory=tmp_path).completed == {"001", "002"}
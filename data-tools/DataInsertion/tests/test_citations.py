@@ -0,0 +1,50 @@
+import citations
+
+LAWS = [("法律", "民法"), ("法律", "中華民國刑法"), ("法律", "勞動基準法"), ("法律", "刑事訴訟法")]
+
+
+def _automaton(*patterns):
+    automaton = citations.Automaton()
+    for pattern in patterns:
+        automaton.add(pattern, pattern)
+    return automaton.build()
+
+
+def test_find_all_reports_overlapping_matches():
+    matches = sorted(_automaton("he", "she", "his", "hers").find_all("ushers"))
+    assert matches == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_find_all_follows_failure_links_across_patterns():
+    assert sorted(_automaton("abcd", "bc", "c").find_all("abcx")) == [(1, 3, "bc"), (2, 3, "c")]
+
+
+def test_find_longest_prefers_the_leftmost_longest_match():
+    automaton = _automaton("刑法", "中華民國刑法", "民國")
+    assert automaton.find_longest("依中華民國刑法處罰") == [(1, 7, "中華民國刑法")]
+
+
+def _extract(text):
+    return list(citations.CitationExtractor(LAWS).extract(text))
+
+
+def test_article_lists_and_clauses_are_followed():
+    assert _extract("民法第184條第1項前段、第185條及第188條") == [
+        (("法律", "民法"), (184, 0)), (("法律", "民法"), (185, 0)), (("法律", "民法"), (188, 0))]
+
+
+def test_abbreviations_prefixes_and_same_law_resolve_to_the_official_name():
+    assert _extract("勞基法第9條之1及刑法第10條,同法第11條") == [
+        (("法律", "勞動基準法"), (9, 1)),
+        (("法律", "中華民國刑法"), (10, 0)),
+        (("法律", "中華民國刑法"), (11, 0)),
+    ]
+
+
+def test_short_names_need_an_article_but_longer_ones_do_not():
+    assert _extract("民法之規定") == []
+    assert _extract("依刑事訴訟法規定") == [(("法律", "刑事訴訟法"), None)]
+
+
+def test_full_width_article_numbers_are_folded():
+    assert _extract("民法第１８４條") == [(("法律", "民法"), (184, 0))]
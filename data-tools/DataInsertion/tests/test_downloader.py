@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+import pytest
+
+import downloader
+
+BODY = bytes(range(256)) * 40
+
+
+def _response(status, body, headers):
+    # A streamed body, so num_bytes_downloaded counts it as it would over the network.
+    return httpx.Response(status, headers={**headers, "Content-Length": str(len(body))}, stream=httpx.ByteStream(body))
+
+
+def _server(body=BODY, etag='"v1"', requests=None):
+    def handler(request):
+        if requests is not None:
+            requests.append(request)
+        headers = {"ETag": etag}
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            start = int(range_header[len("bytes="):-1])
+            if start >= len(body):
+                return httpx.Response(416, headers={"Content-Range": f"bytes */{len(body)}"})
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return _response(206, body[start:], headers)
+        return _response(200, body, headers)
+    return httpx.MockTransport(handler)
+
+
+def _fetch(transport, path, conditional=None):
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            job = downloader.DownloadJob(1, "https://opendata.example/files/1", path)
+            return await downloader._stream_to_file(client, job, 1024, conditional or {})
+    return asyncio.run(run())
+
+
+def _partial(path, data, etag='"v1"'):
+    downloader.partial_path(path).write_bytes(data)
+    if etag is not None:
+        downloader.validator_path(path).write_text(json.dumps({"etag": etag, "last_modified": None}), encoding="utf-8")
+
+
+def test_fresh_download_is_renamed_into_place(tmp_path):
+    path = tmp_path / "1.zip"
+    result = _fetch(_server(), path)
+
+    assert path.read_bytes() == BODY
+    assert result["sha256"] == hashlib.sha256(BODY).hexdigest()
+    assert not downloader.partial_path(path).exists()
+    assert not downloader.validator_path(path).exists()
+
+
+def test_resume_appends_the_missing_range(tmp_path):
+    path = tmp_path / "1.zip"
+    _partial(path, BODY[:1000])
+    requests = []
+    result = _fetch(_server(requests=requests), path)
+
+    assert requests[0].headers["Range"] == "bytes=1000-"
+    assert requests[0].headers["If-Range"] == '"v1"'
+    assert path.read_bytes() == BODY
+    assert result == {"size": len(BODY), "sha256": hashlib.sha256(BODY).hexdigest(), "etag": '"v1"',
+                      "last_modified": None}
+
+
+def test_a_changed_remote_file_restarts_the_download(tmp_path):
+    path = tmp_path / "1.zip"
+    _partial(path, BODY[:1000])
+    changed = b"new version " * 100
+    _fetch(_server(body=changed, etag='"v2"'), path)
+
+    assert path.read_bytes() == changed
+
+
+def test_a_partial_file_without_validator_is_downloaded_again(tmp_path):
+    path = tmp_path / "1.zip"
+    _partial(path, b"x" * 1000, etag=None)
+    requests = []
+    _fetch(_server(requests=requests), path)
+
+    assert "Range" not in requests[0].headers
+    assert path.read_bytes() == BODY
+
+
+def test_416_for_a_complete_partial_file_finishes_it(tmp_path):
+    path = tmp_path / "1.zip"
+    _partial(path, BODY)
+    result = _fetch(_server(), path)
+
+    assert path.read_bytes() == BODY
+    assert result == {"size": len(BODY), "sha256": hashlib.sha256(BODY).hexdigest()}
+    assert not downloader.validator_path(path).exists()
+
+
+def test_416_for_a_longer_partial_file_discards_it(tmp_path):
+    path = tmp_path / "1.zip"
+    _partial(path, BODY + b"extra")
+    with pytest.raises(httpx.TransportError):
+        _fetch(_server(), path)
+
+    assert not downloader.partial_path(path).exists()
+    assert not downloader.validator_path(path).exists()
+    assert not path.exists()
+
+
+def test_an_interrupted_download_keeps_its_validator_for_the_retry(tmp_path):
+    path = tmp_path / "1.zip"
+
+    def short(request):
+        response = _response(200, BODY[:500], {"ETag": '"v1"'})
+        response.headers["Content-Length"] = str(len(BODY))
+        return response
+    with pytest.raises(httpx.TransportError):
+        _fetch(httpx.MockTransport(short), path)
+
+    assert downloader.partial_path(path).read_bytes() == BODY[:500]
+    requests = []
+    _fetch(_server(requests=requests), path)
+    assert requests[0].headers["Range"] == "bytes=500-"
+    assert path.read_bytes() == BODY
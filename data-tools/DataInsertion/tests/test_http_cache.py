@@ -0,0 +1,52 @@
+import json
+
+import httpx
+
+import http_cache
+
+URL = "https://opendata.example/categories"
+
+
+def _client(requests):
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=[{"categoryNo": "001"}], headers={"ETag": '"v1"'})
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def test_applied_markers_are_kept_per_database(tmp_path):
+    requests = []
+    first = http_cache.ResponseCache(tmp_path, scope=http_cache.database_scope("sqlite:///a.db"))
+    second = http_cache.ResponseCache(tmp_path, scope=http_cache.database_scope("sqlite:///b.db"))
+    with _client(requests) as client:
+        listing = first.get_json(client, URL)
+        assert listing.changed
+        first.mark_applied(URL, listing.digest)
+
+        assert not first.get_json(client, URL).changed
+        assert second.get_json(client, URL).changed
+    assert len(requests) == 1
+
+
+def test_forget_applied_only_clears_its_own_scope(tmp_path):
+    first = http_cache.ResponseCache(tmp_path, scope="a")
+    second = http_cache.ResponseCache(tmp_path, scope="b")
+    with _client([]) as client:
+        digest = first.get_json(client, URL).digest
+        first.mark_applied(URL, digest)
+        second.mark_applied(URL, digest)
+
+        first.forget_applied()
+        assert first.get_json(client, URL).changed
+        assert not second.get_json(client, URL).changed
+
+
+def test_unscoped_markers_from_older_entries_count_as_not_applied(tmp_path):
+    cache = http_cache.ResponseCache(tmp_path, scope="a")
+    with _client([]) as client:
+        listing = cache.get_json(client, URL)
+        path = next(tmp_path.glob("*.json"))
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        path.write_text(json.dumps({**entry, "applied": listing.digest}), encoding="utf-8")
+
+        assert cache.get_json(client, URL).changed
@@ -0,0 +1,132 @@
+import pytest
+
+import interpretations
+import text_store
+
+
+def _document(number, reasoning="理由", en=True, additions=1):
+    data = {
+        "inte_no": number,
+        "inte_date": "1990/01/05 上午 12:00:00",
+        "inte_no_title": f"釋字第{number}號",
+        "inte_issue": "爭點",
+        "inte_desc": "解釋文",
+        "inte_reason": reasoning,
+    }
+    if en:
+        data.update(inte_no_title_en=f"J.Y. Interpretation No.{number}", inte_issue_en="Issue")
+    return {"data": data, "addition": {f"附件{i}": f"/docs/{number}/{i}.pdf" for i in range(additions)}}
+
+
+def _records(count, **kwargs):
+    return [interpretations.parse_record(_document(str(number), en=number % 2 == 0, additions=number % 3, **kwargs))
+            for number in range(1, count + 1)]
+
+
+@pytest.mark.parametrize("use_text_store", [False, True])
+def test_stored_digests_match_the_written_records(session, use_text_store):
+    records = _records(7)
+    sink = interpretations.DatabaseSink(session, commit_every=3,
+                                        text_store=text_store.TextStore(session) if use_text_store else None)
+    for record in records:
+        sink.write(record)
+    sink.close()
+
+    expected = {record.interpretation["interpretation_number"]:
+                interpretations.document_digest(interpretations.record_document(record)) for record in records}
+    assert interpretations.stored_digests(session, batch_size=2) == expected
+
+
+def test_changed_records_get_a_new_digest():
+    before, after = _records(1), _records(1, reasoning="新理由")
+    assert (interpretations.document_digest(interpretations.record_document(before[0]))
+            != interpretations.document_digest(interpretations.record_document(after[0])))
+
+
+def test_stored_digests_read_tables_from_before_the_text_store(engine, session):
+    from sqlalchemy import text
+
+    records = _records(2)
+    sink = interpretations.DatabaseSink(session)
+    for record in records:
+        sink.write(record)
+    sink.close()
+    with engine.begin() as connection:
+        for table in ("interpretations_zh", "interpretations_en"):
+            connection.execute(text(f"DROP INDEX ix_{table}_body_hash"))
+            connection.execute(text(f"ALTER TABLE {table} DROP COLUMN body_hash"))
+
+    assert set(interpretations.stored_digests(session)) == {"1", "2"}
+
+
+def test_extracted_copies_of_archive_members_are_skipped(tmp_path):
+    import json
+    import zipfile
+
+    document = json.dumps(_document("1"), ensure_ascii=False)
+    with zipfile.ZipFile(tmp_path / "interpretations.zip", "w") as archive:
+        archive.writestr("export/001.json", document)
+    (tmp_path / "export").mkdir()
+    (tmp_path / "export" / "001.json").write_text(document, encoding="utf-8")
+    (tmp_path / "002.json").write_text(json.dumps(_document("2"), ensure_ascii=False), encoding="utf-8")
+
+    assert interpretations.find_sources(tmp_path) == [
+        interpretations.JsonSource(tmp_path / "002.json"),
+        interpretations.JsonSource(tmp_path / "interpretations.zip", "export/001.json"),
+    ]
+
+
+@pytest.mark.parametrize("replace", [True, False])
+def test_a_repeated_interpretation_is_stored_once_from_its_later_copy(session, replace):
+    from sqlalchemy import select
+
+    from models.interpretations import InterpretationsZH
+
+    sink = interpretations.DatabaseSink(session, commit_every=2, replace=replace)
+    for record in _records(3) + _records(1, reasoning="新理由") + _records(1, reasoning="最新理由"):
+        sink.write(record)
+    sink.close()
+
+    rows = session.execute(select(InterpretationsZH.interpretation_number, InterpretationsZH.reasoning)).all()
+    assert sorted(rows) == [("1", "最新理由"), ("2", "理由"), ("3", "理由")]
+
+
+def test_parallel_parsing_yields_the_serial_records(tmp_path):
+    import json
+
+    for number in range(1, 8):
+        (tmp_path / f"{number:03}.json").write_text(json.dumps(_document(str(number)), ensure_ascii=False), encoding="utf-8")
+
+    serial = list(interpretations.iter_records(tmp_path))
+    assert list(interpretations.iter_records(tmp_path, workers=2, chunk_size=2)) == serial
+    assert len(serial) == 7
+
+
+def test_loose_files_and_archive_members_may_start_with_a_bom(tmp_path):
+    import json
+    import zipfile
+
+    bom = "\ufeff"
+    (tmp_path / "001.json").write_text(bom + json.dumps(_document("1"), ensure_ascii=False), encoding="utf-8")
+    with zipfile.ZipFile(tmp_path / "interpretations.zip", "w") as archive:
+        archive.writestr("002.json", (bom + json.dumps(_document("2"), ensure_ascii=False)).encode("utf-8"))
+
+    records = interpretations.parse_files(interpretations.find_sources(tmp_path))
+    assert [record.interpretation["interpretation_number"] for record in records] == ["1", "2"]
+
+
+def test_interpretation_dates_are_stored_as_calendar_days(session):
+    from datetime import date, datetime
+
+    from sqlalchemy import select
+
+    from models.interpretations import Interpretations
+
+    record = _records(1)[0]
+    assert record.interpretation["interpretation_date"] == date(1990, 1, 5)
+    assert interpretations.escape_sql(record.interpretation["interpretation_date"]) == "'1990-01-05'"
+    sink = interpretations.DatabaseSink(session)
+    sink.write(record)
+    sink.close()
+
+    assert session.execute(select(Interpretations.interpretation_date)).scalar_one() == datetime(1990, 1, 5)
@@ -0,0 +1,31 @@
+import pytest
+
+import law_keys
+
+
+@pytest.mark.parametrize("text, value", [
+    ("184", 184), ("１８４", 184), ("十五", 15), ("一百八十四", 184), ("一百零五", 105),
+    ("兩千", 2000), ("壹萬貳仟", 12000), ("十", 10), ("", None), ("15a", None),
+])
+def test_parse_number(text, value):
+    assert law_keys.parse_number(text) == value
+
+
+@pytest.mark.parametrize("article_no, key", [
+    ("第 15 條", (15, 0)),
+    ("第15條", (15, 0)),
+    ("第 15-1 條", (15, 1)),
+    ("第十五條之一", (15, 1)),
+    ("第１５條之１", (15, 1)),
+    ("第 184 條 第 1 項", (184, 0)),
+    ("前言", None),
+    (None, None),
+])
+def test_article_key(article_no, key):
+    assert law_keys.article_key(article_no) == key
+
+
+def test_law_name_key_folds_spacing_width_and_variants():
+    assert law_keys.law_name_key(" 台灣地區與大陸地區 人民關係條例 ") == "臺灣地區與大陸地區人民關係條例"
+    assert law_keys.law_name_key("ＡＰＥＣ法") == "APEC法"
+    assert law_keys.law_name_key(None) == ""
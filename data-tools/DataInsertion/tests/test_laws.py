@@ -0,0 +1,120 @@
+import pytest
+
+import checkpoint
+import laws
+
+from models.law import Law, LawArticle
+
+
+def _law(number, articles=2):
+    return {
+        "LawLevel": "法律",
+        "LawName": f"測試法{number}",
+        "LawURL": f"https://law.example/{number}",
+        "LawCategory": "測試",
+        "LawModifiedDate": "20240101",
+        "LawArticles": [{"ArticleType": "C", "ArticleContent": "第一章 總則"}] + [
+            {"ArticleType": "A", "ArticleNo": f"第 {article} 條", "ArticleContent": f"條文{article}"}
+            for article in range(1, articles + 1)
+        ],
+    }
+
+
+def _count(session, model):
+    from sqlalchemy import func, select
+
+    return session.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_resume_skips_a_batch_committed_before_its_journal_line(tmp_path, session, monkeypatch):
+    dump = [_law(number) for number in range(5)]
+    journal = checkpoint.CheckpointJournal("laws", directory=tmp_path)
+    writer = laws.LawWriter(session, commit_every=2, journal=journal)
+    for law in dump[:2]:
+        writer.add(law)
+    # Crash after the second batch commits but before the journal records it.
+    monkeypatch.setattr(journal, "record", lambda keys: (_ for _ in ()).throw(KeyboardInterrupt()))
+    with pytest.raises(KeyboardInterrupt):
+        for law in dump[2:4]:
+            writer.add(law)
+    journal.close()
+    monkeypatch.undo()
+    assert _count(session, Law) == 4
+
+    journal = checkpoint.CheckpointJournal("laws", resume=True, directory=tmp_path)
+    with laws.LawWriter(session, commit_every=2, journal=journal) as writer:
+        for law in dump:
+            writer.add(law)
+    journal.close()
+
+    assert (writer.total, writer.resumed) == (1, 4)
+    assert _count(session, Law) == 5
+    assert _count(session, LawArticle) == 10
+
+
+def test_backfill_fills_only_articles_without_keys(session):
+    from sqlalchemy import select, update
+
+    with laws.LawWriter(session) as writer:
+        writer.add(_law(1, articles=3))
+    session.execute(update(LawArticle).where(LawArticle.article_no == "第 2 條")
+                    .values(law_name_key=None, article_main=None, article_sub=None))
+    session.commit()
+
+    assert laws.backfill_article_keys(session) == 1
+    assert laws.backfill_article_keys(session) == 0
+    keys = session.execute(select(LawArticle.article_no, LawArticle.law_name_key, LawArticle.article_main)
+                           .order_by(LawArticle.id)).all()
+    assert keys == [("第 1 條", "測試法1", 1), ("第 2 條", "測試法1", 2), ("第 3 條", "測試法1", 3)]
+
+
+def _dump(laws_list, prefix='{"UpdateDate": "2024/01/01", "Laws": ['):
+    import json
+
+    return prefix + ",\n".join(json.dumps(law, ensure_ascii=False) for law in laws_list) + "]}"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, laws.READ_CHUNK_SIZE])
+def test_iter_laws_matches_load_laws_at_any_chunk_size(tmp_path, chunk_size):
+    path = tmp_path / "laws.json"
+    path.write_text("\ufeff" + _dump([_law(number, articles=number) for number in range(6)]), encoding="utf-8")
+
+    assert list(laws.iter_laws(path, chunk_size=chunk_size)) == list(laws.load_laws(path))
+
+
+def test_iter_laws_finds_a_laws_key_split_across_chunks(tmp_path):
+    path = tmp_path / "laws.json"
+    prefix = '{"UpdateDate": "' + "x" * 40 + '", "Laws"  :\n  ['
+    path.write_text(_dump([_law(1)], prefix=prefix), encoding="utf-8")
+
+    for chunk_size in range(1, len(prefix) + 1):
+        assert [law["LawName"] for law in laws.iter_laws(path, chunk_size=chunk_size)] == ["測試法1"]
+
+
+def test_iter_laws_reads_the_json_member_of_a_zip(tmp_path):
+    import zipfile
+
+    path = tmp_path / "ChLaw.json.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("ChLaw.json", ("\ufeff" + _dump([_law(1), _law(2)])).encode("utf-8"))
+
+    assert [law["LawName"] for law in laws.iter_laws(path, chunk_size=16)] == ["測試法1", "測試法2"]
+
+
+def test_iter_laws_handles_an_empty_array_and_a_missing_key(tmp_path):
+    empty = tmp_path / "empty.json"
+    empty.write_text('{"Laws": [ ]}', encoding="utf-8")
+    missing = tmp_path / "missing.json"
+    missing.write_text('{"UpdateDate": "2024/01/01"}', encoding="utf-8")
+
+    assert list(laws.iter_laws(empty, chunk_size=4)) == []
+    assert list(laws.iter_laws(missing, chunk_size=4)) == []
+
+
+@pytest.mark.parametrize("tail", ["", ",", ',\n{"LawName": "截斷'])
+def test_iter_laws_rejects_an_unterminated_array(tmp_path, tail):
+    path = tmp_path / "laws.json"
+    path.write_text(_dump([_law(1)])[:-2] + tail, encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(laws.iter_laws(path, chunk_size=8))
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+
+import bulk
+import checkpoint
+import pipeline
+
+from benchmarks.mock_opendata import _CATEGORIES_PATH, MockOpendata
+from models import Categories
+
+
+class CategoriesDown(MockOpendata):
+    def _respond(self, request):
+        if request.url.path == _CATEGORIES_PATH:
+            raise httpx.ConnectError("connection refused", request=request)
+        return super()._respond(request)
+
+
+def test_a_failed_categories_fetch_falls_back_to_the_stored_categories(engine, session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bulk.insert_rows(session, Categories, [{"category_no": "C001", "category_name": "類別1"}])
+    session.commit()
+    mock = CategoriesDown(categories=3, resources=2, filesets=2)
+    run = pipeline.Pipeline(engine, checkpoint.CheckpointJournal("sync-all", directory=tmp_path / "checkpoints"))
+
+    async def jobs():
+        async with httpx.AsyncClient(transport=mock.async_transport()) as client:
+            return [job async for job in run._jobs(client)]
+    try:
+        file_set_ids = sorted(job.file_set_id for job in asyncio.run(jobs()))
+    finally:
+        run._db.shutdown()
+
+    assert file_set_ids == [300, 301, 400, 401]
@@ -0,0 +1,47 @@
+import cProfile
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import profiling
+
+
+def _encode(count):
+    return sum(len(json.dumps(list(range(200)))) for _ in range(count))
+
+
+def test_work_in_started_threads_is_profiled(tmp_path):
+    profiler = profiling.Profiler("test")
+    profiler.start()
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(_encode, [50, 50]))
+    report = profiler.stop(tmp_path).read_text(encoding="utf-8")
+
+    assert "_encode" in report
+    assert "Top allocation sites at peak memory" in report
+    assert list(tmp_path.glob("test-*.prof"))
+
+
+@pytest.mark.skipif(not profiling.SHARED_PROFILER, reason="profilers only exclude each other from Python 3.12")
+def test_another_active_profiler_leaves_only_the_memory_trace(tmp_path):
+    outer = cProfile.Profile()
+    outer.enable()
+    try:
+        profiler = profiling.Profiler("test")
+        profiler.start()
+        _encode(10)
+        report = profiler.stop(tmp_path).read_text(encoding="utf-8")
+    finally:
+        outer.disable()
+
+    assert "no threads profiled" in report
+    assert not list(tmp_path.glob("*.prof"))
+
+
+def test_sections_follow_the_function_location():
+    assert profiling.section_of("/usr/lib/python3/site-packages/httpx/_client.py", "send") == "network"
+    assert profiling.section_of("/usr/lib/python3/json/decoder.py", "raw_decode") == "parse"
+    assert profiling.section_of("/usr/lib/python3/json/encoder.py", "encode") == "transform"
+    assert profiling.section_of("~", "<method 'acquire' of '_thread.lock' objects>") == "waiting"
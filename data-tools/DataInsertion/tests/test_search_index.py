@@ -0,0 +1,48 @@
+import sqlite3
+
+import search_index
+
+
+def _article(name, article_no, text):
+    return search_index.Document(search_index.ARTICLE, "法律", name, article_no, None, text)
+
+
+def _stats(index):
+    return index._stats()
+
+
+def test_corpus_totals_follow_adds_and_removals(tmp_path):
+    with search_index.SearchIndex(tmp_path / "index.sqlite") as index:
+        index.add_documents([_article("民法", "第 1 條", "民事法律所未規定者"), _article("刑法", "第 1 條", "行為之處罰")])
+        index.add_documents([_article("民法", "第 2 條", "民事")])
+        assert _stats(index) == (3, 9 + 5 + 2)
+
+        index.remove_laws([("法律", "民法")])
+        assert _stats(index) == (1, 5)
+
+        index.clear()
+        assert _stats(index) == (0, 0)
+
+
+def test_index_files_without_totals_get_them_on_open(tmp_path):
+    path = tmp_path / "index.sqlite"
+    with search_index.SearchIndex(path) as index:
+        index.add_documents([_article("民法", "第 1 條", "民事法律"), _article("刑法", "第 1 條", "刑事")])
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE stats")
+
+    with search_index.SearchIndex(path) as index:
+        assert _stats(index) == (2, 6)
+
+
+def test_shorter_documents_rank_higher_for_the_same_match(tmp_path):
+    with search_index.SearchIndex(tmp_path / "index.sqlite") as index:
+        index.add_documents([
+            _article("民法", "第 1 條", "損害賠償" + "其他規定" * 20),
+            _article("民法", "第 2 條", "損害賠償"),
+            _article("刑法", "第 1 條", "無關條文"),
+        ])
+        hits = index.search("損害賠償")
+
+    assert [hit.article_no for hit in hits] == ["第 2 條", "第 1 條"]
+    assert all(hit.phrase for hit in hits)
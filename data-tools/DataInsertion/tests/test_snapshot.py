@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import snapshot
+
+
+def _write(path, articles=(), interpretations=()):
+    with snapshot.SnapshotWriter(path) as writer:
+        for law_name, article_no, content in articles:
+            writer.add_article(law_name, article_no, content)
+        for number, fields in interpretations:
+            writer.add_interpretation(number, fields)
+    return snapshot.Snapshot(path)
+
+
+def test_articles_and_interpretations_round_trip(tmp_path):
+    articles = [("民法", "1", "民事，法律所未規定者，依習慣。"), ("民法", "2", "民事所適用之習慣，以不背於公共秩序或善良風俗者為限。"),
+                ("刑法", "1", "行為之處罰，以行為時之法律有明文規定者為限。"), ("民法", "10", None)]
+    interpretations = [("748", {"title": "釋字第748號", "date": "2017-05-24"}), ("1", {"title": "釋字第1號"})]
+
+    with _write(tmp_path / "snap.bin", articles, interpretations) as snap:
+        assert len(snap) == 6
+        assert snap.article("民法", "2") == articles[1][2]
+        assert snap.article("民法", "10") == ""
+        assert snap.interpretation("748") == {"title": "釋字第748號", "date": "2017-05-24"}
+        assert snap.article("民法", "3") is None
+        assert snap.article("民法施行法", "1") is None
+        assert snap.interpretation("2") is None
+
+
+def test_articles_lists_one_law_in_key_order_without_its_prefix_neighbours(tmp_path):
+    articles = [("民法", "2", "b"), ("民法施行法", "1", "x"), ("民法", "1", "a"), ("民", "1", "y"), ("民法", "10", "c")]
+
+    with _write(tmp_path / "snap.bin", articles) as snap:
+        assert list(snap.articles("民法")) == [("1", "a"), ("10", "c"), ("2", "b")]
+        assert list(snap.articles("商法")) == []
+
+
+def test_texts_spanning_many_blocks_read_back_through_a_small_cache(tmp_path):
+    rng = random.Random(0)
+    articles = [("法", str(number), "".join(rng.choice("甲乙丙丁戊") for _ in range(rng.randint(1000, 9000))))
+                for number in range(200)]
+    path = tmp_path / "snap.bin"
+    _write(path, articles).close()
+
+    with snapshot.Snapshot(path, cached_blocks=2) as snap:
+        for law_name, article_no, content in rng.sample(articles, len(articles)):
+            assert snap.article(law_name, article_no) == content
+        assert snap._block_count > 2
+        assert len(snap._cache) <= 2
+
+
+def test_duplicate_keys_keep_the_first_text(tmp_path):
+    with _write(tmp_path / "snap.bin", [("民法", "1", "first"), ("民法", "1", "second")]) as snap:
+        assert len(snap) == 1
+        assert snap.article("民法", "1") == "first"
+
+
+def test_a_failed_write_leaves_no_file(tmp_path):
+    path = tmp_path / "snap.bin"
+    with pytest.raises(RuntimeError):
+        with snapshot.SnapshotWriter(path) as writer:
+            writer.add_article("民法", "1", "text")
+            raise RuntimeError("export failed")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "snap.bin"
+    path.write_bytes(b"\0" * 256)
+
+    with pytest.raises(ValueError):
+        snapshot.Snapshot(path).article("民法", "1")
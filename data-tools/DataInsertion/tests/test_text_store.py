@@ -0,0 +1,59 @@
+from sqlalchemy import event, select, text
+
+import bulk
+import laws
+import text_store
+
+from models.law import Law, LawArticle
+
+
+def _add_articles(session, contents, store=None):
+    bulk.insert_rows(session, Law, [{"law_level": "法律", "law_name": "民法", "law_url": "", "law_category": ""}])
+    rows = [
+        {"id": number, "caption_id": None, "article_no": f"第 {number} 條", "law_level": "法律", "law_name": "民法",
+         "article_content": content, **laws.article_keys("民法", f"第 {number} 條")}
+        for number, content in enumerate(contents, start=1)
+    ]
+    if store is not None:
+        rows = [store.article_row(row) for row in rows]
+        store.flush()
+    bulk.insert_rows(session, LawArticle, rows)
+    session.commit()
+
+
+def _statements(engine):
+    executed = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: executed.append(statement))
+    return executed
+
+
+def test_streamed_rows_get_their_text_from_the_same_query(engine, session):
+    contents = [f"第{number}條條文" for number in range(7)] + ["第0條條文"]
+    _add_articles(session, contents, text_store.TextStore(session))
+    statement = text_store.with_text(session, select(LawArticle.article_no, LawArticle.article_content), LawArticle)
+
+    executed = _statements(engine)
+    rows = session.execute(statement.order_by(LawArticle.id).execution_options(yield_per=3)).mappings()
+    texts = [text_store.inline_row(row)["article_content"] for partition in rows.partitions() for row in partition]
+
+    assert texts == contents
+    assert len(executed) == 1
+
+
+def test_rows_without_a_hash_keep_their_text(session):
+    _add_articles(session, ["inline text"])
+    statement = text_store.with_text(session, select(LawArticle.article_content), LawArticle)
+    assert [text_store.inline_row(row) for row in session.execute(statement).mappings()] == [
+        {"article_content": "inline text"}]
+
+
+def test_tables_from_before_the_store_are_read_without_hashes(engine, session):
+    _add_articles(session, ["舊條文"])
+    with engine.begin() as connection:
+        connection.execute(text('DROP INDEX "ix_LawArticle_ContentHash"'))
+        connection.execute(text('ALTER TABLE "LawArticle" DROP COLUMN "ContentHash"'))
+
+    assert not text_store.has_store(session, LawArticle)
+    assert laws.find_article(session, "民法", "第1條")["article_content"] == "舊條文"
+    assert laws.stored_articles(session, [("法律", "民法")]) == {
+        ("法律", "民法"): {"第 1 條": text_store.content_hash("舊條文")}}
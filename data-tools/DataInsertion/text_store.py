@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import zlib
+
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import Text, delete, insert, inspect, select, union
+from sqlalchemy.orm import aliased
+from sqlmodel import Session
+
+import bulk
+import metrics
+
+from models.interpretations import InterpretationsEN, InterpretationsZH
+from models.law import LawArticle
+from models.text_blobs import TextBlob
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_LEVEL = 6
+# Columns that hold a TextBlob hash, and the tables they live in.
+HASH_COLUMNS = {"content_hash", "body_hash"}
+REFERENCING_MODELS = (LawArticle, InterpretationsZH, InterpretationsEN)
+# Labels of the stored-text column with_text() adds to a select.
+STORED_CONTENT = "stored_content"
+STORED_BODY = "stored_body"
+
+
+def prepare_schema(engine) -> None:
+    """Create TextBlob and add the hash columns to tables created before the store existed."""
+    import database
+
+    TextBlob.__table__.create(engine, checkfirst=True)
+    for model in REFERENCING_MODELS:
+        database.add_missing_columns(engine, model)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def body_fields(model) -> List[str]:
+    """The model's long-text attributes, which the store keeps together as one JSON body."""
+    return [attr for attr, name in bulk.column_names(model).items() if isinstance(model.__table__.c[name].type, Text)]
+
+
+class TextStore:
+    """Content-addressed store for article and interpretation text.
+
+    `put` returns the SHA-256 of a text and queues it; `flush` writes only the queued bodies
+    the table does not hold yet, so text that is unchanged across re-imports is never
+    compressed or sent again. Call `flush` inside the transaction that inserts the
+    referencing rows. The rows' own text columns are left blank, so their text is only
+    visible to readers that join TextBlob (see with_text).
+    """
+
+    def __init__(self, session: Session, batch_size: int = bulk.DEFAULT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self._pending: Dict[str, str] = {}
+        # Hashes known to be stored, so repeated text skips the existence check.
+        self._stored: Set[str] = set()
+        self._body_fields = {model: body_fields(model) for model in (InterpretationsZH, InterpretationsEN)}
+
+    def put(self, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        digest = content_hash(text)
+        if digest not in self._stored:
+            self._pending[digest] = text
+        return digest
+
+    def article_row(self, row: dict) -> dict:
+        """A LawArticle row whose content is replaced by its hash."""
+        return {**row, "article_content": "", "content_hash": self.put(row.get("article_content"))}
+
+    def body_row(self, model, row: dict) -> dict:
+        """An interpretation row whose text fields are replaced by the hash of one JSON body."""
+        fields = self._body_fields[model]
+        body = {name: row[name] for name in fields if row.get(name) is not None}
+        stored = {name: value for name, value in row.items() if name not in fields}
+        stored["body_hash"] = self.put(json.dumps(body, ensure_ascii=False, sort_keys=True)) if body else None
+        return stored
+
+    def flush(self) -> int:
+        """Insert the pending bodies that are not stored yet; returns how many were written."""
+        if not self._pending:
+            return 0
+        digests = list(self._pending)
+        existing = set()
+        for batch in bulk.batched(digests, self.batch_size):
+            existing.update(self.session.execute(select(TextBlob.hash).where(TextBlob.hash.in_(batch))).scalars())
+        rows = []
+        for digest in digests:
+            if digest not in existing:
+                encoded = self._pending[digest].encode('utf-8')
+                rows.append({"Hash": digest, "Size": len(encoded), "Body": zlib.compress(encoded, COMPRESSION_LEVEL)})
+        # Parallel writers may store the same body between the check and the insert.
+        statement = insert(TextBlob.__table__).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+        for batch in bulk.batched(rows, self.batch_size):
+            self.session.execute(statement, batch)
+        metrics.count("text_blobs", len(rows), result="written")
+        metrics.count("text_blobs", len(digests) - len(rows), result="deduplicated")
+        self._stored.update(digests)
+        self._pending.clear()
+        return len(rows)
+
+
+def hash_attr(model) -> str:
+    return "content_hash" if "content_hash" in bulk.column_names(model) else "body_hash"
+
+
+def has_store(session: Session, model) -> bool:
+    """Whether the model's table has its hash column; tables created before the store do not."""
+    inspector = inspect(session.connection())
+    if not inspector.has_table(TextBlob.__tablename__):
+        return False
+    name = bulk.column_names(model)[hash_attr(model)]
+    return any(column["name"] == name for column in inspector.get_columns(model.__tablename__))
+
+
+def columns(model, exclude=()) -> list:
+    """The model's column attributes for a select, without its hash column."""
+    return [getattr(model, attr) for attr in bulk.column_names(model) if attr not in HASH_COLUMNS and attr not in exclude]
+
+
+def with_text(session: Session, statement, model, label: Optional[str] = None):
+    """Add the stored text of `model` rows to `statement` as one compressed column, joined in the same query.
+
+    Readers stream with yield_per, and MySQL drops an unbuffered result as soon as its
+    connection runs another statement, so the text cannot be fetched with a second query.
+    The column is labelled STORED_CONTENT for articles and STORED_BODY for interpretations
+    unless `label` is given; without the store the statement is returned unchanged.
+    """
+    if not has_store(session, model):
+        return statement
+    attr = hash_attr(model)
+    label = label or (STORED_CONTENT if attr == "content_hash" else STORED_BODY)
+    blob = aliased(TextBlob)
+    return statement.add_columns(blob.body.label(label)).outerjoin(blob, blob.hash == getattr(model, attr))
+
+
+def decode(body: Optional[bytes]) -> Optional[str]:
+    return zlib.decompress(body).decode('utf-8') if body is not None else None
+
+
+def inline_row(row) -> dict:
+    """An attribute-keyed row from a with_text() select, with its stored text put back in place."""
+    row = dict(row)
+    content = decode(row.pop(STORED_CONTENT, None))
+    if content is not None:
+        row["article_content"] = content
+    body = decode(row.pop(STORED_BODY, None))
+    if body is not None:
+        row.update(json.loads(body))
+    return row
+
+
+def prune(session: Session) -> int:
+    """Delete blobs no longer referenced by any row; returns how many were removed."""
+    referenced = union(*(
+        select(model.__table__.c[bulk.column_names(model)[attr]])
+        for model in REFERENCING_MODELS
+        for attr in HASH_COLUMNS if attr in bulk.column_names(model)
+    )).subquery()
+    column = referenced.c[0]
+    result = session.execute(delete(TextBlob).where(TextBlob.hash.not_in(select(column).where(column.is_not(None)))))
+    session.commit()
+    logger.info(f"Pruned {result.rowcount} unreferenced text blobs")
+    return result.rowcount